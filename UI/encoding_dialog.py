@@ -5,10 +5,14 @@ from PySide6.QtCore import Signal
 class EncodingDialog(QDialog):
     encodingSelected = Signal(str)  # 发送选中的编码
     
-    def __init__(self, parent=None):
+    def __init__(self, parent=None, detector=None, current: str = None):
         super().__init__(parent)
         self.setWindowTitle("选择编码")
+        # detector 返回按可信度排列的 [(编码, 可信度)]，为 None 时不提供自动检测
+        self.detector = detector
         self.setup_ui()
+        if current:
+            self.select_encoding(current)
     
     def setup_ui(self):
         layout = QVBoxLayout(self)
@@ -37,6 +41,16 @@ class EncodingDialog(QDialog):
         encoding_layout.addWidget(self.encoding_combo)
         layout.addLayout(encoding_layout)
         
+        # 自动检测：只采样文档的几个窗口，结果按文档缓存
+        detect_layout = QHBoxLayout()
+        self.detect_button = QPushButton("自动检测")
+        self.detect_button.setEnabled(self.detector is not None)
+        self.detect_button.clicked.connect(self.detect)
+        self.detect_label = QLabel()
+        detect_layout.addWidget(self.detect_button)
+        detect_layout.addWidget(self.detect_label, 1)
+        layout.addLayout(detect_layout)
+        
         # 按钮
         button_layout = QHBoxLayout()
         ok_button = QPushButton("确定")
@@ -49,6 +63,23 @@ class EncodingDialog(QDialog):
         button_layout.addWidget(cancel_button)
         layout.addLayout(button_layout)
     
+    def select_encoding(self, encoding: str):
+        """选中指定编码，不在列表中时先添加"""
+        if self.encoding_combo.findText(encoding) < 0:
+            self.encoding_combo.addItem(encoding)
+        self.encoding_combo.setCurrentText(encoding)
+    
+    def detect(self):
+        """检测编码，选中最可能的编码并列出候选"""
+        try:
+            guesses = self.detector()
+        except Exception as e:
+            self.detect_label.setText(f"检测失败: {str(e)}")
+            return
+        self.select_encoding(guesses[0][0])
+        self.detect_label.setText("  ".join(f"{encoding} {confidence:.0%}"
+                                            for encoding, confidence in guesses))
+    
     def get_selected_encoding(self):
         """获取选中的编码"""
         return self.encoding_combo.currentText()
@@ -1,193 +1,483 @@
-from PySide6.QtWidgets import (QWidget, QTextEdit, QVBoxLayout, QHBoxLayout,
-                               QScrollBar, QMenu, QLabel)
-from PySide6.QtCore import Qt, Signal
-from PySide6.QtGui import QFont, QTextCursor, QTextCharFormat, QColor, QTextBlockFormat
-from .plugin_menu import PluginMenu
-
-class HexEdit(QTextEdit):
-    """自定义的十六进制编辑器组件"""
-    scrolled = Signal(int)  # 发送滚动位置
-    
+from PySide6.QtWidgets import (QWidget, QVBoxLayout, QMenu, QMainWindow)
+from PySide6.QtCore import Qt, Signal, QRect
+from PySide6.QtGui import QColor, QPainter
+from tools.hex_formatter import format_rows, RowCache
+from tools.selection_model import SelectionModel
+from tools import search_engine, perf
+from .scroll_view import RowScrollArea
+
+class BytesReader:
+    """将内存中的 bytes 包装为范围读取接口"""
+
+    def __init__(self, data: bytes):
+        self.data = data
+
+    def get_size(self):
+        return len(self.data)
+
+    def read(self, offset: int, length: int) -> bytes:
+        return bytes(self.data[offset:offset + length])
+
+    def view(self, offset: int, length: int) -> memoryview:
+        return memoryview(self.data)[offset:offset + length]
+
+class HexView(RowScrollArea):
+    """虚拟化的十六进制视图，只格式化并绘制可见行
+
+    数据通过范围读取接口（提供 get_size() 和 read(offset, length)）按需获取，
+    偏移、十六进制和 ASCII 三列共用同一个滚动条。
+    """
+    selectionChanged = Signal(int, int)  # 起始偏移, 长度
+
     def __init__(self, parent=None):
         super().__init__(parent)
-        self.setReadOnly(True)
-        self.setFont(self.get_monospace_font())
-        self.setStyleSheet("""
-            QTextEdit {
-                background-color: white;
-                color: black;
-                border: 1px solid #ccc;
-            }
-        """)
-        
-        # 禁用默认的右键菜单
+        self.reader = None
+        self.bytes_per_line = 16
+        self.row_cache = RowCache(self.bytes_per_line)
+        # 选区按字节偏移记录，十六进制区和 ASCII 区共用
+        self.selection_model = SelectionModel()
+        self.pane = 'hex'
+        # 十六进制区已输入高半字节的偏移，下一个数字写入低半字节
+        self.nibble = None
+
         self.setContextMenuPolicy(Qt.CustomContextMenu)
-    
-    def get_monospace_font(self):
-        font = QFont("Consolas, Courier New")
-        font.setStyleHint(QFont.Monospace)
-        font.setPointSize(10)
-        return font
-    
-    def wheelEvent(self, event):
-        super().wheelEvent(event)
-        # 发送滚动位置
-        self.scrolled.emit(self.verticalScrollBar().value())
+
+    @property
+    def anchor(self):
+        return self.selection_model.anchor
+
+    @property
+    def cursor(self):
+        return self.selection_model.cursor
+
+    # ---- 几何 ----
+
+    def header_height(self):
+        return self.line_height() + 4
+
+    def row_count(self):
+        if self.reader is None:
+            return 0
+        return (self.reader.get_size() + self.bytes_per_line - 1) // self.bytes_per_line
+
+    def visible_rows(self):
+        return max(1, (self.viewport().height() - self.header_height()) // self.line_height())
+
+    def offset_digits(self, size: int = None):
+        if size is None:
+            size = self.reader.get_size() if self.reader else 0
+        return max(8, len(f"{max(size - 1, 0):X}"))
+
+    def hex_x(self):
+        """十六进制区域起始 x 坐标（字符单位换算后）"""
+        return (self.offset_digits() + 2) * self.char_width() + 4
+
+    def ascii_x(self):
+        return self.hex_x() + (self.bytes_per_line * 3 + 2) * self.char_width()
+
+    @staticmethod
+    def hex_column(index: int) -> int:
+        """行内第 index 个字节在十六进制区域中的字符位置"""
+        return index * 3 + (1 if index >= 8 else 0)
+
+    # ---- 数据 ----
+
+    def set_reader(self, reader):
+        self.reader = reader
+        self.row_cache.clear()
+        self.selection_model.clear()
+        self.update_scrollbar()
+        self.verticalScrollBar().setValue(0)
+        self.viewport().update()
+
+    def refresh(self):
+        """数据变化后重新计算滚动范围并重绘"""
+        self.row_cache.clear()
+        self.selection_model.clamp(self.reader.get_size() if self.reader else 0)
+        self.update_scrollbar()
+        self.viewport().update()
+
+    def document_changed(self, offset: int, old_length: int, new_length: int):
+        """文档被编辑后平移选区，只丢弃并重绘受影响的行
+
+        长度不变时只有 [offset, offset + old_length) 所在的行变化，否则其后的行都随之平移。
+        """
+        size = self.reader.get_size() if self.reader else 0
+        self.selection_model.adjust(offset, old_length, new_length)
+        self.selection_model.clamp(size)
+        end = offset + old_length if old_length == new_length else None
+        self.row_cache.invalidate(offset, end)
+        self.update_scrollbar()
+        if self.offset_digits(size - new_length + old_length) != self.offset_digits(size):
+            # 偏移列变宽或变窄，各列整体移动
+            self.viewport().update()
+        else:
+            self.update_rows(offset, end)
+
+    def update_rows(self, start: int, end: int = None):
+        """重绘包含 [start, end) 的可见行，end 为 None 表示直到视图底部"""
+        bpl = self.bytes_per_line
+        top = self.top_row()
+        first = max(start // bpl - top, 0)
+        last = self.visible_rows() + 1 if end is None else min(-(-end // bpl) - top, self.visible_rows() + 1)
+        if first >= last:
+            return
+        lh = self.line_height()
+        y = self.header_height() + first * lh
+        self.viewport().update(QRect(0, y, self.viewport().width(), (last - first) * lh))
+
+    def selection(self):
+        """返回 (起始偏移, 长度)，无选区时长度为 0"""
+        return self.selection_model.range()
+
+    def has_selection(self):
+        return self.selection()[1] > 0
+
+    def set_selection(self, anchor: int, cursor: int):
+        self.selection_model.select(anchor, cursor)
+        self.nibble = None
+        self.ensure_visible(cursor)
+        self.viewport().update()
+        self.selectionChanged.emit(*self.selection())
+
+    def ensure_visible(self, offset: int):
+        """滚动使指定偏移所在行可见"""
+        self.ensure_row_visible(offset // self.bytes_per_line)
+
+    def offset_at(self, pos):
+        """将视口坐标转换为 (偏移, 区域)"""
+        if self.reader is None or self.reader.get_size() == 0:
+            return None, None
+        row = self.top_row() + max(0, pos.y() - self.header_height()) // self.line_height()
+        cw = self.char_width()
+        if pos.x() >= self.ascii_x() - cw:
+            pane = 'ascii'
+            index = (pos.x() - self.ascii_x()) // cw
+        else:
+            pane = 'hex'
+            column = max(0, pos.x() - self.hex_x()) // cw
+            index = column // 3 if column < 24 else (column - 1) // 3
+        index = min(max(index, 0), self.bytes_per_line - 1)
+        offset = min(row * self.bytes_per_line + index, self.reader.get_size() - 1)
+        return offset, pane
+
+    # ---- 事件 ----
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self.update_scrollbar()
+
+    def mousePressEvent(self, event):
+        offset, pane = self.offset_at(event.position().toPoint())
+        if offset is None:
+            return
+        if event.button() == Qt.RightButton:
+            start, length = self.selection()
+            if start <= offset < start + length:
+                return
+        self.pane = pane
+        if event.modifiers() & Qt.ShiftModifier and self.anchor is not None:
+            self.set_selection(self.anchor, offset)
+        else:
+            self.set_selection(offset, offset)
+
+    def mouseMoveEvent(self, event):
+        if not event.buttons() & Qt.LeftButton or self.anchor is None:
+            return
+        offset, _ = self.offset_at(event.position().toPoint())
+        if offset is not None and offset != self.cursor:
+            self.set_selection(self.anchor, offset)
+
+    def keyPressEvent(self, event):
+        if self.reader is None or self.reader.get_size() == 0:
+            return super().keyPressEvent(event)
+        size = self.reader.get_size()
+        cursor = self.cursor if self.cursor is not None else 0
+        page = self.visible_rows() * self.bytes_per_line
+        moves = {
+            Qt.Key_Left: -1,
+            Qt.Key_Right: 1,
+            Qt.Key_Up: -self.bytes_per_line,
+            Qt.Key_Down: self.bytes_per_line,
+            Qt.Key_PageUp: -page,
+            Qt.Key_PageDown: page,
+        }
+        key = event.key()
+        if key in moves:
+            target = cursor + moves[key]
+        elif key == Qt.Key_Home:
+            target = 0 if event.modifiers() & Qt.ControlModifier else cursor - cursor % self.bytes_per_line
+        elif key == Qt.Key_End:
+            target = size - 1 if event.modifiers() & Qt.ControlModifier else \
+                cursor - cursor % self.bytes_per_line + self.bytes_per_line - 1
+        elif self.edit_key(event):
+            return
+        else:
+            return super().keyPressEvent(event)
+        target = min(max(target, 0), size - 1)
+        if event.modifiers() & Qt.ShiftModifier and self.anchor is not None:
+            self.set_selection(self.anchor, target)
+        else:
+            self.set_selection(target, target)
+
+    def edit_key(self, event) -> bool:
+        """按键编辑（数据源提供 edit_byte 等编辑接口时）：十六进制区输入十六进制数字，
+        ASCII 区输入可打印字符，均为改写；Delete/Backspace 删除。返回是否处理了按键
+        """
+        reader = self.reader
+        if not hasattr(reader, 'edit_byte') or event.modifiers() & (Qt.ControlModifier | Qt.AltModifier):
+            return False
+        cursor = self.cursor if self.cursor is not None else 0
+        key = event.key()
+        if key in (Qt.Key_Delete, Qt.Key_Backspace):
+            start, length = self.selection()
+            if length > 1:
+                reader.delete_range(start, length)
+            elif key == Qt.Key_Delete:
+                reader.delete_byte(cursor)
+                start = cursor
+            elif cursor > 0:
+                reader.delete_byte(cursor - 1)
+                start = cursor - 1
+            else:
+                return True
+            size = reader.get_size()
+            if size:
+                target = min(start, size - 1)
+                self.set_selection(target, target)
+            return True
+
+        text = event.text()
+        if len(text) != 1:
+            return False
+        high = False
+        if self.pane == 'hex':
+            if text not in '0123456789abcdefABCDEF':
+                return False
+            digit = int(text, 16)
+            value = reader.read(cursor, 1)[0]
+            high = self.nibble != cursor
+            if high:
+                reader.edit_byte(cursor, digit << 4 | value & 0x0F)
+                target = cursor
+            else:
+                reader.edit_byte(cursor, value & 0xF0 | digit)
+                target = cursor + 1
+        else:
+            if not 0x20 <= ord(text) < 0x7F:
+                return False
+            reader.edit_byte(cursor, ord(text))
+            target = cursor + 1
+        target = min(target, reader.get_size() - 1)
+        self.set_selection(target, target)
+        if high:
+            self.nibble = cursor
+        return True
+
+    @perf.timed('hex.paint', 'render')
+    def paintEvent(self, event):
+        painter = QPainter(self.viewport())
+        painter.fillRect(self.viewport().rect(), Qt.white)
+        cw = self.char_width()
+        lh = self.line_height()
+        ascent = self.fontMetrics().ascent()
+        hex_x = self.hex_x()
+        ascii_x = self.ascii_x()
+
+        # 标题行
+        header_h = self.header_height()
+        painter.fillRect(0, 0, self.viewport().width(), header_h, QColor('#f0f0f0'))
+        painter.setPen(QColor('#555'))
+        painter.drawText(4, 2 + ascent, "偏移")
+        columns = " ".join(f"{i:02X}" + (" " if i == 7 else "") for i in range(self.bytes_per_line))
+        painter.drawText(hex_x, 2 + ascent, columns)
+        painter.drawText(ascii_x, 2 + ascent, "ASCII")
+
+        if self.reader is None:
+            return
+        size = self.reader.get_size()
+        if size == 0:
+            return
+
+        first_row = self.top_row()
+        rows = self.visible_rows() + 1
+        bpl = self.bytes_per_line
+        hex_lines, ascii_lines = self.row_cache.rows(self.reader, first_row, rows)
+        sel_start, sel_len = self.selection()
+        sel_end = sel_start + sel_len
+        digits = self.offset_digits()
+
+        painter.setClipRect(QRect(0, header_h, self.viewport().width(), self.viewport().height() - header_h))
+        for i, (hex_line, ascii_line) in enumerate(zip(hex_lines, ascii_lines)):
+            offset = (first_row + i) * bpl
+            y = header_h + i * lh
+
+            # 选区背景
+            lo = max(sel_start, offset)
+            hi = min(sel_end, offset + bpl, size)
+            if lo < hi:
+                a, b = lo - offset, hi - offset - 1
+                painter.fillRect(hex_x + self.hex_column(a) * cw, y,
+                                 (self.hex_column(b) - self.hex_column(a) + 2) * cw, lh,
+                                 self.highlight_color)
+                painter.fillRect(ascii_x + a * cw, y, (b - a + 1) * cw, lh, self.highlight_color)
+
+            painter.setPen(QColor('#555'))
+            painter.drawText(4, y + ascent, f"{offset:0{digits}X}")
+            painter.setPen(Qt.black)
+            painter.drawText(hex_x, y + ascent, hex_line)
+            painter.drawText(ascii_x, y + ascent, ascii_line)
 
 class HexViewer(QWidget):
     def __init__(self, parent=None):
         super().__init__(parent)
-        self.setup_ui()
-        
-        # 存储当前数据
-        self.current_data = None
         self.bytes_per_line = 16
-        self.highlight_format = QTextCharFormat()
-        self.highlight_format.setBackground(QColor(255, 255, 0, 100))
-        
-        # 创建插件菜单
-        self.plugin_menu = PluginMenu(self)
-        self.plugin_menu.pluginTriggered.connect(self.on_plugin_result)
-    
+        self.reader = None
+        self.setup_ui()
+        self._plugin_menu = None
+
+    @property
+    def plugin_menu(self):
+        """插件菜单，第一次使用时才创建并加载插件"""
+        if self._plugin_menu is None:
+            from .plugin_menu import PluginMenu
+            self._plugin_menu = PluginMenu(self)
+            self._plugin_menu.pluginTriggered.connect(self.on_plugin_result)
+        return self._plugin_menu
+
+    def cancel_plugins(self) -> bool:
+        """取消正在执行的插件，返回是否已全部结束（插件菜单尚未创建时无需处理）"""
+        if self._plugin_menu is not None:
+            return self._plugin_menu.cancel_all()
+        return True
+
     def setup_ui(self):
         """设置UI布局"""
         layout = QVBoxLayout(self)
         layout.setContentsMargins(0, 0, 0, 0)
-        
-        # 添加标题行
-        header_layout = QHBoxLayout()
-        header_layout.addWidget(QLabel("偏移"), 1)
-        header_layout.addWidget(QLabel("十六进制"), 4)
-        header_layout.addWidget(QLabel("ASCII"), 2)
-        layout.addLayout(header_layout)
-        
-        # 创建水平布局来放置两个编辑器
-        editor_layout = QHBoxLayout()
-        
-        # 创建十六进制显示区域
-        self.hex_edit = HexEdit()
-        self.hex_edit.customContextMenuRequested.connect(self.show_context_menu)
-        editor_layout.addWidget(self.hex_edit, 5)  # 分配更多空间给十六进制部分
-        
-        # 创建ASCII显示区域
-        self.ascii_edit = HexEdit()
-        self.ascii_edit.customContextMenuRequested.connect(self.show_context_menu)
-        editor_layout.addWidget(self.ascii_edit, 2)
-        
-        layout.addLayout(editor_layout)
-        
-        # 同步滚动
-        self.hex_edit.scrolled.connect(self.sync_scroll_ascii)
-        self.ascii_edit.scrolled.connect(self.sync_scroll_hex)
-    
-    def sync_scroll_hex(self, value):
-        """同步十六进制视图的滚动"""
-        if self.hex_edit.verticalScrollBar().value() != value:
-            self.hex_edit.verticalScrollBar().setValue(value)
-    
-    def sync_scroll_ascii(self, value):
-        """同步ASCII视图的滚动"""
-        if self.ascii_edit.verticalScrollBar().value() != value:
-            self.ascii_edit.verticalScrollBar().setValue(value)
-    
+
+        # 偏移、十六进制和ASCII在同一个虚拟化视图中绘制
+        self.hex_view = HexView()
+        self.hex_view.customContextMenuRequested.connect(self.show_context_menu)
+        layout.addWidget(self.hex_view)
+
     def format_hex_line(self, offset: int, data: bytes) -> tuple[str, str]:
         """格式化一行十六进制数据，返回(hex_str, ascii_str)"""
-        # 十六进制部分
-        hex_parts = []
-        ascii_parts = []
-        
-        for i, byte in enumerate(data):
-            hex_parts.append(f"{byte:02X}")
-            if i > 0 and i % 8 == 7:
-                hex_parts.append("")
-            
-            # ASCII部分
-            if 32 <= byte <= 126:
-                ascii_parts.append(chr(byte))
-            else:
-                ascii_parts.append(".")
-        
-        # 补齐不足16字节的部分
-        while len(hex_parts) < 16:
-            hex_parts.append("  ")
-            ascii_parts.append(" ")
-            if len(hex_parts) % 9 == 8:
-                hex_parts.append("")
-        
-        hex_line = f"{offset:08X}  {' '.join(hex_parts)}"
-        ascii_line = "".join(ascii_parts)
-        
-        return hex_line, ascii_line
-    
+        hex_lines, ascii_lines = format_rows(data[:self.bytes_per_line], self.bytes_per_line)
+        if not hex_lines:
+            return f"{offset:08X}  ", ""
+        return f"{offset:08X}  {hex_lines[0]}", ascii_lines[0]
+
+    def set_reader(self, reader):
+        """设置数据源，reader 需提供 get_size() 和 read(offset, length)"""
+        self.reader = reader
+        self.hex_view.set_reader(reader)
+
     def set_data(self, data: bytes):
         """显示十六进制数据"""
-        self.current_data = data
-        if not data:
-            self.hex_edit.clear()
-            self.ascii_edit.clear()
+        self.set_reader(BytesReader(data) if data else None)
+
+    def refresh(self):
+        """数据源内容变化后刷新显示"""
+        self.hex_view.refresh()
+
+    def document_changed(self, offset: int, old_length: int, new_length: int):
+        """数据源被编辑后刷新显示，选区随编辑平移"""
+        self.hex_view.document_changed(offset, old_length, new_length)
+
+    def search_hex(self, pattern: bytes, case_sensitive: bool = True, max_results: int = None) -> list:
+        """查找字节序列，返回匹配偏移列表"""
+        if self.reader is None:
+            return []
+        return search_engine.search(self.reader, pattern, case_sensitive, max_results)
+
+    def search_text(self, text: str, case_sensitive: bool = True, encoding: str = 'utf-8',
+                    max_results: int = None) -> list:
+        """按指定编码查找文本，返回匹配偏移列表"""
+        return self.search_hex(text.encode(encoding), case_sensitive, max_results)
+
+    def get_preview(self, offset: int, length: int = 16) -> str:
+        """返回指定偏移处数据的十六进制预览"""
+        if self.reader is None:
+            return ""
+        return search_engine.get_preview(self.reader, offset, length)
+
+    def jump_to_offset(self, offset: int, length: int = 1):
+        """跳转到指定偏移并选中 length 个字节"""
+        if self.reader is None or not 0 <= offset < self.reader.get_size():
             return
-        
-        hex_lines = []
-        ascii_lines = []
-        
-        for offset in range(0, len(data), 16):
-            chunk = data[offset:offset + 16]
-            hex_line, ascii_line = self.format_hex_line(offset, chunk)
-            hex_lines.append(hex_line)
-            ascii_lines.append(ascii_line)
-        
-        self.hex_edit.setText("\n".join(hex_lines))
-        self.ascii_edit.setText("\n".join(ascii_lines))
-    
+        end = min(offset + max(length, 1), self.reader.get_size()) - 1
+        self.hex_view.set_selection(offset, end)
+        self.hex_view.ensure_visible(offset)
+        self.hex_view.setFocus()
+
     def show_context_menu(self, pos):
         """显示右键菜单"""
-        sender = self.sender()
-        if sender and sender.textCursor().hasSelection():
+        if self.hex_view.has_selection():
             menu = QMenu(self)
             menu.addMenu(self.plugin_menu)
-            menu.exec_(sender.mapToGlobal(pos))
-    
-    def get_selected_data(self) -> bytes:
-        """获取选中区域的字节数据"""
-        if not self.current_data:
-            return b""
-        
-        # 检查哪个编辑器被选中
-        if self.hex_edit.hasFocus() and self.hex_edit.textCursor().hasSelection():
-            cursor = self.hex_edit.textCursor()
-            selected_text = cursor.selectedText()
-            try:
-                # 移除所有空格和其他非十六进制字符
-                hex_text = "".join(c for c in selected_text if c.isalnum())
-                return bytes.fromhex(hex_text)
-            except ValueError:
-                return b""
-        elif self.ascii_edit.hasFocus() and self.ascii_edit.textCursor().hasSelection():
-            cursor = self.ascii_edit.textCursor()
-            selected_text = cursor.selectedText()
-            return selected_text.encode('utf-8')
-        
-        return b""
-    
-    def on_plugin_result(self, plugin, result: bytes):
-        """处理插件处理结果"""
-        # 确定哪个编辑器被选中
-        if self.hex_edit.hasFocus():
-            cursor = self.hex_edit.textCursor()
-            if cursor.hasSelection():
-                cursor.insertText(result.hex(' ').upper())
-        elif self.ascii_edit.hasFocus():
-            cursor = self.ascii_edit.textCursor()
-            if cursor.hasSelection():
-                try:
-                    text_result = result.decode('utf-8')
-                    cursor.insertText(text_result)
-                except UnicodeDecodeError:
-                    pass
-        
-        # 显示处理结果
-        try:
-            text_result = result.decode('utf-8')
-            self.window().statusBar().showMessage(f"处理结果: {text_result}")
-        except UnicodeDecodeError:
-            self.window().statusBar().showMessage(f"处理完成: {len(result)} 字节")
+            menu.exec_(self.hex_view.viewport().mapToGlobal(pos))
+
+    def get_selection_range(self) -> tuple[int, int]:
+        """返回选区 (起始偏移, 长度)，无选区时长度为 0"""
+        if self.reader is None:
+            return 0, 0
+        return self.hex_view.selection()
+
+    def get_selected_data(self) -> memoryview:
+        """获取选中区域的字节数据
+
+        数据源支持 view() 时选区位于同一只读片段内（如未修改的文件映射）不复制数据。
+        这样的视图在下一次保存、重新加载或关闭文件时失效，需要保留时应复制为 bytes。
+        """
+        if self.reader is None:
+            return memoryview(b"")
+        start, length = self.hex_view.selection()
+        if length == 0:
+            return memoryview(b"")
+        if hasattr(self.reader, 'view'):
+            return self.reader.view(start, length)
+        return memoryview(self.reader.read(start, length))
+
+    def show_status(self, message: str):
+        """在主窗口状态栏显示消息（MainWindow 用同名属性覆盖了 statusBar 方法）"""
+        window = self.window()
+        if isinstance(window, QMainWindow):
+            QMainWindow.statusBar(window).showMessage(message)
+
+    @perf.timed('hex.apply_plugin_result', 'plugin')
+    def on_plugin_result(self, plugin, result, job):
+        """把插件处理结果写回文档，替换插件处理的范围
+
+        result 为 bytes 或大结果的临时文件；临时文件直接映射为文档的缓冲区，不读入内存。
+        """
+        from plugins.pipeline import Pipeline, format_timings
+        is_bytes = isinstance(result, (bytes, bytearray))
+        size = len(result) if is_bytes else result.seek(0, 2)
+        reader = self.reader
+        if job.is_cancelled() or not hasattr(reader, 'replace_range'):
+            if not is_bytes:
+                result.close()
+            if not job.is_cancelled():
+                self.show_status(f"{plugin.name} 完成: {size} 字节")
+            return
+        if getattr(reader, 'revision', None) != job.revision:
+            # 插件读取的是启动时的快照，文档之后被修改过，处理的范围可能已经移动
+            if not is_bytes:
+                result.close()
+            self.show_status(f"{plugin.name}: 文档在处理期间已被修改，结果未写回")
+            return
+        if is_bytes:
+            applied = reader.replace_range(job.offset, job.length, bytes(result))
+        else:
+            applied = reader.replace_range_from_file(job.offset, job.length, result)
+        if not applied:
+            self.show_status(f"{plugin.name}: 写回结果失败")
+            return
+        if size:
+            self.hex_view.set_selection(job.offset, job.offset + size - 1)
+        message = f"{plugin.name} 完成: {job.length} 字节 -> {size} 字节"
+        if isinstance(plugin, Pipeline) and plugin.last_timings:
+            # 插件链显示各阶段耗时（子进程中执行时没有）
+            message += f" ({format_timings(plugin.last_timings)})"
+        self.show_status(message)
@@ -0,0 +1,25 @@
+from PySide6.QtWidgets import QWidget, QVBoxLayout
+
+class LazyTab(QWidget):
+    """标签页占位部件，第一次显示或访问时才调用 factory 创建真正的内容"""
+
+    def __init__(self, factory, parent=None):
+        super().__init__(parent)
+        self.factory = factory
+        self._widget = None
+        self.layout = QVBoxLayout(self)
+        self.layout.setContentsMargins(0, 0, 0, 0)
+
+    def is_created(self) -> bool:
+        return self._widget is not None
+
+    def widget(self):
+        """返回标签页内容，尚未创建时立即创建"""
+        if self._widget is None:
+            self._widget = self.factory()
+            self.layout.addWidget(self._widget)
+        return self._widget
+
+    def showEvent(self, event):
+        self.widget()
+        super().showEvent(event)
@@ -1,12 +1,16 @@
+import os
 from PySide6.QtWidgets import (QMainWindow, QMenuBar, QStatusBar, 
-                                  QTextEdit, QVBoxLayout, QWidget, 
+                                  QVBoxLayout, QWidget, QInputDialog,
                                   QFileDialog, QTabWidget, QMessageBox)
-from PySide6.QtCore import Qt
-from .hex_viewer import HexViewer
-from .markdown_viewer import MarkdownViewer
-from .search_dialog import SearchDialog
-from .encoding_dialog import EncodingDialog
+from PySide6.QtCore import Qt, QTimer
+from PySide6.QtGui import QKeySequence
+from .lazy_tab import LazyTab
+from .text_viewer import TextView
+from tools.patterns import (PatternError, LiteralPattern, compile_hex_pattern,
+                            compile_regex, parse_signature_file)
 from tools.hex_editor import HexEditor
+from tools.line_index import LineIndex
+from tools import startup_trace, perf
 
 class MainWindow(QMainWindow):
     def __init__(self):
@@ -16,8 +20,24 @@ class MainWindow(QMainWindow):
         
         # 初始化编辑器
         self.hex_editor = HexEditor()
+        self.hex_editor.add_change_listener(self.on_document_changed)
         self.current_encoding = 'utf-8'
         
+        # 搜索索引及其后台线程
+        self.search_index = None
+        self.index_thread = None
+        self.index_update_timer = QTimer(self)
+        self.index_update_timer.setSingleShot(True)
+        self.index_update_timer.setInterval(2000)
+        self.index_update_timer.timeout.connect(self.start_index_update)
+        
+        # 文本视图的行索引及其后台线程；无法增量更新的编辑合并为一次重建
+        self.line_index_thread = None
+        self.line_index_timer = QTimer(self)
+        self.line_index_timer.setSingleShot(True)
+        self.line_index_timer.setInterval(500)
+        self.line_index_timer.timeout.connect(self.start_line_index)
+        
         # 设置中心部件
         self.central_widget = QWidget()
         self.setCentralWidget(self.central_widget)
@@ -27,17 +47,18 @@ class MainWindow(QMainWindow):
         self.tab_widget = QTabWidget()
         self.layout.addWidget(self.tab_widget)
         
-        # 创建文本编辑器
-        self.text_edit = QTextEdit()
-        self.tab_widget.addTab(self.text_edit, "文本视图")
+        # 创建文本视图：只解码可见行，大文件也无需整体解码
+        self.text_view = TextView()
+        self.tab_widget.addTab(self.text_view, "文本视图")
         
-        # 创建十六进制视图
-        self.hex_viewer = HexViewer()
-        self.tab_widget.addTab(self.hex_viewer, "十六进制视图")
+        # 十六进制视图和Markdown视图在第一次显示或使用时才创建
+        self.hex_tab = LazyTab(self.create_hex_viewer)
+        self.tab_widget.addTab(self.hex_tab, "十六进制视图")
+        self.markdown_tab = LazyTab(self.create_markdown_viewer)
+        self.tab_widget.addTab(self.markdown_tab, "Markdown视图")
         
-        # 创建Markdown视图
-        self.markdown_viewer = MarkdownViewer()
-        self.tab_widget.addTab(self.markdown_viewer, "Markdown视图")
+        # 性能统计面板，第一次打开时才创建
+        self.perf_panel = None
         
         # 创建菜单栏
         self.create_menu_bar()
@@ -46,6 +67,26 @@ class MainWindow(QMainWindow):
         self.statusBar = QStatusBar()
         self.setStatusBar(self.statusBar)
         self.statusBar.showMessage("就绪")
+        startup_trace.mark("主窗口构建完成")
+    
+    @property
+    def hex_viewer(self):
+        return self.hex_tab.widget()
+    
+    @property
+    def markdown_viewer(self):
+        return self.markdown_tab.widget()
+    
+    def create_hex_viewer(self):
+        from .hex_viewer import HexViewer
+        viewer = HexViewer()
+        if self.hex_editor.file_path:
+            viewer.set_reader(self.hex_editor)
+        return viewer
+    
+    def create_markdown_viewer(self):
+        from .markdown_viewer import MarkdownViewer
+        return MarkdownViewer()
     
     def create_menu_bar(self):
         menubar = self.menuBar()
@@ -60,28 +101,70 @@ class MainWindow(QMainWindow):
         
         # 编辑菜单
         edit_menu = menubar.addMenu("编辑")
-        edit_menu.addAction("撤销", self.text_edit.undo)
-        edit_menu.addAction("重做", self.text_edit.redo)
+        self.undo_action = edit_menu.addAction("撤销", self.undo)
+        self.undo_action.setShortcut(QKeySequence.Undo)
+        self.redo_action = edit_menu.addAction("重做", self.redo)
+        self.redo_action.setShortcut(QKeySequence.Redo)
+        self.update_undo_actions()
         edit_menu.addSeparator()
-        edit_menu.addAction("复制", self.text_edit.copy)
-        edit_menu.addAction("粘贴", self.text_edit.paste)
-        edit_menu.addAction("剪切", self.text_edit.cut)
+        edit_menu.addAction("复制", self.text_view.copy)
         edit_menu.addSeparator()
         edit_menu.addAction("查找", self.show_search_dialog)
+        edit_menu.addAction("跳转到行...", self.show_goto_line_dialog).setShortcut(QKeySequence("Ctrl+G"))
         
         # 视图菜单
         view_menu = menubar.addMenu("视图")
-        view_menu.addAction("文本视图", lambda: self.tab_widget.setCurrentWidget(self.text_edit))
-        view_menu.addAction("十六进制视图", lambda: self.tab_widget.setCurrentWidget(self.hex_viewer))
-        view_menu.addAction("Markdown视图", lambda: self.tab_widget.setCurrentWidget(self.markdown_viewer))
+        view_menu.addAction("文本视图", lambda: self.tab_widget.setCurrentWidget(self.text_view))
+        view_menu.addAction("十六进制视图", lambda: self.tab_widget.setCurrentWidget(self.hex_tab))
+        view_menu.addAction("Markdown视图", lambda: self.tab_widget.setCurrentWidget(self.markdown_tab))
+        view_menu.addSeparator()
+        view_menu.addAction("性能统计", self.show_perf_panel)
         
         # 工具菜单
         tools_menu = menubar.addMenu("工具")
         tools_menu.addAction("选择编码", self.show_encoding_dialog)
+        self.detect_action = tools_menu.addAction("打开时自动检测编码")
+        self.detect_action.setCheckable(True)
+        self.detect_action.setToolTip("打开文件时采样开头、中间和结尾猜测编码")
+        self.index_action = tools_menu.addAction("启用搜索索引")
+        self.index_action.setCheckable(True)
+        self.index_action.setToolTip("在后台为打开的文件建立三元组索引，重复查找时只扫描候选块")
+        self.index_action.toggled.connect(self.on_index_toggled)
+    
+    def show_perf_panel(self):
+        """显示可停靠的性能统计面板"""
+        if self.perf_panel is None:
+            from .perf_panel import PerfPanel
+            self.perf_panel = PerfPanel(self)
+            self.addDockWidget(Qt.BottomDockWidgetArea, self.perf_panel)
+        self.perf_panel.show()
+        self.perf_panel.raise_()
+    
+    def update_undo_actions(self):
+        self.undo_action.setEnabled(self.hex_editor.can_undo())
+        self.redo_action.setEnabled(self.hex_editor.can_redo())
+    
+    def undo(self):
+        """撤销最近一次编辑并在十六进制视图中选中恢复的内容"""
+        self.select_edited_range(self.hex_editor.undo())
+    
+    def redo(self):
+        self.select_edited_range(self.hex_editor.redo())
+    
+    def select_edited_range(self, edited):
+        self.update_undo_actions()
+        if edited is None:
+            return
+        offset, length = edited
+        if self.hex_tab.is_created():
+            # 删除操作的范围为空时选中该位置的字节
+            self.hex_viewer.jump_to_offset(min(offset, self.hex_editor.get_size() - 1), length)
     
     def show_encoding_dialog(self):
         """显示编码选择对话框"""
-        dialog = EncodingDialog(self)
+        from .encoding_dialog import EncodingDialog
+        detector = self.hex_editor.detect_encoding if self.hex_editor.file_path else None
+        dialog = EncodingDialog(self, detector, self.current_encoding)
         if dialog.exec_():
             self.current_encoding = dialog.get_selected_encoding()
             self.statusBar.showMessage(f"当前编码: {self.current_encoding}")
@@ -90,17 +173,87 @@ class MainWindow(QMainWindow):
                 self.reload_file_content()
     
     def reload_file_content(self):
-        """重新加载文件内容"""
-        try:
-            # 更新文本视图
-            with open(self.hex_editor.file_path, 'r', encoding=self.current_encoding) as f:
-                content = f.read()
-                self.text_edit.setText(content)
-                # 如果是markdown文件，更新markdown视图
-                if self.hex_editor.file_path.lower().endswith(('.md', '.markdown')):
-                    self.markdown_viewer.set_markdown(content)
-        except UnicodeDecodeError:
-            self.text_edit.setText(f"[无法使用 {self.current_encoding} 编码解析文件]")
+        """按当前编码重新解码文档，不重新读取磁盘"""
+        self.update_text_views()
+    
+    @perf.timed('window.update_text_views', 'decode')
+    def update_text_views(self, select_tab: bool = False, new_file: bool = False):
+        """从共享的文档缓冲区更新文本视图和Markdown视图
+
+        文本视图只按行索引解码可见行；换行符不随编码变化时沿用已有的行索引。
+        """
+        is_markdown = self.is_markdown_file()
+        index = self.text_view.index
+        if new_file or index is None or self.line_index_thread is not None or \
+                not index.set_encoding(self.current_encoding, self.hex_editor.read(0, 4)):
+            self.start_line_index(reset=True)
+        else:
+            self.text_view.refresh()
+        # 如果是markdown文件，在后台解码并渲染markdown视图
+        if is_markdown:
+            self.markdown_viewer.set_document(self.hex_editor, self.current_encoding)
+        if select_tab:
+            self.tab_widget.setCurrentWidget(self.markdown_tab if is_markdown else self.text_view)
+    
+    def is_markdown_file(self) -> bool:
+        file_path = self.hex_editor.file_path or ''
+        return file_path.lower().endswith(('.md', '.markdown'))
+    
+    def start_line_index(self, reset: bool = False):
+        """在后台为文本视图建立行索引
+
+        reset 为 True（打开文件或更换编码）时文本视图立即改用正在建立的索引，
+        已扫描的部分即可滚动浏览；否则（编辑后重建）建立完成后再替换旧索引。
+        """
+        from .text_worker import LineIndexThread
+        self.stop_line_index()
+        self.line_index_timer.stop()
+        index = LineIndex(self.current_encoding, self.hex_editor.read(0, 4))
+        if reset:
+            self.text_view.set_source(self.hex_editor, index)
+        self.line_index_thread = LineIndexThread(self.hex_editor.snapshot(), index, parent=self)
+        self.line_index_thread.progressChanged.connect(self.on_line_index_progress)
+        self.line_index_thread.indexBuilt.connect(self.on_line_index_built)
+        self.line_index_thread.finished.connect(self.line_index_thread.deleteLater)
+        self.line_index_thread.start()
+    
+    def stop_line_index(self):
+        """停止正在运行的行索引线程"""
+        thread = self.line_index_thread
+        if thread is not None:
+            self.line_index_thread = None
+            thread.cancel()
+            thread.wait()
+    
+    def on_line_index_progress(self, percent):
+        """行索引建立中，文本视图可以滚动到已扫描的部分"""
+        thread = self.sender()
+        if thread is self.line_index_thread and self.text_view.index is thread.index:
+            self.text_view.update_scrollbar()
+            self.text_view.viewport().update()
+    
+    def on_line_index_built(self, index):
+        """行索引建立完成"""
+        if self.sender() is not self.line_index_thread:
+            return
+        self.line_index_thread = None
+        if index is None:
+            return
+        if self.text_view.index is index:
+            self.text_view.refresh()
+        else:
+            self.text_view.set_index(index)
+    
+    def show_goto_line_dialog(self):
+        """跳转到文本视图的指定行"""
+        count = self.text_view.line_count()
+        if count == 0:
+            return
+        last = min(count, 2 ** 31 - 1)
+        line, ok = QInputDialog.getInt(self, "跳转到行", f"行号 (1 - {last}):", 1, 1, last)
+        if ok:
+            self.tab_widget.setCurrentWidget(self.text_view)
+            self.text_view.jump_to_line(line - 1)
     
     def open_file(self):
         file_name, _ = QFileDialog.getOpenFileName(
@@ -110,36 +263,60 @@ class MainWindow(QMainWindow):
             "所有文件 (*.*)"
         )
         if file_name:
-            try:
-                # 加载文件到hex_editor
-                if self.hex_editor.load_file(file_name):
-                    # 更新十六进制视图
-                    self.hex_viewer.set_data(self.hex_editor.get_data())
-                    
-                    # 尝试以文本方式读取
-                    try:
-                        with open(file_name, 'r', encoding=self.current_encoding) as f:
-                            content = f.read()
-                            self.text_edit.setText(content)
-                            
-                            # 如果是markdown文件，更新markdown视图
-                            if file_name.lower().endswith(('.md', '.markdown')):
-                                self.markdown_viewer.set_markdown(content)
-                                self.tab_widget.setCurrentWidget(self.markdown_viewer)
-                            else:
-                                self.tab_widget.setCurrentWidget(self.text_edit)
-                    except UnicodeDecodeError:
-                        self.text_edit.setText(f"[无法使用 {self.current_encoding} 编码解析文件]")
-                    
-                    self.statusBar.showMessage(f"已打开文件: {file_name}")
-                else:
-                    self.statusBar.showMessage("打开文件失败")
-            except Exception as e:
-                self.statusBar.showMessage(f"打开文件失败: {str(e)}")
+            self.open_path(file_name)
+    
+    @perf.timed('window.open', 'io')
+    def open_path(self, file_name):
+        """打开指定文件：映射一次，十六进制、文本和Markdown视图共享同一缓冲区"""
+        try:
+            # 后台线程持有旧文件映射的快照，先停止并等待其退出再替换缓冲区
+            if not self.stop_background_tasks():
+                self.warn_plugins_running()
+                return False
+            # 加载文件到hex_editor
+            if self.hex_editor.load_file(file_name):
+                # 旧文件的搜索结果不再适用于新文件
+                if hasattr(self, 'search_dialog'):
+                    self.search_dialog.clear_results()
+                # 十六进制视图直接从编辑器按需读取，不复制数据（尚未创建时在创建时设置）
+                if self.hex_tab.is_created():
+                    self.hex_viewer.set_reader(self.hex_editor)
+                self.reset_search_index()
+                self.update_undo_actions()
+                
+                # 可信度足够时直接使用检测到的编码，避免反复手动尝试
+                if self.detect_action.isChecked():
+                    encoding, confidence = self.hex_editor.detect_encoding()[0]
+                    if confidence >= 0.5:
+                        self.current_encoding = encoding
+                
+                # 文本视图和Markdown视图从同一缓冲区解码，不再重新读取文件
+                self.update_text_views(select_tab=True, new_file=True)
+                
+                message = f"已打开文件: {file_name}（编码: {self.current_encoding}）"
+                if self.hex_editor.recovered:
+                    message += "，已回滚上次未完成的保存"
+                self.statusBar.showMessage(message)
+                return True
+            self.statusBar.showMessage("打开文件失败")
+        except Exception as e:
+            self.statusBar.showMessage(f"打开文件失败: {str(e)}")
+        # 仍显示原来的文档，重新启动被停止的后台任务
+        self.resume_background_tasks()
+        return False
     
     def save_file(self):
         if self.hex_editor.file_path:
-            if self.hex_editor.save_file():
+            # 原位保存会改写文件映射，替换保存会重新加载文件，先停止持有快照的后台任务
+            if not self.stop_background_tasks():
+                self.warn_plugins_running()
+                return
+            saved = self.hex_editor.save_file()
+            self.resume_background_tasks()
+            if saved:
+                if self.hex_tab.is_created():
+                    self.hex_viewer.refresh()
+                self.update_undo_actions()
                 self.statusBar.showMessage("文件已保存")
             else:
                 self.statusBar.showMessage("保存文件失败")
@@ -154,7 +331,13 @@ class MainWindow(QMainWindow):
             "所有文件 (*.*)"
         )
         if file_name:
-            if self.hex_editor.save_file(file_name):
+            # 另存为原文件时同样会替换并重新加载文件
+            if not self.stop_background_tasks():
+                self.warn_plugins_running()
+                return
+            saved = self.hex_editor.save_file(file_name)
+            self.resume_background_tasks()
+            if saved:
                 self.statusBar.showMessage(f"文件已保存为: {file_name}")
             else:
                 self.statusBar.showMessage("保存文件失败")
@@ -165,34 +348,230 @@ class MainWindow(QMainWindow):
         if not hasattr(self, 'search_dialog'):
             self.search_dialog = SearchDialog(self)
             self.search_dialog.searchRequested.connect(self.perform_search)
+            self.search_dialog.cancelRequested.connect(self.cancel_search)
         self.search_dialog.show()
         self.search_dialog.raise_()
         self.search_dialog.activateWindow()
     
-    def perform_search(self, search_text, case_sensitive, hex_search):
-        """执行搜索"""
+    def perform_search(self, search_text, case_sensitive, mode):
+        """执行搜索，在后台线程中分块查找并流式显示结果"""
+        from .search_worker import SearchThread
+        self.cancel_search()
         self.search_dialog.clear_results()
         
-        if hex_search:
-            try:
-                # 将十六进制字符串转换为bytes
-                pattern = bytes.fromhex(search_text.replace(' ', ''))
-                results = self.hex_viewer.search_hex(pattern, case_sensitive)
-            except ValueError:
-                self.statusBar.showMessage("无效的十六进制格式")
-                return
-        else:
-            results = self.hex_viewer.search_text(search_text, case_sensitive)
+        try:
+            pattern = self.compile_search_pattern(search_text, case_sensitive, mode)
+        except PatternError as e:
+            self.statusBar.showMessage(str(e))
+            return
+        except UnicodeEncodeError:
+            self.statusBar.showMessage(f"无法使用 {self.current_encoding} 编码搜索内容")
+            return
+        except OSError as e:
+            self.statusBar.showMessage(f"读取特征集失败: {str(e)}")
+            return
         
-        # 显示结果
-        for offset in results:
-            preview = self.hex_viewer.get_preview(offset)
-            self.search_dialog.add_result(offset, preview)
+        if self.hex_editor.get_size() == 0:
+            self.statusBar.showMessage("找到 0 个匹配项")
+            return
         
-        # 更新状态栏
-        self.statusBar.showMessage(f"找到 {len(results)} 个匹配项")
+        # 多进程查找直接读取磁盘文件，只能用于未修改的文档
+        file_path = None
+        if self.hex_editor.file_path and not self.hex_editor.is_modified():
+            file_path = self.hex_editor.file_path
+        # 有可用索引时只扫描候选区间
+        ranges = None
+        if self.search_index is not None and isinstance(pattern, LiteralPattern):
+            ranges = self.search_index.candidate_ranges(pattern.data, self.hex_editor.get_size())
+        self.search_thread = SearchThread(self.hex_editor.snapshot(), pattern,
+                                          workers=self.search_dialog.worker_count(),
+                                          file_path=file_path, ranges=ranges, parent=self)
+        self.search_thread.matchesFound.connect(self.on_search_matches)
+        self.search_thread.progressChanged.connect(self.on_search_progress)
+        self.search_thread.searchFinished.connect(self.on_search_finished)
+        self.search_thread.finished.connect(self.search_thread.deleteLater)
+        self.search_dialog.set_searching(True)
+        self.statusBar.showMessage("正在搜索...")
+        self.search_thread.start()
+    
+    def compile_search_pattern(self, search_text, case_sensitive, mode):
+        """根据搜索模式编译模式对象"""
+        from .search_dialog import SearchDialog
+        if mode == SearchDialog.MODE_HEX:
+            # 十六进制搜索按字节精确匹配，?? 表示任意字节
+            return compile_hex_pattern(search_text)
+        if mode == SearchDialog.MODE_REGEX:
+            return compile_regex(search_text, case_sensitive)
+        if mode == SearchDialog.MODE_SIGNATURES:
+            return parse_signature_file(search_text)
+        return LiteralPattern(search_text.encode(self.current_encoding), case_sensitive)
     
-    def jump_to_offset(self, offset):
+    def cancel_search(self):
+        """停止正在进行的搜索"""
+        thread = getattr(self, 'search_thread', None)
+        if thread is not None:
+            # 忽略旧线程尚未送达的信号
+            self.search_thread = None
+            thread.cancel()
+            thread.wait()
+            self.search_dialog.set_searching(False)
+            self.statusBar.showMessage("搜索已停止")
+    
+    def on_search_matches(self, matches):
+        """接收一批搜索结果"""
+        if self.sender() is self.search_thread:
+            self.search_dialog.add_results(matches)
+    
+    def on_search_progress(self, percent):
+        """更新搜索进度"""
+        if self.sender() is self.search_thread:
+            self.search_dialog.set_progress(percent)
+    
+    def on_search_finished(self, count, cancelled):
+        """搜索结束"""
+        if self.sender() is not self.search_thread:
+            return
+        self.search_thread = None
+        self.search_dialog.set_searching(False)
+        if cancelled:
+            self.statusBar.showMessage(f"搜索已停止，找到 {count} 个匹配项")
+        else:
+            self.statusBar.showMessage(f"找到 {count} 个匹配项")
+    
+    def jump_to_offset(self, offset, length=1):
         """跳转到指定偏移位置"""
-        self.tab_widget.setCurrentWidget(self.hex_viewer)
-        self.hex_viewer.jump_to_offset(offset)
+        self.tab_widget.setCurrentWidget(self.hex_tab)
+        self.hex_viewer.jump_to_offset(offset, length)
+    
+    def on_index_toggled(self, checked):
+        """启用或停用搜索索引"""
+        self.reset_search_index()
+    
+    def reset_search_index(self):
+        """丢弃当前索引，启用索引时为打开的文件重新加载或建立"""
+        self.stop_index_thread()
+        self.index_update_timer.stop()
+        self.search_index = None
+        if self.index_action.isChecked() and self.hex_editor.get_size():
+            file_path = None
+            if self.hex_editor.file_path and not self.hex_editor.is_modified():
+                file_path = self.hex_editor.file_path
+            from .search_worker import IndexThread
+            self.index_thread = IndexThread(self.hex_editor.snapshot(), file_path, parent=self)
+            self.index_thread.indexBuilt.connect(self.on_index_built)
+            self.index_thread.finished.connect(self.index_thread.deleteLater)
+            self.statusBar.showMessage("正在建立搜索索引...")
+            self.index_thread.start()
+    
+    def start_index_update(self):
+        """在后台重建编辑过的块的索引"""
+        if self.search_index is None or self.index_thread is not None:
+            return
+        if not self.search_index.needs_update(self.hex_editor.get_size()):
+            return
+        from .search_worker import IndexThread
+        self.index_thread = IndexThread(self.hex_editor.snapshot(), index=self.search_index, parent=self)
+        self.index_thread.updateReady.connect(self.on_index_update_ready)
+        self.index_thread.finished.connect(self.on_index_thread_finished)
+        self.index_thread.finished.connect(self.index_thread.deleteLater)
+        self.index_thread.start()
+    
+    def stop_index_thread(self):
+        """停止正在运行的索引线程"""
+        thread = self.index_thread
+        if thread is not None:
+            self.index_thread = None
+            thread.cancel()
+            thread.wait()
+    
+    def on_index_built(self, index):
+        """索引建立完成"""
+        if self.sender() is not self.index_thread:
+            return
+        self.index_thread = None
+        self.search_index = index
+        if index is not None:
+            self.statusBar.showMessage("搜索索引已就绪")
+            # 建立期间发生的编辑需要补充索引
+            for edit in self.sender().pending_edits:
+                index.mark_changed(*edit)
+            if index.needs_update(self.hex_editor.get_size()):
+                self.index_update_timer.start()
+    
+    def on_index_update_ready(self, results, generation, layout_generation, size):
+        """合并后台增量更新的结果"""
+        if self.sender() is self.index_thread and self.search_index is not None:
+            self.search_index.apply_update(results, generation, layout_generation, size)
+    
+    def on_index_thread_finished(self):
+        if self.sender() is self.index_thread:
+            self.index_thread = None
+            if self.search_index is not None and self.search_index.needs_update(self.hex_editor.get_size()):
+                self.index_update_timer.start()
+    
+    def on_document_changed(self, offset, old_length, new_length):
+        """文档被编辑后刷新视图并更新索引状态"""
+        self.update_undo_actions()
+        if self.hex_tab.is_created():
+            self.hex_viewer.document_changed(offset, old_length, new_length)
+        # 行索引已建立完成时只重新扫描被编辑的范围，否则在后台重新建立
+        index = self.text_view.index
+        if self.line_index_thread is not None or index is None or \
+                not index.apply_edit(self.hex_editor, offset, old_length, new_length):
+            self.line_index_timer.start()
+        self.text_view.refresh()
+        if self.markdown_tab.is_created() and self.is_markdown_file():
+            self.markdown_viewer.set_document(self.hex_editor, self.current_encoding, delay=True)
+        if self.search_index is not None:
+            self.search_index.mark_changed(offset, old_length, new_length)
+            self.index_update_timer.start()
+        elif self.index_thread is not None:
+            # 索引仍在建立，完成后再补记这些编辑
+            self.index_thread.pending_edits.append((offset, old_length, new_length))
+    
+    def stop_background_tasks(self) -> bool:
+        """停止所有持有文档快照的后台任务并等待线程退出，返回是否已全部停止
+
+        快照直接引用文件映射，关闭、重新加载或原位改写映射之前必须先调用。
+        线程方式的插件卡在一次处理中无法及时停止时返回 False，其他后台任务保持运行，
+        调用方必须放弃关闭或改写文件映射的操作。
+        """
+        # 插件可能无法停止，先处理插件，失败时不影响其他后台任务
+        if self.hex_tab.is_created() and not self.hex_viewer.cancel_plugins():
+            return False
+        self.cancel_search()
+        self.stop_index_thread()
+        self.index_update_timer.stop()
+        self.stop_line_index()
+        self.line_index_timer.stop()
+        if self.markdown_tab.is_created():
+            self.markdown_viewer.cancel()
+        return True
+
+    def warn_plugins_running(self):
+        QMessageBox.warning(self, "错误", "插件仍在执行且无法中断，请等待插件完成后重试")
+    
+    def resume_background_tasks(self):
+        """为当前文档重新启动被 stop_background_tasks 停止的行索引、搜索索引和Markdown渲染"""
+        if not self.hex_editor.file_path:
+            return
+        index = self.text_view.index
+        self.start_line_index(reset=index is None or not index.complete)
+        if self.search_index is None:
+            self.reset_search_index()
+        elif self.search_index.needs_update(self.hex_editor.get_size()):
+            self.index_update_timer.start()
+        if self.markdown_tab.is_created() and self.is_markdown_file():
+            self.markdown_viewer.set_document(self.hex_editor, self.current_encoding)
+    
+    def closeEvent(self, event):
+        """关闭窗口前停止后台任务并释放文件"""
+        if not self.stop_background_tasks():
+            answer = QMessageBox.question(self, "退出", "插件仍在执行且无法中断，是否强制退出？")
+            if answer != QMessageBox.Yes:
+                event.ignore()
+                return
+            # 无法结束的线程仍在使用文件映射，销毁它会使程序中止，直接结束进程
+            os._exit(0)
+        self.hex_editor.close()
+        super().closeEvent(event)
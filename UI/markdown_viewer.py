@@ -1,8 +1,7 @@
 from PySide6.QtWidgets import QWidget, QVBoxLayout, QTextBrowser
-from PySide6.QtCore import Qt
-import markdown
-import markdown.extensions.fenced_code
-import markdown.extensions.tables
+from PySide6.QtCore import Qt, QTimer
+from tools.markdown_renderer import MarkdownRenderer
+from tools import perf
 
 class MarkdownViewer(QWidget):
     def __init__(self, parent=None):
@@ -25,46 +24,86 @@ class MarkdownViewer(QWidget):
             }
         """)
         
-        # 添加默认CSS样式
-        self.css = """
-            <style>
-                body { font-family: Arial, sans-serif; line-height: 1.6; }
-                h1, h2, h3 { color: #333; }
-                code { background-color: #f5f5f5; padding: 2px 4px; border-radius: 4px; }
-                pre { background-color: #f5f5f5; padding: 10px; border-radius: 4px; }
-                table { border-collapse: collapse; width: 100%; }
-                th, td { border: 1px solid #ddd; padding: 8px; text-align: left; }
-                th { background-color: #f5f5f5; }
-                blockquote { border-left: 4px solid #ccc; margin: 0; padding-left: 16px; }
-            </style>
-        """
+        # 渲染在后台线程中逐块进行，未变化的块使用缓存；同一时间只有一个渲染线程
+        self.renderer = MarkdownRenderer()
+        self.render_thread = None
+        self.pending = None  # 待渲染的文本，或 (reader, 编码)
+        self.current_body = None
+        # 渲染线程建立的文档，替换时释放上一个
+        self.document = None
+        # 编辑时合并短时间内的多次更新
+        self.render_timer = QTimer(self)
+        self.render_timer.setSingleShot(True)
+        self.render_timer.setInterval(300)
+        self.render_timer.timeout.connect(self.start_render)
     
     def set_markdown(self, text):
         """设置并渲染Markdown内容"""
-        # 配置Markdown扩展
-        extensions = [
-            'fenced_code',
-            'tables',
-            'nl2br',
-            'attr_list'
-        ]
-        
-        # 转换Markdown为HTML
-        html = markdown.markdown(text, extensions=extensions)
-        
-        # 组合完整的HTML文档
-        full_html = f"""
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <meta charset="utf-8">
-            {self.css}
-        </head>
-        <body>
-            {html}
-        </body>
-        </html>
+        self.pending = text
+        self.render_timer.stop()
+        self.start_render()
+    
+    def set_document(self, reader, encoding: str, delay: bool = False):
+        """渲染文档内容，解码也在后台进行；delay 为 True 时（编辑后）延迟一段时间再渲染"""
+        self.pending = (reader, encoding)
+        if delay:
+            self.render_timer.start()
+        else:
+            self.render_timer.stop()
+            self.start_render()
+    
+    def start_render(self):
+        """启动后台渲染；正在渲染时等其结束后再渲染最新的内容"""
+        if self.render_thread is not None or self.pending is None:
+            return
+        from .markdown_worker import MarkdownThread
+        pending, self.pending = self.pending, None
+        if isinstance(pending, tuple):
+            reader, encoding = pending
+            if hasattr(reader, 'snapshot'):
+                reader = reader.snapshot()
+            self.render_thread = MarkdownThread(self.renderer, reader=reader, encoding=encoding,
+                                                font=self.browser.font(), current_body=self.current_body,
+                                                parent=self)
+        else:
+            self.render_thread = MarkdownThread(self.renderer, text=pending, font=self.browser.font(),
+                                                current_body=self.current_body, parent=self)
+        self.render_thread.documentReady.connect(self.on_document_ready)
+        self.render_thread.finished.connect(self.on_render_finished)
+        self.render_thread.start()
+    
+    @perf.timed('markdown.set_document', 'render')
+    def on_document_ready(self, body, document):
+        """显示渲染线程建立好的文档，保持滚动位置
+
+        主线程不再解析 HTML，只替换文档，大文档的每次更新也不会卡住界面。
         """
-        
-        # 设置HTML内容
-        self.browser.setHtml(full_html)
+        if self.sender() is not self.render_thread or body == self.current_body:
+            return
+        self.current_body = body
+        bar = self.browser.verticalScrollBar()
+        position = bar.value()
+        # 文档由浏览器持有，Python 端释放引用后不会被删除
+        document.setParent(self.browser)
+        self.browser.setDocument(document)
+        if self.document is not None:
+            self.document.deleteLater()
+        self.document = document
+        bar.setValue(min(position, bar.maximum()))
+    
+    def on_render_finished(self):
+        thread = self.sender()
+        if thread is self.render_thread:
+            self.render_thread = None
+            self.start_render()
+        thread.deleteLater()
+    
+    def cancel(self):
+        """停止渲染并丢弃待渲染的内容"""
+        self.render_timer.stop()
+        self.pending = None
+        thread = self.render_thread
+        if thread is not None:
+            self.render_thread = None
+            thread.cancel()
+            thread.wait()
@@ -0,0 +1,40 @@
+from PySide6.QtCore import QCoreApplication, Signal
+from PySide6.QtGui import QTextDocument
+from tools.markdown_renderer import render_page
+from tools import perf
+from .worker import CancellableThread
+
+class MarkdownThread(CancellableThread):
+    """在后台线程中解码并渲染Markdown，并在后台建立显示用的 QTextDocument"""
+    documentReady = Signal(str, object)  # 正文 HTML, QTextDocument（已移到主线程）
+
+    def __init__(self, renderer, text: str = None, reader=None, encoding: str = 'utf-8',
+                 font=None, current_body: str = None, parent=None):
+        super().__init__(reader, parent)
+        # 给出 reader 时在后台解码，否则直接渲染 text
+        self.renderer = renderer
+        self.text = text
+        self.encoding = encoding
+        # 文档使用的默认字体；正文与 current_body（正在显示的内容）相同时不再建立文档
+        self.font = font
+        self.current_body = current_body
+
+    def run(self):
+        try:
+            text = self.text
+            if text is None:
+                with perf.span('markdown.decode', 'decode'):
+                    text = self.reader.decode(self.encoding, 'replace')
+            body = self.renderer.render(text, self.is_cancelled)
+            if body is None or body == self.current_body or self.is_cancelled():
+                return
+            # QTextDocument 可重入：解析 HTML 和建立文本块在后台完成，主线程只需替换文档
+            with perf.span('markdown.document', 'render'):
+                document = QTextDocument()
+                if self.font is not None:
+                    document.setDefaultFont(self.font)
+                document.setHtml(render_page(body))
+            document.moveToThread(QCoreApplication.instance().thread())
+            self.documentReady.emit(body, document)
+        except Exception as e:
+            print(f"渲染Markdown失败: {str(e)}")
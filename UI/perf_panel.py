@@ -0,0 +1,100 @@
+from PySide6.QtWidgets import (QDockWidget, QWidget, QVBoxLayout, QHBoxLayout, QCheckBox,
+                               QPushButton, QTableWidget, QTableWidgetItem, QHeaderView,
+                               QFileDialog, QMessageBox)
+from PySide6.QtCore import Qt, QTimer
+from tools import perf
+
+class PerfPanel(QDockWidget):
+    """性能统计面板：显示各计时区间的汇总和计数器，可导出 Chrome Trace"""
+
+    def __init__(self, parent=None):
+        super().__init__("性能统计", parent)
+        self.setObjectName("PerfPanel")
+        self.setup_ui()
+        # 面板可见时定时刷新
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.setInterval(1000)
+        self.refresh_timer.timeout.connect(self.refresh)
+        self.visibilityChanged.connect(self.on_visibility_changed)
+
+    def setup_ui(self):
+        widget = QWidget()
+        layout = QVBoxLayout(widget)
+
+        button_layout = QHBoxLayout()
+        self.enable_check = QCheckBox("启用统计")
+        self.enable_check.setChecked(perf.enabled)
+        self.enable_check.toggled.connect(self.on_enable_toggled)
+        button_layout.addWidget(self.enable_check)
+        button_layout.addStretch()
+        reset_button = QPushButton("清空")
+        reset_button.clicked.connect(self.reset)
+        button_layout.addWidget(reset_button)
+        export_button = QPushButton("导出 Trace...")
+        export_button.setToolTip("导出为 Chrome Trace JSON，可在 chrome://tracing 或 Perfetto 中查看")
+        export_button.clicked.connect(self.export_trace)
+        button_layout.addWidget(export_button)
+        layout.addLayout(button_layout)
+
+        self.stats_table = QTableWidget(0, 5)
+        self.stats_table.setHorizontalHeaderLabels(["区间", "次数", "总计(ms)", "平均(ms)", "最长(ms)"])
+        self.stats_table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+        self.stats_table.verticalHeader().setVisible(False)
+        self.stats_table.setEditTriggers(QTableWidget.NoEditTriggers)
+        layout.addWidget(self.stats_table, 3)
+
+        self.counter_table = QTableWidget(0, 2)
+        self.counter_table.setHorizontalHeaderLabels(["计数器", "值"])
+        self.counter_table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+        self.counter_table.verticalHeader().setVisible(False)
+        self.counter_table.setEditTriggers(QTableWidget.NoEditTriggers)
+        layout.addWidget(self.counter_table, 1)
+
+        self.setWidget(widget)
+
+    def on_visibility_changed(self, visible):
+        if visible:
+            self.refresh()
+            self.refresh_timer.start()
+        else:
+            self.refresh_timer.stop()
+
+    def on_enable_toggled(self, checked):
+        if checked:
+            perf.enable()
+        else:
+            perf.disable()
+
+    @staticmethod
+    def _fill(table, rows):
+        table.setRowCount(len(rows))
+        for row, values in enumerate(rows):
+            for column, value in enumerate(values):
+                text = f"{value:.2f}" if isinstance(value, float) else str(value)
+                item = QTableWidgetItem(text)
+                if column:
+                    item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+                table.setItem(row, column, item)
+
+    def refresh(self):
+        """按总耗时从高到低刷新统计表"""
+        self._fill(self.stats_table, perf.stats())
+        self._fill(self.counter_table, sorted(perf.counters().items()))
+
+    def reset(self):
+        perf.reset()
+        self.refresh()
+
+    def export_trace(self):
+        file_name, _ = QFileDialog.getSaveFileName(
+            self,
+            "导出 Trace",
+            "lovelyhex-trace.json",
+            "JSON 文件 (*.json)"
+        )
+        if not file_name:
+            return
+        try:
+            perf.export_chrome_trace(file_name)
+        except Exception as e:
+            QMessageBox.warning(self, "错误", f"导出失败: {str(e)}")
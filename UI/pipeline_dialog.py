@@ -0,0 +1,129 @@
+from PySide6.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QLabel,
+                                 QLineEdit, QPushButton, QListWidget, QGroupBox,
+                                 QMessageBox)
+from PySide6.QtCore import Signal
+from plugins.pipeline import Pipeline, save_pipelines
+
+class PipelineDialog(QDialog):
+    pipelinesChanged = Signal()  # 保存的插件链发生变化
+
+    def __init__(self, plugin_names, pipelines, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("插件链")
+        self.resize(520, 420)
+        self.plugin_names = list(plugin_names)
+        # 与插件菜单共享的插件链列表，保存时原地修改
+        self.pipelines = pipelines
+        self.setup_ui()
+        self.refresh_saved()
+
+    def setup_ui(self):
+        layout = QVBoxLayout(self)
+
+        # 已保存的插件链
+        saved_group = QGroupBox("已保存的插件链")
+        saved_layout = QHBoxLayout()
+        self.saved_list = QListWidget()
+        self.saved_list.currentRowChanged.connect(self.on_saved_selected)
+        delete_button = QPushButton("删除")
+        delete_button.clicked.connect(self.delete_pipeline)
+        saved_layout.addWidget(self.saved_list)
+        saved_layout.addWidget(delete_button)
+        saved_group.setLayout(saved_layout)
+        layout.addWidget(saved_group)
+
+        # 名称
+        name_layout = QHBoxLayout()
+        name_layout.addWidget(QLabel("名称:"))
+        self.name_input = QLineEdit()
+        name_layout.addWidget(self.name_input)
+        layout.addLayout(name_layout)
+
+        # 可用插件和插件链步骤
+        steps_layout = QHBoxLayout()
+        self.plugin_list = QListWidget()
+        self.plugin_list.addItems(self.plugin_names)
+        self.plugin_list.itemDoubleClicked.connect(self.add_step)
+        self.steps_list = QListWidget()
+
+        buttons_layout = QVBoxLayout()
+        for text, slot in (("添加 →", self.add_step), ("移除", self.remove_step),
+                           ("上移", lambda: self.move_step(-1)), ("下移", lambda: self.move_step(1))):
+            button = QPushButton(text)
+            button.clicked.connect(slot)
+            buttons_layout.addWidget(button)
+        buttons_layout.addStretch()
+
+        steps_layout.addWidget(self.plugin_list)
+        steps_layout.addLayout(buttons_layout)
+        steps_layout.addWidget(self.steps_list)
+        layout.addLayout(steps_layout)
+
+        # 按钮区域
+        button_layout = QHBoxLayout()
+        save_button = QPushButton("保存")
+        save_button.clicked.connect(self.save_pipeline)
+        close_button = QPushButton("关闭")
+        close_button.clicked.connect(self.close)
+        button_layout.addWidget(save_button)
+        button_layout.addWidget(close_button)
+        layout.addLayout(button_layout)
+
+    def refresh_saved(self):
+        """刷新已保存的插件链列表"""
+        self.saved_list.clear()
+        self.saved_list.addItems([f"{p.name}: {p.description}" for p in self.pipelines])
+
+    def on_saved_selected(self, row):
+        """载入选中的插件链以便修改"""
+        if 0 <= row < len(self.pipelines):
+            pipeline = self.pipelines[row]
+            self.name_input.setText(pipeline.name)
+            self.steps_list.clear()
+            self.steps_list.addItems(pipeline.plugin_names)
+
+    def add_step(self, *args):
+        item = self.plugin_list.currentItem()
+        if item is not None:
+            self.steps_list.addItem(item.text())
+
+    def remove_step(self):
+        row = self.steps_list.currentRow()
+        if row >= 0:
+            self.steps_list.takeItem(row)
+
+    def move_step(self, delta):
+        row = self.steps_list.currentRow()
+        target = row + delta
+        if row < 0 or not 0 <= target < self.steps_list.count():
+            return
+        item = self.steps_list.takeItem(row)
+        self.steps_list.insertItem(target, item)
+        self.steps_list.setCurrentRow(target)
+
+    def save_pipeline(self):
+        """保存当前编辑的插件链，同名时覆盖"""
+        name = self.name_input.text().strip()
+        steps = [self.steps_list.item(i).text() for i in range(self.steps_list.count())]
+        if not name or not steps:
+            QMessageBox.warning(self, "错误", "请填写名称并至少添加一个插件")
+            return
+        pipeline = Pipeline(name, steps)
+        for i, existing in enumerate(self.pipelines):
+            if existing.name == name:
+                self.pipelines[i] = pipeline
+                break
+        else:
+            self.pipelines.append(pipeline)
+        if not save_pipelines(self.pipelines):
+            QMessageBox.warning(self, "错误", "保存插件链失败")
+        self.refresh_saved()
+        self.pipelinesChanged.emit()
+
+    def delete_pipeline(self):
+        row = self.saved_list.currentRow()
+        if 0 <= row < len(self.pipelines):
+            del self.pipelines[row]
+            save_pipelines(self.pipelines)
+            self.refresh_saved()
+            self.pipelinesChanged.emit()
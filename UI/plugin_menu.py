@@ -1,34 +1,204 @@
-from PySide6.QtWidgets import QMenu, QMessageBox
-from PySide6.QtCore import Qt, Signal
+from PySide6.QtWidgets import QMenu, QMessageBox, QProgressDialog
+from PySide6.QtCore import Qt, Signal, QTimer, QDeadlineTimer
 from PySide6.QtGui import QAction
 from plugins.plugin_manager import PluginManager
+from plugins.executor import PROCESS, PluginError, effective_mode
+from plugins.pipeline import Pipeline, load_pipelines
+from plugins.result_cache import DEFAULT_DISK_DIR
+from .plugin_worker import PluginThread
+from .pipeline_dialog import PipelineDialog
+from .plugin_watcher import PluginWatcher
+
+# 取消插件时最多等待线程结束的时间（毫秒）
+CANCEL_WAIT = 5000
 
 class PluginMenu(QMenu):
-    pluginTriggered = Signal(object, bytes)  # 插件, 数据
+    pluginTriggered = Signal(object, object, object)  # 插件, 结果（bytes 或临时文件）, 执行任务 PluginThread
     
     def __init__(self, parent=None):
         super().__init__("插件", parent)
-        self.plugin_manager = PluginManager()
+        self.plugin_manager = PluginManager.instance()
+        self.jobs = {}  # 正在执行的 PluginThread -> 进度对话框
+        self.pipelines = load_pipelines()
+        self.plugin_actions = {}  # 插件 -> 菜单项
         self.setup_menu()
+        # 自定义插件文件变化时只更新受影响的菜单项
+        self.watcher = PluginWatcher.instance()
+        self.watcher.pluginsChanged.connect(self.update_plugin_actions)
+    
+    def create_plugin_action(self, plugin):
+        action = QAction(plugin.name, self)
+        action.setToolTip(plugin.description)
+        action.setData(plugin)
+        action.triggered.connect(lambda checked, p=plugin: self.on_plugin_triggered(p))
+        self.plugin_actions[plugin] = action
+        return action
     
     def setup_menu(self):
         """设置插件菜单"""
         self.clear()
+        self.plugin_actions = {}
         for plugin in self.plugin_manager.get_plugins():
-            action = QAction(plugin.name, self)
-            action.setToolTip(plugin.description)
-            action.setData(plugin)
-            action.triggered.connect(lambda checked, p=plugin: self.on_plugin_triggered(p))
-            self.addAction(action)
+            self.addAction(self.create_plugin_action(plugin))
+        
+        # 插件链：把多个插件作为一次操作执行
+        self.plugin_separator = self.addSeparator()
+        pipeline_menu = self.addMenu("插件链")
+        for pipeline in self.pipelines:
+            action = QAction(pipeline.name, self)
+            action.setToolTip(pipeline.description)
+            action.triggered.connect(lambda checked, p=pipeline: self.on_plugin_triggered(p))
+            pipeline_menu.addAction(action)
+        if self.pipelines:
+            pipeline_menu.addSeparator()
+        pipeline_menu.addAction("管理插件链...", self.show_pipeline_dialog)
+        
+        # 结果缓存：只缓存声明为确定性的插件
+        cache_menu = self.addMenu("结果缓存")
+        cache = self.plugin_manager.result_cache
+        enable_action = cache_menu.addAction("启用结果缓存")
+        enable_action.setCheckable(True)
+        enable_action.setChecked(cache is not None)
+        enable_action.toggled.connect(self.on_cache_toggled)
+        disk_action = cache_menu.addAction("同时缓存到磁盘")
+        disk_action.setCheckable(True)
+        disk_action.setChecked(cache is not None and cache.disk_dir is not None)
+        disk_action.setEnabled(cache is not None)
+        disk_action.toggled.connect(self.on_disk_cache_toggled)
+        cache_menu.addSeparator()
+        cache_menu.addAction("缓存统计...", self.show_cache_stats)
+        clear_action = cache_menu.addAction("清空缓存", self.clear_cache)
+        clear_action.setEnabled(cache is not None)
+    
+    def on_cache_toggled(self, enabled):
+        if enabled:
+            self.plugin_manager.enable_cache()
+        else:
+            self.plugin_manager.disable_cache()
+        self.setup_menu()
+    
+    def on_disk_cache_toggled(self, enabled):
+        cache = self.plugin_manager.result_cache
+        if cache is not None:
+            cache.set_disk_dir(DEFAULT_DISK_DIR if enabled else None)
+        self.setup_menu()
+    
+    def show_cache_stats(self):
+        """显示结果缓存的命中统计"""
+        cache = self.plugin_manager.result_cache
+        if cache is None:
+            QMessageBox.information(self.parent(), "缓存统计", "结果缓存未启用")
+            return
+        stats = cache.stats()
+        QMessageBox.information(self.parent(), "缓存统计", (
+            f"内存命中: {stats['hits']}\n"
+            f"磁盘命中: {stats['disk_hits']}\n"
+            f"未命中: {stats['misses']}\n"
+            f"命中率: {stats['hit_rate']:.1%}\n"
+            f"缓存条目: {stats['entries']}（{stats['bytes']} 字节）\n"
+            f"淘汰次数: {stats['evictions']}"))
+    
+    def clear_cache(self):
+        if self.plugin_manager.result_cache is not None:
+            self.plugin_manager.result_cache.clear()
+    
+    def update_plugin_actions(self, removed, added):
+        """插件热重载后移除旧插件的菜单项，并在对应位置插入新插件的菜单项"""
+        for plugin in removed:
+            action = self.plugin_actions.pop(plugin, None)
+            if action is not None:
+                self.removeAction(action)
+                action.deleteLater()
+        plugins = self.plugin_manager.get_plugins()
+        for plugin in added:
+            later = plugins[plugins.index(plugin) + 1:]
+            before = next((self.plugin_actions[p] for p in later if p in self.plugin_actions),
+                          self.plugin_separator)
+            self.insertAction(before, self.create_plugin_action(plugin))
+    
+    def show_pipeline_dialog(self):
+        """编辑保存的插件链"""
+        dialog = PipelineDialog([p.name for p in self.plugin_manager.get_plugins()],
+                                self.pipelines, self.parent())
+        dialog.pipelinesChanged.connect(self.setup_menu)
+        dialog.exec()
     
     def on_plugin_triggered(self, plugin):
-        """处理插件触发事件"""
-        if hasattr(self.parent(), 'get_selected_data'):
-            data = self.parent().get_selected_data()
-            if data:
-                try:
-                    result = self.plugin_manager.process_data(plugin, data)
-                    if result is not None:
-                        self.pluginTriggered.emit(plugin, result)
-                except Exception as e:
-                    QMessageBox.warning(self, "错误", str(e))
+        """处理插件触发事件：在后台执行插件，界面保持响应"""
+        parent = self.parent()
+        if not hasattr(parent, 'get_selection_range'):
+            return
+        start, length = parent.get_selection_range()
+        if length == 0:
+            return
+        if isinstance(plugin, Pipeline):
+            try:
+                plugin.resolve(self.plugin_manager.get_plugins())
+            except PluginError as e:
+                QMessageBox.warning(parent, "错误", str(e))
+                return
+        reader = parent.reader
+        revision = getattr(reader, 'revision', None)
+        version = getattr(reader, 'version', None)
+        if hasattr(reader, 'snapshot'):
+            reader = reader.snapshot()
+        
+        thread = PluginThread(self.plugin_manager, plugin, reader, start, length, revision, version, self)
+        progress_dialog = QProgressDialog(f"正在执行 {plugin.name}...", "取消", 0, 100, parent)
+        progress_dialog.setWindowModality(Qt.WindowModal)
+        progress_dialog.setMinimumDuration(500)
+        progress_dialog.setAutoClose(False)
+        progress_dialog.setAutoReset(False)
+        progress_dialog.canceled.connect(thread.cancel)
+        thread.progressChanged.connect(progress_dialog.setValue)
+        thread.resultReady.connect(self.on_plugin_result)
+        thread.failed.connect(self.on_plugin_failed)
+        thread.finished.connect(self.on_plugin_finished)
+        self.jobs[thread] = progress_dialog
+        
+        # 子进程方式由执行器强制终止；线程方式无法打断，超时后放弃结果
+        if plugin.timeout is not None and effective_mode(plugin) != PROCESS:
+            QTimer.singleShot(int(plugin.timeout * 1000) + 500, self,
+                              lambda: self.on_plugin_timeout(thread))
+        thread.start()
+    
+    def on_plugin_result(self, plugin, result):
+        """附带执行任务转发结果，接收方据此得到处理的范围"""
+        self.pluginTriggered.emit(plugin, result, self.sender())
+    
+    def on_plugin_failed(self, plugin, message):
+        """插件执行失败"""
+        QMessageBox.warning(self.parent(), "错误", f"{plugin.name}: {message}")
+    
+    def on_plugin_timeout(self, thread):
+        """线程方式的插件超时：停止等待并丢弃之后的结果"""
+        progress_dialog = self.jobs.get(thread)
+        if progress_dialog is None or thread.is_cancelled():
+            return
+        thread.cancel()
+        progress_dialog.close()
+        QMessageBox.warning(self.parent(), "错误",
+                            f"{thread.plugin.name}: 插件执行超时（{thread.plugin.timeout} 秒）")
+    
+    def on_plugin_finished(self):
+        """后台执行结束，清理进度对话框和线程"""
+        thread = self.sender()
+        progress_dialog = self.jobs.pop(thread, None)
+        if progress_dialog is not None:
+            progress_dialog.close()
+            progress_dialog.deleteLater()
+        thread.deleteLater()
+    
+    def cancel_all(self, timeout: int = CANCEL_WAIT) -> bool:
+        """取消所有正在执行的插件并等待线程结束，返回是否全部结束
+        
+        子进程方式的插件在取消后立即被终止；线程方式的插件在处理完当前数据块后退出，
+        卡在一次 process 调用中的线程无法被打断，最多等待 timeout 毫秒。
+        仍在运行的线程留在 jobs 中（销毁仍在运行的 QThread 会使程序中止），
+        它们持有的文档快照仍被引用，调用方不能关闭或改写文件映射。
+        """
+        for thread in list(self.jobs):
+            thread.cancel()
+        deadline = QDeadlineTimer(timeout)
+        finished = [thread.wait(deadline) for thread in list(self.jobs)]
+        return all(finished)
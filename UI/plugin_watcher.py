@@ -0,0 +1,53 @@
+import os
+from PySide6.QtCore import QObject, QFileSystemWatcher, QTimer, Signal
+from plugins.plugin_manager import PluginManager
+
+class PluginWatcher(QObject):
+    """监视自定义插件目录，文件变化后只重新加载变化的插件"""
+    pluginsChanged = Signal(list, list)  # 移除的插件, 新增的插件
+
+    _instance = None
+
+    @classmethod
+    def instance(cls):
+        """与共享的插件管理器对应，进程内只有一个监视器"""
+        if cls._instance is None:
+            cls._instance = cls()
+        return cls._instance
+
+    def __init__(self, plugin_manager=None, parent=None):
+        super().__init__(parent)
+        self.plugin_manager = plugin_manager or PluginManager.instance()
+        self.watcher = QFileSystemWatcher(self)
+        self.watcher.directoryChanged.connect(self.schedule_reload)
+        self.watcher.fileChanged.connect(self.schedule_reload)
+        # 编辑器保存时可能连续触发多次，合并为一次重新加载
+        self.reload_timer = QTimer(self)
+        self.reload_timer.setSingleShot(True)
+        self.reload_timer.setInterval(300)
+        self.reload_timer.timeout.connect(self.reload)
+        self.update_paths()
+
+    def update_paths(self):
+        """监视插件目录和其中的插件文件（保存时被替换的文件需要重新加入）"""
+        directory = self.plugin_manager.custom_plugin_dir
+        paths = [directory] + [os.path.join(directory, name) for name in os.listdir(directory)
+                               if name.endswith('.py') and not name.startswith('_')]
+        watched = set(self.watcher.files()) | set(self.watcher.directories())
+        missing = [path for path in paths if path not in watched]
+        if missing:
+            self.watcher.addPaths(missing)
+
+    def schedule_reload(self, path):
+        self.reload_timer.start()
+
+    def reload(self):
+        """重新加载变化的插件文件并通知插件菜单"""
+        try:
+            removed, added = self.plugin_manager.reload_changed()
+            self.update_paths()
+        except Exception as e:
+            print(f"重新加载插件失败: {str(e)}")
+            return
+        if removed or added:
+            self.pluginsChanged.emit(removed, added)
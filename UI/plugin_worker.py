@@ -0,0 +1,37 @@
+from PySide6.QtCore import Signal
+from .worker import CancellableThread
+
+class PluginThread(CancellableThread):
+    """在后台线程中执行插件，子进程方式的插件由该线程负责等待和终止"""
+    resultReady = Signal(object, object)  # 插件, 结果（bytes 或临时文件）
+    failed = Signal(object, str)  # 插件, 错误信息
+
+    def __init__(self, plugin_manager, plugin, reader, offset: int, length: int, revision=None,
+                 version=None, parent=None):
+        super().__init__(reader, parent)
+        self.plugin_manager = plugin_manager
+        self.plugin = plugin
+        self.offset = offset
+        self.length = length
+        # 启动时文档的版本号，结果写回前据此判断文档是否已被修改
+        self.revision = revision
+        # 启动时文档内容的标识，结果缓存据此按范围查找
+        self.version = version
+
+    def run(self):
+        try:
+            result = self.plugin_manager.run(self.plugin, self.reader, self.offset, self.length,
+                                             progress=self._report_progress,
+                                             is_cancelled=self.is_cancelled,
+                                             version=self.version)
+        except Exception as e:
+            if not self._cancelled:
+                self.failed.emit(self.plugin, str(e))
+            return
+        if result is None:
+            return
+        if self._cancelled:
+            if not isinstance(result, (bytes, bytearray)):
+                result.close()
+            return
+        self.resultReady.emit(self.plugin, result)
@@ -0,0 +1,66 @@
+from PySide6.QtWidgets import QAbstractScrollArea
+from PySide6.QtCore import Qt
+from PySide6.QtGui import QFont, QColor
+
+class RowScrollArea(QAbstractScrollArea):
+    """按行虚拟滚动的等宽字体视图基类，十六进制视图和文本视图共用
+
+    子类提供 row_count() 并只绘制从 top_row() 开始的可见行，滚动与数据大小无关。
+    """
+
+    # QScrollBar 的取值范围是 32 位整数，超多行时按比例缩放
+    MAX_SCROLL = 2 ** 30
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.scroll_scale = 1
+        self.highlight_color = QColor(255, 255, 0, 100)
+
+        self.setFont(self.get_monospace_font())
+        self.setStyleSheet("""
+            QAbstractScrollArea {
+                background-color: white;
+                border: 1px solid #ccc;
+            }
+        """)
+        self.setFocusPolicy(Qt.StrongFocus)
+        self.verticalScrollBar().valueChanged.connect(self.viewport().update)
+
+    def get_monospace_font(self):
+        font = QFont("Consolas, Courier New")
+        font.setStyleHint(QFont.Monospace)
+        font.setPointSize(10)
+        return font
+
+    def char_width(self):
+        return self.fontMetrics().horizontalAdvance('0')
+
+    def line_height(self):
+        return self.fontMetrics().height()
+
+    def row_count(self):
+        return 0
+
+    def visible_rows(self):
+        return max(1, self.viewport().height() // self.line_height())
+
+    def top_row(self):
+        return self.verticalScrollBar().value() * self.scroll_scale
+
+    def update_scrollbar(self):
+        """根据行数和视口高度更新滚动范围"""
+        max_row = max(0, self.row_count() - self.visible_rows())
+        self.scroll_scale = max(1, -(-max_row // self.MAX_SCROLL))
+        bar = self.verticalScrollBar()
+        bar.setRange(0, -(-max_row // self.scroll_scale))
+        bar.setPageStep(max(1, self.visible_rows() // self.scroll_scale))
+        bar.setSingleStep(1)
+
+    def ensure_row_visible(self, row: int):
+        """滚动使指定行可见"""
+        top = self.top_row()
+        rows = self.visible_rows()
+        if row < top:
+            self.verticalScrollBar().setValue(row // self.scroll_scale)
+        elif row >= top + rows:
+            self.verticalScrollBar().setValue(-(-(row - rows + 1) // self.scroll_scale))
@@ -1,11 +1,19 @@
 from PySide6.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, 
                                  QLabel, QLineEdit, QPushButton, QCheckBox,
                                  QRadioButton, QButtonGroup, QGroupBox,
-                                 QListWidget, QListWidgetItem)
+                                 QListWidget, QListWidgetItem, QProgressBar,
+                                 QSpinBox, QFileDialog)
 from PySide6.QtCore import Qt, Signal
 
 class SearchDialog(QDialog):
-    searchRequested = Signal(str, bool, bool)  # 搜索文本, 是否区分大小写, 是否十六进制搜索
+    searchRequested = Signal(str, bool, str)  # 搜索内容, 是否区分大小写, 搜索模式
+    cancelRequested = Signal()  # 停止当前搜索
+    
+    # 搜索模式
+    MODE_TEXT = 'text'
+    MODE_HEX = 'hex'
+    MODE_REGEX = 'regex'
+    MODE_SIGNATURES = 'signatures'
     
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -13,6 +21,7 @@ class SearchDialog(QDialog):
         self.resize(400, 500)
         self.setup_ui()
         self.results = []
+        self.result_lengths = []
         
     def setup_ui(self):
         layout = QVBoxLayout(self)
@@ -21,8 +30,12 @@ class SearchDialog(QDialog):
         search_layout = QHBoxLayout()
         search_label = QLabel("查找内容:")
         self.search_input = QLineEdit()
+        self.browse_button = QPushButton("浏览...")
+        self.browse_button.clicked.connect(self.browse_signature_file)
+        self.browse_button.setVisible(False)
         search_layout.addWidget(search_label)
         search_layout.addWidget(self.search_input)
+        search_layout.addWidget(self.browse_button)
         layout.addLayout(search_layout)
         
         # 搜索选项
@@ -30,10 +43,37 @@ class SearchDialog(QDialog):
         options_layout = QVBoxLayout()
         
         self.case_sensitive = QCheckBox("区分大小写")
-        self.hex_search = QCheckBox("十六进制搜索")
-        
         options_layout.addWidget(self.case_sensitive)
-        options_layout.addWidget(self.hex_search)
+        
+        # 搜索模式
+        self.mode_group = QButtonGroup(self)
+        modes = [
+            (self.MODE_TEXT, "文本"),
+            (self.MODE_HEX, "十六进制（支持 ?? 通配符）"),
+            (self.MODE_REGEX, "正则表达式"),
+            (self.MODE_SIGNATURES, "特征集文件"),
+        ]
+        self.mode_buttons = {}
+        mode_layout = QHBoxLayout()
+        for mode, label in modes:
+            button = QRadioButton(label)
+            self.mode_group.addButton(button)
+            self.mode_buttons[mode] = button
+            mode_layout.addWidget(button)
+        self.mode_buttons[self.MODE_TEXT].setChecked(True)
+        self.mode_group.buttonToggled.connect(self.on_mode_changed)
+        options_layout.addLayout(mode_layout)
+        
+        # 并行查找进程数，1 表示在单个后台线程中查找
+        workers_layout = QHBoxLayout()
+        workers_layout.addWidget(QLabel("并行进程数:"))
+        self.workers_spin = QSpinBox()
+        self.workers_spin.setRange(1, 64)
+        self.workers_spin.setValue(1)
+        self.workers_spin.setToolTip("大于 1 时对未修改的文件使用多进程分段查找")
+        workers_layout.addWidget(self.workers_spin)
+        workers_layout.addStretch()
+        options_layout.addLayout(workers_layout)
         options_group.setLayout(options_layout)
         layout.addWidget(options_group)
         
@@ -46,43 +86,96 @@ class SearchDialog(QDialog):
         results_group.setLayout(results_layout)
         layout.addWidget(results_group)
         
+        # 搜索进度
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setRange(0, 100)
+        self.progress_bar.setVisible(False)
+        layout.addWidget(self.progress_bar)
+        
         # 按钮区域
         button_layout = QHBoxLayout()
         self.search_button = QPushButton("查找")
         self.search_button.clicked.connect(self.on_search)
+        self.stop_button = QPushButton("停止")
+        self.stop_button.setEnabled(False)
+        self.stop_button.clicked.connect(self.cancelRequested.emit)
         self.close_button = QPushButton("关闭")
         self.close_button.clicked.connect(self.close)
         button_layout.addWidget(self.search_button)
+        button_layout.addWidget(self.stop_button)
         button_layout.addWidget(self.close_button)
         layout.addLayout(button_layout)
         
         # 设置回车键触发搜索
         self.search_input.returnPressed.connect(self.on_search)
     
+    def search_mode(self) -> str:
+        """当前搜索模式"""
+        for mode, button in self.mode_buttons.items():
+            if button.isChecked():
+                return mode
+        return self.MODE_TEXT
+    
+    def on_mode_changed(self, *args):
+        """特征集模式下输入框填写特征集文件路径"""
+        signatures = self.search_mode() == self.MODE_SIGNATURES
+        self.browse_button.setVisible(signatures)
+        self.search_input.setPlaceholderText("特征集文件路径（每行：名称 = 十六进制模式）" if signatures else "")
+    
+    def browse_signature_file(self):
+        """选择特征集文件"""
+        file_name, _ = QFileDialog.getOpenFileName(self, "选择特征集文件", "", "所有文件 (*.*)")
+        if file_name:
+            self.search_input.setText(file_name)
+    
     def on_search(self):
         search_text = self.search_input.text()
         if search_text:
             self.searchRequested.emit(
                 search_text,
                 self.case_sensitive.isChecked(),
-                self.hex_search.isChecked()
+                self.search_mode()
             )
     
+    def worker_count(self) -> int:
+        """并行查找的进程数"""
+        return self.workers_spin.value()
+    
     def clear_results(self):
         self.results_list.clear()
         self.results = []
+        self.result_lengths = []
     
-    def add_result(self, offset, preview):
+    def add_result(self, offset, preview, length=1):
         """添加搜索结果"""
         self.results.append(offset)
+        self.result_lengths.append(length)
         item = QListWidgetItem(f"偏移: 0x{offset:08X} - {preview}")
         self.results_list.addItem(item)
     
+    def add_results(self, results):
+        """批量添加搜索结果 [(偏移, 长度, 预览), ...]"""
+        self.results.extend(offset for offset, _, _ in results)
+        self.result_lengths.extend(length for _, length, _ in results)
+        self.results_list.addItems([f"偏移: 0x{offset:08X} - {preview}" for offset, _, preview in results])
+    
+    def set_searching(self, searching: bool):
+        """切换搜索中/空闲状态"""
+        self.search_button.setEnabled(not searching)
+        self.stop_button.setEnabled(searching)
+        self.progress_bar.setVisible(searching)
+        if searching:
+            self.progress_bar.setValue(0)
+    
+    def set_progress(self, percent: int):
+        """更新搜索进度"""
+        self.progress_bar.setValue(percent)
+    
     def on_result_double_clicked(self, item):
         """双击结果项时触发"""
         row = self.results_list.row(item)
         if 0 <= row < len(self.results):
             offset = self.results[row]
-            # 通知父窗口跳转到指定位置
+            # 通知父窗口跳转到指定位置并选中匹配内容
             if self.parent():
-                self.parent().jump_to_offset(offset)
+                self.parent().jump_to_offset(offset, self.result_lengths[row])
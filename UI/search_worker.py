@@ -0,0 +1,114 @@
+import time
+from PySide6.QtCore import Signal
+from tools.search_engine import get_preview
+from tools import perf
+from tools.parallel_search import iter_matches_parallel
+from tools.search_index import SearchIndex, index_blocks, iter_ranges
+from .worker import CancellableThread
+
+class SearchThread(CancellableThread):
+    """在后台线程中分块查找，并分批发送匹配结果"""
+    matchesFound = Signal(list)  # [(偏移, 长度, 预览), ...]
+    searchFinished = Signal(int, bool)  # 匹配数, 是否被取消
+
+    BATCH_SIZE = 256
+    BATCH_INTERVAL = 0.1  # 秒
+
+    def __init__(self, reader, pattern, max_results: int = 100000, workers: int = 1,
+                 file_path: str = None, ranges: list = None, parent=None):
+        super().__init__(reader, parent)
+        # pattern 为 tools.patterns 中的模式对象
+        self.pattern = pattern
+        self.max_results = max_results
+        # workers > 1 且给出 file_path（文档未修改）时使用多进程查找
+        self.workers = workers
+        self.file_path = file_path
+        # 搜索索引给出的候选区间，为 None 时扫描整个文件
+        self.ranges = ranges
+
+    def _iter_matches(self):
+        if self.ranges is not None:
+            return iter_ranges(self.reader, self.pattern, self.ranges,
+                               progress=self._report_progress,
+                               is_cancelled=self.is_cancelled)
+        if self.workers > 1 and self.file_path:
+            return iter_matches_parallel(self.file_path, self.pattern,
+                                         workers=self.workers,
+                                         progress=self._report_progress,
+                                         is_cancelled=self.is_cancelled)
+        return self.pattern.iter_matches(self.reader,
+                                         progress=self._report_progress,
+                                         is_cancelled=self.is_cancelled)
+
+    @perf.timed('search', 'search')
+    def run(self):
+        count = 0
+        batch = []
+        last_emit = time.monotonic()
+        try:
+            for offset, length, name in self._iter_matches():
+                preview = get_preview(self.reader, offset)
+                if name:
+                    preview = f"[{name}] {preview}"
+                batch.append((offset, length, preview))
+                count += 1
+                if count >= self.max_results:
+                    break
+                now = time.monotonic()
+                if len(batch) >= self.BATCH_SIZE or now - last_emit >= self.BATCH_INTERVAL:
+                    self.matchesFound.emit(batch)
+                    batch = []
+                    last_emit = now
+        except Exception as e:
+            print(f"查找失败: {str(e)}")
+        if batch:
+            self.matchesFound.emit(batch)
+        perf.count('search.matches', count)
+        self.searchFinished.emit(count, self._cancelled)
+
+class IndexThread(CancellableThread):
+    """在后台线程中加载、建立或增量更新搜索索引"""
+    indexBuilt = Signal(object)  # SearchIndex，失败或取消时为 None
+    updateReady = Signal(object, int, int, int)  # 块结果, generation, layout_generation, 大小
+
+    def __init__(self, reader, file_path: str = None, index: SearchIndex = None, parent=None):
+        super().__init__(reader, parent)
+        # 给出 index 时只重建其脏块和未索引部分
+        self.file_path = file_path
+        self.index = index
+        self.size = reader.get_size()
+        # 建立期间界面线程记录的编辑，完成后由调用方补记到索引
+        self.pending_edits = []
+        if index is not None:
+            self.blocks = index.pending_blocks(self.size)
+            self.generation = index.generation
+            self.layout_generation = index.layout_generation
+
+    def run(self):
+        try:
+            if self.index is not None:
+                results = index_blocks(self.reader, self.blocks, self.index.block_size,
+                                       self.is_cancelled, self._report_progress)
+                if results is not None:
+                    self.updateReady.emit(results, self.generation, self.layout_generation, self.size)
+                return
+            self.indexBuilt.emit(self._load_or_build())
+        except Exception as e:
+            print(f"建立搜索索引失败: {str(e)}")
+            if self.index is None:
+                self.indexBuilt.emit(None)
+
+    def _load_or_build(self):
+        if self.file_path:
+            index = SearchIndex.load(self.file_path)
+            if index is not None:
+                return index
+            key = SearchIndex.file_key(self.file_path)
+        index = SearchIndex()
+        if not index.build(self.reader, self._report_progress, self.is_cancelled):
+            return None
+        # 建立期间文件未被外部修改时才保存到磁盘
+        if self.file_path and SearchIndex.file_key(self.file_path) == key:
+            index.key = key
+            index.save(self.file_path)
+        return index
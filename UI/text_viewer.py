@@ -0,0 +1,223 @@
+from collections import OrderedDict
+from PySide6.QtWidgets import QApplication
+from PySide6.QtCore import Qt, Signal
+from PySide6.QtGui import QColor, QPainter, QKeySequence
+from tools import perf
+from .scroll_view import RowScrollArea
+
+class TextView(RowScrollArea):
+    """虚拟化的只读文本视图，只解码并绘制可见行
+
+    行首偏移来自 LineIndex（可以仍在后台建立），每行按需从范围读取接口
+    （提供 get_size() 和 read(offset, length)）读取并解码，滚动和跳转与文件大小无关。
+    """
+    cursorLineChanged = Signal(int)  # 当前行号（从 0 开始）
+
+    TAB_SIZE = 4
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.reader = None
+        self.index = None
+        self.anchor = None
+        self.cursor = None
+        self.line_cache = OrderedDict()  # 行号 -> (文本, 像素宽度)
+        self.max_cached_lines = 1024
+
+        self.horizontalScrollBar().valueChanged.connect(self.viewport().update)
+
+    # ---- 几何 ----
+
+    def line_count(self):
+        return self.index.line_count() if self.index is not None else 0
+
+    def row_count(self):
+        return self.line_count()
+
+    def gutter_width(self):
+        """行号栏宽度"""
+        return (max(4, len(str(self.line_count()))) + 2) * self.char_width()
+
+    def update_horizontal(self, width: int):
+        """按可见行中最长一行的宽度更新水平滚动范围"""
+        bar = self.horizontalScrollBar()
+        visible = self.viewport().width() - self.gutter_width()
+        bar.setRange(0, max(0, width - visible + self.char_width()))
+        bar.setPageStep(max(1, visible))
+        bar.setSingleStep(self.char_width() * 4)
+
+    # ---- 数据 ----
+
+    def set_source(self, reader, index):
+        """设置数据源和行索引，回到文件开头"""
+        self.reader = reader
+        self.index = index
+        self.anchor = self.cursor = None
+        self.line_cache.clear()
+        self.update_scrollbar()
+        self.verticalScrollBar().setValue(0)
+        self.horizontalScrollBar().setValue(0)
+        self.viewport().update()
+
+    def set_index(self, index):
+        """换用新的行索引（文档编辑或更换编码后），尽量保持当前滚动位置"""
+        top = self.top_row()
+        self.index = index
+        count = self.line_count()
+        if self.cursor is not None and self.cursor >= count:
+            self.anchor = self.cursor = None
+        self.line_cache.clear()
+        self.update_scrollbar()
+        self.verticalScrollBar().setValue(min(top, max(count - 1, 0)) // self.scroll_scale)
+        self.viewport().update()
+
+    def refresh(self):
+        """数据内容或编码变化后丢弃已解码的行并重绘"""
+        self.line_cache.clear()
+        self.update_scrollbar()
+        self.viewport().update()
+
+    def line_text(self, line: int):
+        """返回 (第 line 行的文本, 像素宽度)，使用 LRU 缓存"""
+        entry = self.line_cache.get(line)
+        if entry is not None:
+            self.line_cache.move_to_end(line)
+            return entry
+        text = self.index.read_line(self.reader, line).expandtabs(self.TAB_SIZE)
+        entry = (text, self.fontMetrics().horizontalAdvance(text))
+        self.line_cache[line] = entry
+        while len(self.line_cache) > self.max_cached_lines:
+            self.line_cache.popitem(last=False)
+        return entry
+
+    # ---- 选区 ----
+
+    def selection(self):
+        """返回选中的 (首行, 末行)，无选区时返回 None"""
+        if self.anchor is None or self.cursor is None:
+            return None
+        return min(self.anchor, self.cursor), max(self.anchor, self.cursor)
+
+    def set_selection(self, anchor: int, cursor: int):
+        self.anchor, self.cursor = anchor, cursor
+        self.ensure_row_visible(cursor)
+        self.viewport().update()
+        self.cursorLineChanged.emit(cursor)
+
+    def jump_to_line(self, line: int) -> bool:
+        """跳转到第 line 行（从 0 开始）并选中该行，该行尚未建立索引时返回 False"""
+        if not 0 <= line < self.line_count():
+            return False
+        self.verticalScrollBar().setValue(line // self.scroll_scale)
+        self.set_selection(line, line)
+        self.setFocus()
+        return True
+
+    def selected_text(self) -> str:
+        selection = self.selection()
+        if selection is None:
+            return ""
+        return self.index.read_lines(self.reader, *selection)
+
+    def copy(self):
+        """复制选中行的完整文本"""
+        text = self.selected_text()
+        if text:
+            QApplication.clipboard().setText(text)
+
+    def line_at(self, pos):
+        """将视口坐标转换为行号"""
+        count = self.line_count()
+        if count == 0:
+            return None
+        return min(self.top_row() + max(0, pos.y()) // self.line_height(), count - 1)
+
+    # ---- 事件 ----
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self.update_scrollbar()
+
+    def mousePressEvent(self, event):
+        line = self.line_at(event.position().toPoint())
+        if line is None or event.button() != Qt.LeftButton:
+            return
+        if event.modifiers() & Qt.ShiftModifier and self.anchor is not None:
+            self.set_selection(self.anchor, line)
+        else:
+            self.set_selection(line, line)
+
+    def mouseMoveEvent(self, event):
+        if not event.buttons() & Qt.LeftButton or self.anchor is None:
+            return
+        line = self.line_at(event.position().toPoint())
+        if line is not None and line != self.cursor:
+            self.set_selection(self.anchor, line)
+
+    def keyPressEvent(self, event):
+        count = self.line_count()
+        if event.matches(QKeySequence.Copy):
+            self.copy()
+            return
+        if count == 0:
+            return super().keyPressEvent(event)
+        cursor = self.cursor if self.cursor is not None else self.top_row()
+        page = self.visible_rows()
+        moves = {
+            Qt.Key_Up: -1,
+            Qt.Key_Down: 1,
+            Qt.Key_PageUp: -page,
+            Qt.Key_PageDown: page,
+        }
+        key = event.key()
+        if key in moves:
+            target = cursor + moves[key]
+        elif key == Qt.Key_Home and event.modifiers() & Qt.ControlModifier:
+            target = 0
+        elif key == Qt.Key_End and event.modifiers() & Qt.ControlModifier:
+            target = count - 1
+        elif key in (Qt.Key_Left, Qt.Key_Right):
+            bar = self.horizontalScrollBar()
+            bar.setValue(bar.value() + (bar.singleStep() if key == Qt.Key_Right else -bar.singleStep()))
+            return
+        else:
+            return super().keyPressEvent(event)
+        target = min(max(target, 0), count - 1)
+        if event.modifiers() & Qt.ShiftModifier and self.anchor is not None:
+            self.set_selection(self.anchor, target)
+        else:
+            self.set_selection(target, target)
+
+    @perf.timed('text.paint', 'render')
+    def paintEvent(self, event):
+        painter = QPainter(self.viewport())
+        painter.fillRect(self.viewport().rect(), Qt.white)
+        if self.index is None or self.reader is None:
+            return
+        count = self.line_count()
+        lh = self.line_height()
+        ascent = self.fontMetrics().ascent()
+        gutter = self.gutter_width()
+        width = self.viewport().width()
+        height = self.viewport().height()
+        text_x = gutter + self.char_width() // 2 - self.horizontalScrollBar().value()
+        selection = self.selection() or (-1, -2)
+
+        painter.fillRect(0, 0, gutter, height, QColor('#f0f0f0'))
+        first = self.top_row()
+        widest = 0
+        for i in range(min(self.visible_rows() + 1, count - first)):
+            line = first + i
+            y = i * lh
+            text, text_width = self.line_text(line)
+            widest = max(widest, text_width)
+            if selection[0] <= line <= selection[1]:
+                painter.fillRect(gutter, y, width - gutter, lh, self.highlight_color)
+            painter.setClipping(False)
+            painter.setPen(QColor('#555'))
+            painter.drawText(0, y, gutter - self.char_width(), lh, Qt.AlignRight | Qt.AlignVCenter,
+                             str(line + 1))
+            painter.setClipRect(gutter, 0, width - gutter, height)
+            painter.setPen(Qt.black)
+            painter.drawText(text_x, y + ascent, text)
+        self.update_horizontal(widest)
@@ -0,0 +1,20 @@
+from PySide6.QtCore import Signal
+from .worker import CancellableThread
+
+class LineIndexThread(CancellableThread):
+    """在后台线程中为文本视图建立行索引"""
+    indexBuilt = Signal(object)  # LineIndex，失败或取消时为 None
+
+    def __init__(self, reader, index, parent=None):
+        super().__init__(reader, parent)
+        # index 为新建的 LineIndex，建立过程中界面线程可读取已完成的部分
+        self.index = index
+
+    def run(self):
+        try:
+            if self.index.build(self.reader, self._report_progress, self.is_cancelled):
+                self.indexBuilt.emit(self.index)
+                return
+        except Exception as e:
+            print(f"建立行索引失败: {str(e)}")
+        self.indexBuilt.emit(None)
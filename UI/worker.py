@@ -0,0 +1,29 @@
+from PySide6.QtCore import QThread, Signal
+
+class CancellableThread(QThread):
+    """可取消并报告进度的后台任务基类，查找、索引、插件和 Markdown 渲染线程共用
+
+    reader 应为文档快照，避免与界面线程的编辑冲突；快照引用的映射在线程结束前
+    不能被关闭，替换或关闭文件前需先 cancel() 并等待线程结束。
+    """
+    progressChanged = Signal(int)  # 百分比
+
+    def __init__(self, reader=None, parent=None):
+        super().__init__(parent)
+        self.reader = reader
+        self._cancelled = False
+        self._percent = -1
+
+    def cancel(self):
+        """请求停止，线程在下一次检查 is_cancelled() 时退出"""
+        self._cancelled = True
+
+    def is_cancelled(self):
+        return self._cancelled
+
+    def _report_progress(self, done: int, total: int):
+        """按百分比发送进度，百分比不变时不发送"""
+        percent = done * 100 // total if total else 100
+        if percent != self._percent:
+            self._percent = percent
+            self.progressChanged.emit(percent)
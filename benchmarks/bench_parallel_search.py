@@ -0,0 +1,83 @@
+"""并行查找基准测试
+
+生成一个合成文件，分别用单线程和不同进程数查找，输出耗时和加速比：
+
+    python benchmarks/bench_parallel_search.py --size-mb 2048 --workers 1 2 4 8
+"""
+import argparse
+import mmap
+import os
+import sys
+import tempfile
+import time
+
+# 添加项目根目录到Python路径
+root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if root_dir not in sys.path:
+    sys.path.append(root_dir)
+
+from tools.parallel_search import iter_matches_parallel, MmapReader
+from tools.patterns import LiteralPattern
+
+
+def make_file(path: str, size_mb: int, pattern: bytes):
+    """写入伪随机数据，每 MB 中间放置一次模式串"""
+    block = bytearray(os.urandom(1024 * 1024))
+    with open(path, 'wb') as f:
+        for _ in range(size_mb):
+            block[512 * 1024:512 * 1024 + len(pattern)] = pattern
+            f.write(block)
+
+
+def run_serial(path: str, pattern: bytes, case_sensitive: bool) -> tuple[float, int]:
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        start = time.perf_counter()
+        literal = LiteralPattern(pattern, case_sensitive)
+        count = sum(1 for _ in literal.iter_matches(MmapReader(mapped)))
+        return time.perf_counter() - start, count
+
+
+def run_parallel(path: str, pattern: bytes, case_sensitive: bool, workers: int) -> tuple[float, int]:
+    start = time.perf_counter()
+    literal = LiteralPattern(pattern, case_sensitive)
+    count = sum(1 for _ in iter_matches_parallel(path, literal, workers=workers))
+    return time.perf_counter() - start, count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="并行查找基准测试")
+    parser.add_argument('--size-mb', type=int, default=512, help="合成文件大小 (MB)")
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8], help="测试的进程数")
+    parser.add_argument('--ignore-case', action='store_true', help="不区分大小写查找")
+    parser.add_argument('--file', help="使用已有文件而不是生成合成文件")
+    args = parser.parse_args()
+
+    pattern = b'LovelyHexNeedle'
+    case_sensitive = not args.ignore_case
+    path = args.file
+    tmp = None
+    if path is None:
+        fd, tmp = tempfile.mkstemp(suffix='.bin')
+        os.close(fd)
+        path = tmp
+        print(f"生成 {args.size_mb} MB 合成文件...")
+        make_file(path, args.size_mb, pattern)
+
+    try:
+        size_mb = os.path.getsize(path) / (1024 * 1024)
+        base, count = run_serial(path, pattern, case_sensitive)
+        print(f"{'模式':<10}{'耗时(s)':>10}{'MB/s':>10}{'加速比':>8}{'匹配数':>10}")
+        print(f"{'serial':<10}{base:>10.3f}{size_mb / base:>10.0f}{1.0:>8.2f}{count:>10}")
+        for workers in args.workers:
+            elapsed, found = run_parallel(path, pattern, case_sensitive, workers)
+            if found != count:
+                print(f"结果不一致: {workers} 进程找到 {found} 个，单线程找到 {count} 个")
+            print(f"{f'x{workers}':<10}{elapsed:>10.3f}{size_mb / elapsed:>10.0f}"
+                  f"{base / elapsed:>8.2f}{found:>10}")
+    finally:
+        if tmp is not None:
+            os.remove(tmp)
+
+
+if __name__ == '__main__':
+    main()
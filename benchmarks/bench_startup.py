@@ -0,0 +1,67 @@
+"""启动时间基准测试
+
+多次以 offscreen 平台启动编辑器，测量从启动进程到首个窗口就绪的时间：
+
+    python benchmarks/bench_startup.py --runs 10 --target-ms 300
+
+中位数超过 --target-ms 时以非零状态退出，可用于自动化检查。
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+READY_LABEL = "首个窗口就绪"
+
+
+def run_once(python: str) -> tuple[float, list]:
+    """启动一次，返回 (到首个窗口就绪的墙钟时间 ms, 启动追踪输出)"""
+    env = dict(os.environ, QT_QPA_PLATFORM='offscreen', LOVELYHEX_STARTUP_TRACE='1')
+    start = time.perf_counter()
+    process = subprocess.Popen([python, os.path.join(root_dir, 'main.py'), '--quit-after-startup'],
+                               stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, env=env,
+                               text=True, encoding='utf-8')
+    ready = None
+    trace = []
+    for line in process.stderr:
+        if line.startswith('[startup]'):
+            trace.append(line.rstrip())
+            if READY_LABEL in line and ready is None:
+                ready = (time.perf_counter() - start) * 1000
+    process.wait()
+    if ready is None:
+        raise RuntimeError(f"编辑器未能启动（退出码 {process.returncode}）")
+    return ready, trace
+
+
+def main():
+    parser = argparse.ArgumentParser(description="启动时间基准测试")
+    parser.add_argument('--runs', type=int, default=10, help="启动次数")
+    parser.add_argument('--target-ms', type=float, default=300, help="首个窗口就绪时间的目标 (ms)")
+    parser.add_argument('--python', default=sys.executable, help="使用的 Python 解释器")
+    parser.add_argument('--trace', action='store_true', help="输出最后一次启动的各阶段耗时")
+    args = parser.parse_args()
+
+    # 第一次启动会生成 .pyc 等缓存，不计入结果
+    run_once(args.python)
+    times = []
+    trace = []
+    for _ in range(args.runs):
+        elapsed, trace = run_once(args.python)
+        times.append(elapsed)
+
+    median = statistics.median(times)
+    print(f"{'次数':<6}{'最短(ms)':>10}{'中位数(ms)':>12}{'最长(ms)':>10}{'目标(ms)':>10}")
+    print(f"{len(times):<6}{min(times):>10.1f}{median:>12.1f}{max(times):>10.1f}{args.target_ms:>10.0f}")
+    if args.trace:
+        print("\n".join(trace))
+    if median > args.target_ms:
+        print(f"未达到目标: 中位数 {median:.1f} ms > {args.target_ms:.0f} ms")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
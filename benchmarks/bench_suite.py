@@ -0,0 +1,439 @@
+"""热点路径基准测试套件
+
+以 offscreen 平台运行，覆盖 HexEditor 的加载、编辑、插入、删除和保存，十六进制行格式化和
+set_data，查找，插件发现和 process_data，Markdown 渲染以及窗口启动。按文件大小变化的用例
+对每个 --sizes（MB，可到数 GB）各生成一个合成文件：
+
+    python benchmarks/bench_suite.py run --sizes 1 64 1024 --output results.json
+    python benchmarks/bench_suite.py compare base.json results.json --threshold 10
+
+每个用例在单独的子进程中运行，峰值内存 (RSS) 互不影响。结果写入 JSON，包括吞吐量、
+延迟百分位和峰值 RSS；compare 在中位延迟、吞吐量或峰值 RSS 变差超过阈值（百分比）时
+列出回退并以非零状态退出，可用于自动化检查。
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+# 添加项目根目录到Python路径
+root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if root_dir not in sys.path:
+    sys.path.append(root_dir)
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+MB = 1024 * 1024
+NEEDLE = b'LovelyHexNeedle'
+# 每次随机编辑的次数，以及插入/删除的字节数
+EDIT_OPS = 1000
+EDIT_BYTES = 16
+# set_data 和插件处理需要把数据读入内存，超过上限的文件只取开头部分
+IN_MEMORY_LIMIT = 64 * MB
+MARKDOWN_SECTIONS = 2000
+
+
+def make_file(path: str, size: int):
+    """写入可复现的伪随机数据，每 MB 中间放置一次查找用的模式串"""
+    block = bytearray(random.Random(0).randbytes(MB))
+    block[MB // 2:MB // 2 + len(NEEDLE)] = NEEDLE
+    with open(path, 'wb') as f:
+        for _ in range(size // MB):
+            f.write(block)
+        f.write(block[:size % MB])
+
+
+def make_markdown(sections: int = MARKDOWN_SECTIONS) -> str:
+    parts = []
+    for i in range(sections):
+        parts.append(f"## 第 {i} 节\n\n这是第 {i} 段，包含 **粗体**、*斜体*、`代码` 和[链接](https://example.com/{i})。\n\n"
+                     f"- 列表项 {i}.1\n- 列表项 {i}.2\n\n```python\nprint({i})\n```\n\n"
+                     f"| 列 | 值 |\n| --- | --- |\n| {i} | {i * i} |\n")
+    return "\n".join(parts)
+
+
+def peak_rss_mb():
+    """本进程及其已结束子进程的峰值 RSS (MB)，平台不支持时返回 None"""
+    if resource is None:
+        return None
+    peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+               resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    # Linux 以 KB 为单位，macOS 以字节为单位
+    return peak / (MB if sys.platform == 'darwin' else 1024)
+
+
+def timed(fn, *args) -> float:
+    start = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - start
+
+
+def qt_app():
+    from PySide6.QtWidgets import QApplication
+    return QApplication.instance() or QApplication([])
+
+
+def read_head(path: str, size: int) -> bytes:
+    with open(path, 'rb') as f:
+        return f.read(min(size, IN_MEMORY_LIMIT))
+
+
+# ---- 用例：返回 [(耗时 s, 处理的字节数)]，每项是一次操作 ----
+
+def bench_load(path, size):
+    from tools.hex_editor import HexEditor
+    samples = []
+    for _ in range(5):
+        editor = HexEditor()
+        samples.append((timed(editor.load_file, path), size))
+        editor.close()
+    return samples
+
+
+def _random_edits(path, size, apply):
+    from tools.hex_editor import HexEditor
+    editor = HexEditor()
+    editor.load_file(path)
+    rng = random.Random(1)
+    samples = []
+    for _ in range(EDIT_OPS):
+        offset = rng.randrange(max(1, editor.get_size() - EDIT_BYTES))
+        samples.append((timed(apply, editor, offset), EDIT_BYTES))
+    editor.close()
+    return samples
+
+
+def bench_edit(path, size):
+    return _random_edits(path, size, lambda editor, offset: editor.edit_byte(offset, 0x41))
+
+
+def bench_insert(path, size):
+    data = b'\xAA' * EDIT_BYTES
+    return _random_edits(path, size, lambda editor, offset: editor.insert_bytes(offset, data))
+
+
+def bench_delete(path, size):
+    return _random_edits(path, size, lambda editor, offset: editor.delete_range(offset, EDIT_BYTES))
+
+
+def bench_save(path, size):
+    """原位保存：改写若干字节（写回原值，文件内容不变）后保存"""
+    from tools.hex_editor import HexEditor
+    editor = HexEditor()
+    editor.load_file(path)
+    rng = random.Random(2)
+    samples = []
+    for _ in range(5):
+        for _ in range(EDIT_BYTES):
+            offset = rng.randrange(size)
+            editor.edit_byte(offset, editor.read(offset, 1)[0])
+        samples.append((timed(editor.save_file), EDIT_BYTES))
+    editor.close()
+    return samples
+
+
+def bench_save_as(path, size):
+    """大小变化后另存为新文件：完整写出所有数据"""
+    from tools.hex_editor import HexEditor
+    editor = HexEditor()
+    editor.load_file(path)
+    editor.insert_bytes(size // 2, b'\x00')
+    target = path + '.saved'
+    samples = []
+    try:
+        for _ in range(3):
+            samples.append((timed(editor.save_file, target), size + 1))
+    finally:
+        editor.close()
+        if os.path.exists(target):
+            os.remove(target)
+    return samples
+
+
+def bench_format_hex_line(path, size):
+    from UI.hex_viewer import HexViewer
+    qt_app()
+    viewer = HexViewer()
+    bpl = viewer.bytes_per_line
+    data = random.Random(0).randbytes(EDIT_OPS * bpl)
+    return [(timed(viewer.format_hex_line, offset, data[offset:offset + bpl]), bpl)
+            for offset in range(0, len(data), bpl)]
+
+
+def bench_set_data(path, size):
+    """HexViewer.set_data 并立即绘制可见行"""
+    from UI.hex_viewer import HexViewer
+    qt_app()
+    viewer = HexViewer()
+    viewer.resize(800, 600)
+    viewer.show()
+    data = read_head(path, size)
+
+    def set_data():
+        viewer.set_data(data)
+        viewer.hex_view.viewport().repaint()
+    return [(timed(set_data), len(data)) for _ in range(20)]
+
+
+def bench_search(path, size):
+    from tools.hex_editor import HexEditor
+    from tools import search_engine
+    editor = HexEditor()
+    editor.load_file(path)
+    samples = [(timed(search_engine.search, editor, NEEDLE), size) for _ in range(3)]
+    editor.close()
+    return samples
+
+
+def bench_search_parallel(path, size):
+    from tools.parallel_search import iter_matches_parallel
+    from tools.patterns import LiteralPattern
+    pattern = LiteralPattern(NEEDLE)
+    return [(timed(lambda: sum(1 for _ in iter_matches_parallel(path, pattern))), size) for _ in range(3)]
+
+
+def bench_plugin_discovery(path, size):
+    """创建插件管理器：加载内置插件并按清单发现自定义插件"""
+    from plugins.plugin_manager import PluginManager
+    PluginManager()  # 生成清单缓存，不计入结果
+    return [(timed(PluginManager), 0) for _ in range(10)]
+
+
+def bench_plugin_process(path, size):
+    from plugins.plugin_manager import PluginManager
+    manager = PluginManager()
+    plugin = manager.get_plugins()[0]
+    data = read_head(path, size)
+    return [(timed(manager.process_data, plugin, data), len(data)) for _ in range(3)]
+
+
+def bench_markdown(path, size):
+    """MarkdownViewer.set_markdown 到结果显示；第一次为完整渲染，之后每次修改一节"""
+    from UI.markdown_viewer import MarkdownViewer
+    app = qt_app()
+    viewer = MarkdownViewer()
+    text = make_markdown()
+
+    def render(text):
+        viewer.set_markdown(text)
+        while viewer.render_thread is not None or viewer.pending is not None:
+            app.processEvents()
+            time.sleep(0.001)
+        app.processEvents()
+
+    samples = []
+    for i in range(6):
+        if i:
+            text = text.replace(f"这是第 {i * 100} 段", f"这是修改后的第 {i * 100} 段", 1)
+        samples.append((timed(render, text), len(text.encode('utf-8'))))
+    viewer.cancel()
+    return samples
+
+
+def bench_startup(path, size):
+    """启动进程到首个窗口就绪"""
+    from bench_startup import run_once
+    run_once(sys.executable)  # 生成 .pyc 等缓存，不计入结果
+    return [(run_once(sys.executable)[0] / 1000, 0) for _ in range(5)]
+
+
+# 名称 -> (函数, 是否按文件大小分别运行)
+CASES = {
+    'hex_load': (bench_load, True),
+    'hex_edit': (bench_edit, True),
+    'hex_insert': (bench_insert, True),
+    'hex_delete': (bench_delete, True),
+    'hex_save': (bench_save, True),
+    'hex_save_as': (bench_save_as, True),
+    'format_hex_line': (bench_format_hex_line, False),
+    'viewer_set_data': (bench_set_data, True),
+    'search': (bench_search, True),
+    'search_parallel': (bench_search_parallel, True),
+    'plugin_discovery': (bench_plugin_discovery, False),
+    'plugin_process': (bench_plugin_process, True),
+    'markdown_set_markdown': (bench_markdown, False),
+    'window_startup': (bench_startup, False),
+}
+
+
+def percentile(values: list, p: float) -> float:
+    """最近秩法百分位，values 已排序"""
+    return values[min(len(values) - 1, max(0, math.ceil(p / 100 * len(values)) - 1))]
+
+
+def summarize(name: str, size, samples: list, rss) -> dict:
+    latencies = sorted(elapsed * 1000 for elapsed, _ in samples)
+    total_time = sum(elapsed for elapsed, _ in samples)
+    total_bytes = sum(count for _, count in samples)
+    return {
+        'name': name,
+        'size_mb': None if size is None else size / MB,
+        'ops': len(samples),
+        'mean_ms': total_time * 1000 / len(samples),
+        'p50_ms': percentile(latencies, 50),
+        'p90_ms': percentile(latencies, 90),
+        'p99_ms': percentile(latencies, 99),
+        'max_ms': latencies[-1],
+        'throughput_mb_s': total_bytes / MB / total_time if total_bytes and total_time else None,
+        'ops_per_s': len(samples) / total_time if total_time else None,
+        'peak_rss_mb': rss,
+    }
+
+
+def run_case_in_process(name: str, path: str, size):
+    """子进程入口：运行一个用例，把样本和峰值 RSS 以 JSON 输出到最后一行"""
+    samples = CASES[name][0](path, size)
+    print(json.dumps({'samples': samples, 'peak_rss_mb': peak_rss_mb()}))
+
+
+def run_case(name: str, path: str, size) -> dict:
+    env = dict(os.environ, QT_QPA_PLATFORM='offscreen')
+    command = [sys.executable, os.path.abspath(__file__), '_case', name, path or '', str(size or 0)]
+    process = subprocess.run(command, capture_output=True, text=True, encoding='utf-8', env=env)
+    if process.returncode != 0:
+        raise RuntimeError(f"{name} 运行失败:\n{process.stderr.strip()}")
+    output = json.loads(process.stdout.strip().splitlines()[-1])
+    return summarize(name, size, output['samples'], output['peak_rss_mb'])
+
+
+def synthetic_file(data_dir: str, size_mb: float) -> str:
+    """返回指定大小的合成文件，已存在且大小一致时直接复用"""
+    size = int(size_mb * MB)
+    path = os.path.join(data_dir, f'bench-{size_mb:g}mb.bin')
+    if not os.path.exists(path) or os.path.getsize(path) != size:
+        print(f"生成 {size_mb:g} MB 合成文件...", file=sys.stderr)
+        make_file(path, size)
+    return path
+
+
+def format_row(result: dict) -> str:
+    size = '-' if result['size_mb'] is None else f"{result['size_mb']:g}"
+    throughput = result['throughput_mb_s']
+    rss = result['peak_rss_mb']
+    return (f"{result['name']:<24}{size:>8}{result['ops']:>7}{result['p50_ms']:>11.3f}"
+            f"{result['p90_ms']:>11.3f}{result['p99_ms']:>11.3f}"
+            f"{'-' if throughput is None else f'{throughput:.1f}':>11}"
+            f"{'-' if rss is None else f'{rss:.0f}':>9}")
+
+
+def command_run(args):
+    names = args.cases or list(CASES)
+    unknown = [name for name in names if name not in CASES]
+    if unknown:
+        sys.exit(f"未知用例: {', '.join(unknown)}（可用: {', '.join(CASES)}）")
+
+    data_dir = args.data_dir or tempfile.mkdtemp(prefix='lovelyhex-bench-')
+    os.makedirs(data_dir, exist_ok=True)
+    results = []
+    print(f"{'用例':<22}{'MB':>8}{'次数':>5}{'p50(ms)':>11}{'p90(ms)':>11}{'p99(ms)':>11}"
+          f"{'MB/s':>11}{'RSS(MB)':>9}")
+    try:
+        for name in names:
+            sized = CASES[name][1]
+            for size_mb in (args.sizes if sized else [None]):
+                path = synthetic_file(data_dir, size_mb) if sized else ''
+                result = run_case(name, path, int(size_mb * MB) if sized else None)
+                results.append(result)
+                print(format_row(result))
+    finally:
+        if args.data_dir is None:
+            for file in os.listdir(data_dir):
+                os.remove(os.path.join(data_dir, file))
+            os.rmdir(data_dir)
+
+    report = {
+        'meta': {
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'sizes_mb': args.sizes,
+        },
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"结果已写入 {args.output}")
+
+
+def compare(base: list, new: list, threshold: float, min_ms: float = 0.0) -> list:
+    """比较两次结果，返回 [(用例, 大小, 指标, 原值, 新值, 变化百分比, 是否回退)]
+
+    延迟和峰值 RSS 增加、吞吐量下降超过 threshold（百分比）视为回退；
+    延迟的绝对变化小于 min_ms 时视为计时噪声，不算回退。
+    """
+    base_results = {(r['name'], r['size_mb']): r for r in base}
+    rows = []
+    for result in new:
+        old = base_results.get((result['name'], result['size_mb']))
+        if old is None:
+            continue
+        for metric, higher_is_better in (('p50_ms', False), ('p99_ms', False),
+                                         ('throughput_mb_s', True), ('peak_rss_mb', False)):
+            before, after = old.get(metric), result.get(metric)
+            if not before or after is None:
+                continue
+            change = (after - before) / before * 100
+            worse = -change if higher_is_better else change
+            regressed = worse > threshold and not (metric.endswith('_ms') and after - before < min_ms)
+            rows.append((result['name'], result['size_mb'], metric, before, after, change, regressed))
+    return rows
+
+
+def command_compare(args):
+    with open(args.base, encoding='utf-8') as f:
+        base = json.load(f)['results']
+    with open(args.new, encoding='utf-8') as f:
+        new = json.load(f)['results']
+    rows = compare(base, new, args.threshold, args.min_ms)
+    print(f"{'用例':<22}{'MB':>8}  {'指标':<16}{'原值':>10}{'新值':>12}{'变化':>10}")
+    for name, size_mb, metric, before, after, change, regressed in rows:
+        size = '-' if size_mb is None else f"{size_mb:g}"
+        flag = '  回退' if regressed else ''
+        print(f"{name:<24}{size:>8}  {metric:<18}{before:>12.3f}{after:>12.3f}{change:>+9.1f}%{flag}")
+    regressions = [row for row in rows if row[-1]]
+    if regressions:
+        print(f"{len(regressions)} 项指标回退超过 {args.threshold:g}%")
+        sys.exit(1)
+    print(f"没有超过 {args.threshold:g}% 的回退")
+
+
+def main():
+    if len(sys.argv) == 5 and sys.argv[1] == '_case':
+        _, _, name, path, size = sys.argv
+        run_case_in_process(name, path, int(size) or None)
+        return
+
+    parser = argparse.ArgumentParser(description="热点路径基准测试套件")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    run_parser = subparsers.add_parser('run', help="运行基准测试")
+    run_parser.add_argument('--sizes', type=float, nargs='+', default=[1, 64],
+                            help="合成文件大小 (MB)，如 1 64 1024 4096")
+    run_parser.add_argument('--cases', nargs='+', help=f"只运行指定用例（可用: {', '.join(CASES)}）")
+    run_parser.add_argument('--output', help="结果 JSON 文件")
+    run_parser.add_argument('--data-dir', help="合成文件目录，指定时保留文件供下次复用")
+    compare_parser = subparsers.add_parser('compare', help="比较两次结果并报告回退")
+    compare_parser.add_argument('base', help="基准结果 JSON")
+    compare_parser.add_argument('new', help="新结果 JSON")
+    compare_parser.add_argument('--threshold', type=float, default=10, help="回退阈值（百分比）")
+    compare_parser.add_argument('--min-ms', type=float, default=0.05,
+                                help="延迟的绝对变化小于该值 (ms) 时不算回退")
+    args = parser.parse_args()
+    if args.command == 'run':
+        command_run(args)
+    else:
+        command_compare(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -6,13 +6,38 @@ current_dir = os.path.dirname(os.path.abspath(__file__))
 if current_dir not in sys.path:
     sys.path.append(current_dir)
 
-from PySide6.QtWidgets import QApplication
-from UI.main_window import MainWindow
+from tools import startup_trace
 
 def main():
-    app = QApplication(sys.argv)
+    # --trace-startup 输出启动各阶段耗时；--quit-after-startup 显示首个窗口后立即退出（用于基准测试）
+    # 先解析参数再导入 Qt，导入阶段（最耗时）的时间点才能被记录
+    args = sys.argv[1:]
+    quit_after_startup = '--quit-after-startup' in args
+    if '--trace-startup' in args:
+        startup_trace.enable()
+    
+    # 插件子进程以 spawn 方式启动时会重新执行本模块的顶层代码，Qt 和界面模块只在这里导入
+    from PySide6.QtWidgets import QApplication
+    from PySide6.QtCore import QTimer
+    startup_trace.mark("导入 Qt")
+    from UI.main_window import MainWindow
+    startup_trace.mark("导入主窗口模块")
+    
+    argv = [sys.argv[0]] + [a for a in args if a not in ('--trace-startup', '--quit-after-startup')]
+    
+    app = QApplication(argv)
+    startup_trace.mark("创建 QApplication")
     window = MainWindow()
     window.show()
+    startup_trace.mark("显示主窗口")
+    
+    def on_first_event_loop():
+        # 事件循环第一次空闲时窗口已完成首次绘制
+        startup_trace.mark("首个窗口就绪")
+        startup_trace.report()
+        if quit_after_startup:
+            window.close()
+    QTimer.singleShot(0, on_first_event_loop)
     sys.exit(app.exec())
 
 if __name__ == "__main__":
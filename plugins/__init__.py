@@ -1,5 +1,6 @@
 from .base_plugin import BasePlugin
 from .plugin_manager import PluginManager
+from .manifest import LazyPlugin
 from .base64_plugin import Base64EncodePlugin, Base64DecodePlugin
 
-__all__ = ['BasePlugin', 'PluginManager', 'Base64EncodePlugin', 'Base64DecodePlugin']
+__all__ = ['BasePlugin', 'PluginManager', 'LazyPlugin', 'Base64EncodePlugin', 'Base64DecodePlugin']
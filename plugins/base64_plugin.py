@@ -1,23 +1,48 @@
 import base64
+import binascii
+import re
 from .base_plugin import BasePlugin
 
+# Base64 字母表以外的字符（如换行）在解码时被忽略
+_NON_BASE64 = re.compile(rb'[^A-Za-z0-9+/=]')
+
 class Base64EncodePlugin(BasePlugin):
     @property
     def name(self) -> str:
         return "Base64编码"
     
+    @property
+    def deterministic(self) -> bool:
+        return True
+    
     @property
     def description(self) -> str:
         return "将选中的数据进行Base64编码"
     
     def process(self, data: bytes) -> bytes:
         return base64.b64encode(data)
+    
+    def process_stream(self, chunks):
+        # 每 3 字节编码为 4 个字符，不足 3 字节的部分留到下一块
+        pending = b""
+        for chunk in chunks:
+            data = pending + bytes(chunk)
+            cut = len(data) - len(data) % 3
+            pending = data[cut:]
+            if cut:
+                yield base64.b64encode(data[:cut])
+        if pending:
+            yield base64.b64encode(pending)
 
 class Base64DecodePlugin(BasePlugin):
     @property
     def name(self) -> str:
         return "Base64解码"
     
+    @property
+    def deterministic(self) -> bool:
+        return True
+    
     @property
     def description(self) -> str:
         return "将选中的Base64数据解码"
@@ -27,3 +52,18 @@ class Base64DecodePlugin(BasePlugin):
             return base64.b64decode(data)
         except Exception as e:
             raise ValueError("无效的Base64数据") from e
+    
+    def process_stream(self, chunks):
+        # 每 4 个字符解码为 3 字节，不足 4 个字符的部分留到下一块
+        pending = b""
+        try:
+            for chunk in chunks:
+                data = pending + _NON_BASE64.sub(b"", chunk)
+                cut = len(data) - len(data) % 4
+                pending = data[cut:]
+                if cut:
+                    yield base64.b64decode(data[:cut])
+            if pending:
+                yield base64.b64decode(pending)
+        except binascii.Error as e:
+            raise ValueError("无效的Base64数据") from e
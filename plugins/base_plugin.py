@@ -18,6 +18,49 @@ class BasePlugin(ABC):
         """处理数据"""
         pass
     
+    def process_stream(self, chunks):
+        """流式处理数据：chunks 为输入数据块的迭代器，逐块产出结果
+        
+        需要跨块保存状态的插件（如按固定分组编码）应在生成器内部维护状态。
+        默认实现会合并全部输入后调用 process，不支持流式处理的插件无需重写。
+        """
+        yield self.process(b"".join(chunks))
+    
+    @property
+    def supports_streaming(self) -> bool:
+        """是否实现了真正的流式处理（重写了 process_stream）"""
+        return type(self).process_stream is not BasePlugin.process_stream
+    
+    @property
+    def deterministic(self) -> bool:
+        """相同输入是否总是产生相同输出，为 True 时结果可以被缓存"""
+        return False
+    
+    @property
+    def version(self) -> str:
+        """插件版本，处理逻辑变化时应修改，使旧的缓存结果失效"""
+        return "1"
+    
+    @property
+    def execution_mode(self) -> str:
+        """执行方式：'thread' 在后台线程中执行，'process' 在独立子进程中执行
+        
+        子进程可以被强制终止，适合可能长时间运行或占用大量内存的插件；
+        插件类需定义在可导入的模块或插件文件的顶层。
+        None 表示未声明：自定义插件在子进程中执行，内置插件在线程中执行。
+        """
+        return None
+    
+    @property
+    def timeout(self) -> float:
+        """执行时间上限（秒），None 表示不限制"""
+        return None
+    
+    @property
+    def memory_limit(self) -> int:
+        """子进程可额外使用的内存上限（字节），None 表示不限制，仅对 'process' 方式有效"""
+        return None
+    
     @property
     def input_type(self) -> str:
         """输入数据类型，可以是 'text' 或 'hex'"""
@@ -1,19 +1,28 @@
 from plugins.base_plugin import BasePlugin
-import codecs
+
+# 只转换 ASCII 字母，与对 UTF-8 文本做 ROT13 的结果一致（多字节字符的字节都大于 0x7F）
+_LOWER = b"abcdefghijklmnopqrstuvwxyz"
+_UPPER = _LOWER.upper()
+ROT13_TABLE = bytes.maketrans(_LOWER + _UPPER, _LOWER[13:] + _LOWER[:13] + _UPPER[13:] + _UPPER[:13])
 
 class ROT13Plugin(BasePlugin):
     @property
     def name(self) -> str:
         return "ROT13编码/解码"
     
+    @property
+    def deterministic(self) -> bool:
+        return True
+    
     @property
     def description(self) -> str:
         return "对文本进行ROT13编码或解码"
     
     def process(self, data: bytes) -> bytes:
-        # 将bytes解码为文本
-        text = data.decode('utf-8')
-        # 应用ROT13编码
-        result = codecs.encode(text, 'rot_13')
-        # 返回编码后的bytes
-        return result.encode('utf-8')
+        # 逐字节查表替换，不需要先解码为文本
+        return data.translate(ROT13_TABLE)
+    
+    def process_stream(self, chunks):
+        # ROT13 不依赖上下文，每块独立转换
+        for chunk in chunks:
+            yield bytes(chunk).translate(ROT13_TABLE)
@@ -0,0 +1,184 @@
+import importlib
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from .manifest import import_plugin_file, LazyPlugin
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+THREAD = 'thread'
+PROCESS = 'process'
+
+# 等待子进程消息时检查取消和超时的间隔（秒）
+POLL_INTERVAL = 0.05
+
+
+class PluginError(ValueError):
+    """插件执行失败（超时、超出内存限制或进程异常退出）"""
+    pass
+
+
+def effective_mode(plugin) -> str:
+    """插件实际的执行方式：插件未声明时，自定义插件在子进程中执行，内置插件在当前线程中执行
+
+    自定义插件来自插件目录，不一定可信；子进程可以被强制终止和限制内存，线程不行。
+    """
+    mode = plugin.execution_mode
+    if mode is None:
+        mode = PROCESS if isinstance(plugin, LazyPlugin) else THREAD
+    return mode
+
+
+def plugin_spec(plugin) -> tuple:
+    """子进程重新加载插件所需的信息：(模块名, 模块文件, 类名)"""
+    cls = type(plugin)
+    module = sys.modules.get(cls.__module__)
+    return cls.__module__, getattr(module, '__file__', None), cls.__name__
+
+
+def load_plugin(spec):
+    """按 plugin_spec 的结果创建插件实例，自定义插件从文件加载"""
+    module_name, file_path, class_name = spec
+    try:
+        module = importlib.import_module(module_name)
+    except ImportError:
+        if not file_path:
+            raise
+        module = import_plugin_file(module_name, file_path)
+    return getattr(module, class_name)()
+
+
+def _current_address_space() -> int:
+    """当前进程已占用的虚拟地址空间，无法获取时返回 0"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[0]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return 0
+
+
+def _set_memory_limit(limit: int):
+    """限制子进程在当前基础上最多再使用 limit 字节的地址空间"""
+    if resource is None or limit is None:
+        return
+    total = _current_address_space() + limit
+    _, hard = resource.getrlimit(resource.RLIMIT_AS)
+    if hard != resource.RLIM_INFINITY:
+        total = min(total, hard)
+    resource.setrlimit(resource.RLIMIT_AS, (total, hard))
+
+
+def _process_worker(specs, memory_limit, chunk_size: int, out_path: str, conn):
+    """子进程入口：按 specs 依次串联插件，输入数据块由父进程按需发送，结果写入 out_path
+
+    每需要一块输入时发送 ('more', 已处理字节数) 并等待父进程发来的数据块，
+    空数据块表示输入结束；最后发送 ('done', 结果大小) 或 ('error', 信息)。
+    """
+    try:
+        plugins = [load_plugin(spec) for spec in specs]
+        # 同时最多持有约两块输入（正在接收的和插件尚未处理完的）
+        _set_memory_limit(memory_limit + 2 * chunk_size if memory_limit is not None else None)
+
+        def chunks():
+            done = 0
+            while True:
+                conn.send(('more', done))
+                chunk = conn.recv_bytes()
+                if not chunk:
+                    return
+                done += len(chunk)
+                yield chunk
+
+        stream = chunks()
+        for plugin in plugins:
+            stream = plugin.process_stream(stream)
+        size = 0
+        with open(out_path, 'wb') as f:
+            for chunk in stream:
+                f.write(chunk)
+                size += len(chunk)
+        conn.send(('done', size))
+    except MemoryError:
+        conn.send(('error', "插件超出内存限制"))
+    except Exception as e:
+        conn.send(('error', f"插件处理失败: {str(e)}"))
+    finally:
+        conn.close()
+
+
+def run_in_process(plugins, timeout, memory_limit, chunks, length: int, spool_size: int,
+                   chunk_size: int, progress=None, is_cancelled=None):
+    """在独立子进程中按顺序执行 plugins，返回 bytes、已回到开头的临时文件或 None（已取消）
+
+    plugins 为已加载的插件实例列表（单个插件或插件链的各阶段）。输入按子进程的请求
+    逐块通过管道发送，任何时候只有一块输入在途，不会复制整个选区；结果由子进程写入
+    临时文件，不超过 spool_size 时读回为 bytes。超时、取消或超出内存限制时会终止子进程。
+    """
+    deadline = None if timeout is None else time.monotonic() + timeout
+    fd, out_path = tempfile.mkstemp(prefix='lovelyhex-plugin-')
+    os.close(fd)
+    chunks = iter(chunks)
+    process = None
+    parent_conn = None
+    try:
+        context = multiprocessing.get_context('spawn')
+        parent_conn, child_conn = context.Pipe()
+        process = context.Process(
+            target=_process_worker,
+            args=([plugin_spec(plugin) for plugin in plugins], memory_limit, chunk_size,
+                  out_path, child_conn),
+            daemon=True)
+        process.start()
+        child_conn.close()
+
+        message = None
+        while message is None:
+            if is_cancelled is not None and is_cancelled():
+                return None
+            if deadline is not None and time.monotonic() > deadline:
+                raise PluginError(f"插件执行超时（{timeout} 秒）")
+            if not parent_conn.poll(POLL_INTERVAL):
+                if not process.is_alive() and not parent_conn.poll():
+                    raise PluginError(f"插件进程异常退出（退出码 {process.exitcode}）")
+                continue
+            try:
+                kind, value = parent_conn.recv()
+            except EOFError:
+                raise PluginError(f"插件进程异常退出（退出码 {process.exitcode}）")
+            if kind == 'more':
+                if progress is not None:
+                    progress(value, length)
+                # 子进程此时正在等待数据，发送不会长时间阻塞
+                parent_conn.send_bytes(next(chunks, b""))
+            else:
+                message = kind, value
+
+        kind, value = message
+        if kind == 'error':
+            raise PluginError(value)
+        if value <= spool_size:
+            with open(out_path, 'rb') as f:
+                return f.read()
+        result = open(out_path, 'rb')
+        try:
+            # POSIX 上打开后即可删除，文件在关闭时释放
+            os.remove(out_path)
+        except OSError:
+            pass
+        return result
+    finally:
+        if process is not None:
+            if process.is_alive():
+                process.kill()
+            process.join()
+        if parent_conn is not None:
+            parent_conn.close()
+        try:
+            os.remove(out_path)
+        except OSError:
+            pass
@@ -0,0 +1,162 @@
+import importlib.util
+import json
+import os
+import sys
+import threading
+from .base_plugin import BasePlugin
+
+# 自定义插件清单缓存：记录每个插件文件中的插件信息，文件未变化时无需导入
+MANIFEST_PATH = os.path.join(os.path.expanduser('~'), '.cache', 'lovelyhex', 'plugins.json')
+MANIFEST_VERSION = 2
+
+# 启动时无需导入插件即可使用的属性
+_DESCRIBED = ('name', 'description', 'deterministic', 'version',
+              'execution_mode', 'timeout', 'memory_limit', 'supports_streaming')
+
+_import_lock = threading.RLock()
+
+
+def file_key(path: str) -> list:
+    """插件文件的标识：[修改时间(ns), 大小]"""
+    stat = os.stat(path)
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def module_name_for(file: str) -> str:
+    return f"custom_plugin_{file[:-3]}"
+
+
+def import_plugin_file(module_name: str, path: str):
+    """导入插件文件并注册到 sys.modules，已导入时直接返回"""
+    with _import_lock:
+        module = sys.modules.get(module_name)
+        if module is not None:
+            return module
+        spec = importlib.util.spec_from_file_location(module_name, path)
+        if spec is None or spec.loader is None:
+            raise ImportError(f"无法加载 {path}")
+        module = importlib.util.module_from_spec(spec)
+        # 注册模块，子进程方式执行时可按模块名找到插件文件
+        sys.modules[module_name] = module
+        try:
+            spec.loader.exec_module(module)
+        except Exception:
+            del sys.modules[module_name]
+            raise
+        return module
+
+
+def scan_plugin_file(module_name: str, path: str) -> list:
+    """导入插件文件，返回其中的插件实例"""
+    module = import_plugin_file(module_name, path)
+    plugins = []
+    for attr_name in dir(module):
+        attr = getattr(module, attr_name)
+        if isinstance(attr, type) and issubclass(attr, BasePlugin) and attr != BasePlugin:
+            plugins.append(attr())
+    return plugins
+
+
+def describe(plugin) -> dict:
+    """插件在清单中的记录"""
+    info = {'class': type(plugin).__name__}
+    for attr in _DESCRIBED:
+        info[attr] = getattr(plugin, attr)
+    return info
+
+
+def load_manifest(path: str = MANIFEST_PATH) -> dict:
+    """读取清单 {文件名: {'key': [...], 'plugins': [...]}}，不存在或格式不符时返回空字典"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if data.get('version') != MANIFEST_VERSION:
+            return {}
+        return data['files']
+    except (OSError, ValueError, KeyError, AttributeError):
+        return {}
+
+
+def save_manifest(files: dict, path: str = MANIFEST_PATH) -> bool:
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': MANIFEST_VERSION, 'files': files}, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+        return True
+    except OSError as e:
+        print(f"保存插件清单失败: {str(e)}")
+        return False
+
+
+class LazyPlugin(BasePlugin):
+    """按清单记录创建的插件代理，第一次执行时才导入插件文件
+
+    名称、描述和执行选项直接取自清单，菜单和执行器无需导入插件即可使用。
+    """
+
+    def __init__(self, module_name: str, path: str, info: dict, plugin=None):
+        self.module_name = module_name
+        self.path = path
+        self.info = info
+        self._plugin = plugin
+
+    def load(self) -> BasePlugin:
+        """导入插件文件并创建真正的插件实例"""
+        if self._plugin is None:
+            with _import_lock:
+                if self._plugin is None:
+                    module = import_plugin_file(self.module_name, self.path)
+                    self._plugin = getattr(module, self.info['class'])()
+        return self._plugin
+
+    @property
+    def loaded(self) -> bool:
+        return self._plugin is not None
+
+    @property
+    def name(self) -> str:
+        return self.info['name']
+
+    @property
+    def description(self) -> str:
+        return self.info['description']
+
+    @property
+    def deterministic(self) -> bool:
+        return self.info['deterministic']
+
+    @property
+    def version(self) -> str:
+        return self.info['version']
+
+    @property
+    def execution_mode(self) -> str:
+        return self.info['execution_mode']
+
+    @property
+    def timeout(self) -> float:
+        return self.info['timeout']
+
+    @property
+    def memory_limit(self) -> int:
+        return self.info['memory_limit']
+
+    @property
+    def supports_streaming(self) -> bool:
+        return self.info['supports_streaming']
+
+    @property
+    def input_type(self) -> str:
+        return self.load().input_type
+
+    @property
+    def output_type(self) -> str:
+        return self.load().output_type
+
+    def process(self, data: bytes) -> bytes:
+        return self.load().process(data)
+
+    def process_stream(self, chunks):
+        return self.load().process_stream(chunks)
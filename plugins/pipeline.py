@@ -0,0 +1,121 @@
+import json
+import os
+import time
+from .executor import PluginError, THREAD, PROCESS, effective_mode
+
+# 保存的插件链
+PIPELINES_PATH = os.path.join(os.path.expanduser('~'), '.config', 'lovelyhex', 'pipelines.json')
+
+
+class Pipeline:
+    """插件链：按顺序执行多个插件，前一个插件产出的数据块直接作为后一个插件的输入
+
+    各阶段以生成器串联，数据块在阶段之间原样传递，不经过界面或文本转换。
+    任一阶段需要在子进程中执行时，整条插件链在同一个子进程中执行，否则在工作线程中执行。
+    """
+
+    def __init__(self, name: str, plugin_names: list):
+        self.name = name
+        self.plugin_names = list(plugin_names)
+        self.stages = []
+        # 最近一次执行的各阶段耗时 [(阶段名称, 秒, 输出字节数), ...]
+        self.last_timings = []
+
+    @property
+    def description(self) -> str:
+        return " → ".join(self.plugin_names)
+
+    @property
+    def execution_mode(self) -> str:
+        if any(effective_mode(plugin) == PROCESS for plugin in self.stages):
+            return PROCESS
+        return THREAD
+
+    @property
+    def memory_limit(self) -> int:
+        """各阶段内存上限之和，任一阶段不限制时整体不限制"""
+        limits = [plugin.memory_limit for plugin in self.stages]
+        if not limits or any(limit is None for limit in limits):
+            return None
+        return sum(limits)
+
+    @property
+    def timeout(self) -> float:
+        """各阶段时间上限之和，任一阶段不限制时整体不限制"""
+        timeouts = [plugin.timeout for plugin in self.stages]
+        if not timeouts or any(t is None for t in timeouts):
+            return None
+        return sum(timeouts)
+
+    def resolve(self, plugins) -> list:
+        """按名称查找插件实例，找不到时抛出 PluginError"""
+        by_name = {plugin.name: plugin for plugin in plugins}
+        missing = [name for name in self.plugin_names if name not in by_name]
+        if missing:
+            raise PluginError(f"插件链 {self.name} 缺少插件: {', '.join(missing)}")
+        self.stages = [by_name[name] for name in self.plugin_names]
+        return self.stages
+
+    def to_dict(self) -> dict:
+        return {'name': self.name, 'plugins': self.plugin_names}
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        return cls(data['name'], data['plugins'])
+
+
+def timed(source, counter: list):
+    """逐块转发 source，并在 counter 中累计取块耗时 [秒, 字节数]
+
+    取块耗时包含上游各阶段的时间，相邻阶段相减即为单个阶段的耗时。
+    """
+    it = iter(source)
+    while True:
+        start = time.perf_counter()
+        try:
+            chunk = next(it)
+        except StopIteration:
+            counter[0] += time.perf_counter() - start
+            return
+        counter[0] += time.perf_counter() - start
+        counter[1] += len(chunk)
+        yield chunk
+
+
+def stage_timings(names: list, counters: list) -> list:
+    """把累计耗时换算为各阶段自身的耗时 [(名称, 秒, 输出字节数), ...]"""
+    timings = []
+    previous = 0.0
+    for name, (elapsed, size) in zip(names, counters):
+        timings.append((name, max(elapsed - previous, 0.0), size))
+        previous = elapsed
+    return timings
+
+
+def format_timings(timings: list) -> str:
+    """格式化各阶段耗时，用于状态栏显示"""
+    return ", ".join(f"{name} {seconds * 1000:.1f}ms/{size}B" for name, seconds, size in timings)
+
+
+def load_pipelines(path: str = PIPELINES_PATH) -> list:
+    """读取保存的插件链，文件不存在或格式错误时返回空列表"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return [Pipeline.from_dict(item) for item in json.load(f)]
+    except FileNotFoundError:
+        return []
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        print(f"读取插件链失败: {str(e)}")
+        return []
+
+
+def save_pipelines(pipelines: list, path: str = PIPELINES_PATH) -> bool:
+    """保存插件链"""
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump([p.to_dict() for p in pipelines], f, ensure_ascii=False, indent=2)
+        return True
+    except OSError as e:
+        print(f"保存插件链失败: {str(e)}")
+        return False
@@ -1,11 +1,40 @@
 import os
-import importlib.util
+import sys
+import time
+import tempfile
 from typing import List, Type
+from tools import perf
 from .base_plugin import BasePlugin
+from .executor import PluginError, PROCESS, effective_mode, run_in_process
+from .pipeline import Pipeline, timed, stage_timings
+from .result_cache import ResultCache, HashedChunks, is_session_version
+from .manifest import (LazyPlugin, load_manifest, save_manifest, file_key,
+                       module_name_for, scan_plugin_file, describe)
+
+# 流式处理时每次读取的数据块大小
+CHUNK_SIZE = 1024 * 1024
+# 流式结果超过该大小时写入磁盘临时文件
+SPOOL_SIZE = 16 * 1024 * 1024
+# 范围键未命中时，不超过该大小的输入先读入内存按内容哈希查找缓存
+CONTENT_LOOKUP_SIZE = 4 * 1024 * 1024
 
 class PluginManager:
+    _instance = None
+    
+    @classmethod
+    def instance(cls):
+        """进程内共享的插件管理器，插件只发现和导入一次"""
+        if cls._instance is None:
+            cls._instance = cls()
+        return cls._instance
+    
     def __init__(self):
         self.plugins = []
+        # 结果缓存，调用 enable_cache 后启用
+        self.result_cache = None
+        self.custom_plugin_dir = os.path.join(os.path.dirname(__file__), 'custom')
+        # 当前已加载的自定义插件文件清单 {文件名: 清单记录}
+        self._manifest = {}
         self._load_builtin_plugins()
         self._load_custom_plugins()
     
@@ -17,45 +46,330 @@ class PluginManager:
             Base64DecodePlugin()
         ])
     
+    @perf.timed('plugin.discover', 'plugin')
     def _load_custom_plugins(self):
-        """加载自定义插件"""
-        custom_plugin_dir = os.path.join(os.path.dirname(__file__), 'custom')
-        if not os.path.exists(custom_plugin_dir):
-            os.makedirs(custom_plugin_dir)
+        """加载自定义插件
         
-        for file in os.listdir(custom_plugin_dir):
-            if file.endswith('.py') and not file.startswith('_'):
+        插件文件的修改时间和大小与清单缓存一致时，直接按清单创建 LazyPlugin，
+        第一次执行时才导入；新增或修改过的文件会被导入一次并更新清单。
+        """
+        manifest = load_manifest()
+        files = {}
+        for file, plugin_path in self._custom_files().items():
+            try:
+                key = file_key(plugin_path)
+                entry = manifest.get(file)
+                if entry is not None and entry['key'] == key:
+                    self.plugins.extend(LazyPlugin(module_name_for(file), plugin_path, info)
+                                        for info in entry['plugins'])
+                else:
+                    entry, instances = self._scan_file(file, plugin_path, key)
+                    self.plugins.extend(instances)
+                files[file] = entry
+            except Exception as e:
+                print(f"加载插件 {file} 失败: {str(e)}")
+        self._manifest = files
+        if files != manifest:
+            save_manifest(files)
+    
+    def _custom_files(self) -> dict:
+        """自定义插件文件 {文件名: 路径}"""
+        if not os.path.exists(self.custom_plugin_dir):
+            os.makedirs(self.custom_plugin_dir)
+        return {file: os.path.join(self.custom_plugin_dir, file)
+                for file in sorted(os.listdir(self.custom_plugin_dir))
+                if file.endswith('.py') and not file.startswith('_')}
+    
+    @staticmethod
+    def _scan_file(file: str, plugin_path: str, key: list):
+        """导入插件文件，返回 (清单记录, 插件列表)"""
+        # 查找模块中的插件类
+        instances = scan_plugin_file(module_name_for(file), plugin_path)
+        entry = {'key': key, 'plugins': [describe(p) for p in instances]}
+        plugins = [LazyPlugin(module_name_for(file), plugin_path, info, plugin)
+                   for info, plugin in zip(entry['plugins'], instances)]
+        return entry, plugins
+    
+    @perf.timed('plugin.reload', 'plugin')
+    def reload_changed(self):
+        """重新加载新增、修改或删除的自定义插件文件，返回 (移除的插件, 新增的插件)
+        
+        只重新导入发生变化的文件，其余插件保持不变；导入失败的文件保留原有插件。
+        """
+        removed = []
+        added = []
+        current = self._custom_files()
+        for file in sorted(set(current) | set(self._manifest)):
+            plugin_path = current.get(file)
+            try:
+                key = file_key(plugin_path) if plugin_path else None
+            except OSError:
+                key = None
+            entry = self._manifest.get(file)
+            if entry is not None and entry['key'] == key:
+                continue
+            
+            path = os.path.join(self.custom_plugin_dir, file)
+            old = [p for p in self.plugins if getattr(p, 'path', None) == path]
+            module_name = module_name_for(file)
+            saved_module = sys.modules.pop(module_name, None)
+            if key is not None:
                 try:
-                    plugin_path = os.path.join(custom_plugin_dir, file)
-                    spec = importlib.util.spec_from_file_location(
-                        f"custom_plugin_{file[:-3]}", 
-                        plugin_path
-                    )
-                    if spec and spec.loader:
-                        module = importlib.util.module_from_spec(spec)
-                        spec.loader.exec_module(module)
-                        
-                        # 查找模块中的插件类
-                        for attr_name in dir(module):
-                            attr = getattr(module, attr_name)
-                            if (isinstance(attr, type) and 
-                                issubclass(attr, BasePlugin) and 
-                                attr != BasePlugin):
-                                self.plugins.append(attr())
+                    entry, instances = self._scan_file(file, plugin_path, key)
                 except Exception as e:
                     print(f"加载插件 {file} 失败: {str(e)}")
+                    if saved_module is not None:
+                        sys.modules[module_name] = saved_module
+                    continue
+                self._manifest[file] = entry
+            else:
+                instances = []
+                self._manifest.pop(file, None)
+            
+            # 新插件放在原插件的位置
+            index = self.plugins.index(old[0]) if old else len(self.plugins)
+            self.plugins = [p for p in self.plugins if p not in old]
+            self.plugins[index:index] = instances
+            removed.extend(old)
+            added.extend(instances)
+        if removed or added:
+            save_manifest(self._manifest)
+        return removed, added
     
     def get_plugins(self) -> List[BasePlugin]:
         """获取所有插件"""
         return self.plugins
     
+    def enable_cache(self, max_bytes: int = None, disk_dir: str = None):
+        """启用结果缓存，disk_dir 不为 None 时同时使用磁盘层"""
+        kwargs = {} if max_bytes is None else {'max_bytes': max_bytes}
+        self.result_cache = ResultCache(disk_dir=disk_dir, **kwargs)
+    
+    def disable_cache(self):
+        """停用并丢弃结果缓存"""
+        self.result_cache = None
+    
+    @staticmethod
+    def _unwrap(plugin):
+        """延迟加载的插件在第一次执行时导入"""
+        if isinstance(plugin, LazyPlugin):
+            try:
+                return plugin.load()
+            except Exception as e:
+                raise PluginError(f"加载插件 {plugin.name} 失败: {str(e)}")
+        return plugin
+    
+    def _cache_for(self, plugin):
+        """插件可以使用缓存时返回缓存对象，否则返回 None"""
+        if self.result_cache is None or isinstance(plugin, Pipeline) or not plugin.deterministic:
+            return None
+        return self.result_cache
+    
+    @perf.timed('plugin.process_data', 'plugin')
     def process_data(self, plugin: BasePlugin, data: bytes) -> bytes:
         """使用插件处理数据"""
+        plugin = self._unwrap(plugin)
+        cache = self._cache_for(plugin)
+        if cache is not None:
+            key = cache.make_key(plugin, (data,))
+            result = cache.get(key)
+            if result is not None:
+                return result
+        try:
+            result = plugin.process(data)
+        except Exception as e:
+            raise ValueError(f"插件处理失败: {str(e)}")
+        if cache is not None and result is not None:
+            cache.put(key, result)
+        return result
+    
+    def process_stream(self, plugin: BasePlugin, chunks, total: int = None, progress=None):
+        """使用插件流式处理数据块，逐块产出结果
+        
+        progress(已读取字节数, total) 在每读取一块输入后调用。
+        不支持流式处理的插件会退化为一次性处理全部输入。
+        """
+        def counted(source):
+            done = 0
+            for chunk in source:
+                done += len(chunk)
+                yield chunk
+                if progress is not None:
+                    progress(done, total)
+        
         try:
-            return plugin.process(data)
+            yield from plugin.process_stream(counted(chunks))
+        except PluginError:
+            raise
         except Exception as e:
             raise ValueError(f"插件处理失败: {str(e)}")
     
+    @staticmethod
+    def collect_output(chunks, spool_size: int = SPOOL_SIZE, is_cancelled=None):
+        """收集流式结果：较小时返回 bytes，超过 spool_size 时返回已回到开头的临时文件
+        
+        is_cancelled() 返回 True 时停止并返回 None。
+        """
+        parts = []
+        size = 0
+        spool = None
+        try:
+            for chunk in chunks:
+                if is_cancelled is not None and is_cancelled():
+                    if spool is not None:
+                        spool.close()
+                    return None
+                if spool is None:
+                    parts.append(chunk)
+                    size += len(chunk)
+                    if size > spool_size:
+                        spool = tempfile.TemporaryFile()
+                        for part in parts:
+                            spool.write(part)
+                        parts = None
+                else:
+                    spool.write(chunk)
+        except Exception:
+            if spool is not None:
+                spool.close()
+            raise
+        if is_cancelled is not None and is_cancelled():
+            if spool is not None:
+                spool.close()
+            return None
+        if spool is None:
+            return b"".join(parts)
+        spool.seek(0)
+        return spool
+    
+    @perf.timed('plugin.run', 'plugin')
+    def run(self, plugin: BasePlugin, reader, offset: int, length: int,
+            progress=None, is_cancelled=None, version=None):
+        """执行插件处理 reader 中 [offset, offset + length) 的数据，应在工作线程中调用
+        
+        按插件的执行方式（effective_mode，未声明时自定义插件使用子进程）在当前线程
+        或独立子进程中执行，遵守插件的 timeout 和 memory_limit。返回 bytes 或大结果的临时文件，取消时返回 None，
+        失败或超时时抛出 ValueError（PluginError）。
+        当前线程中执行时只能在数据块之间检查超时，单次调用 process 无法被打断。
+        插件链（Pipeline）交给 run_pipeline 执行。启用结果缓存时，确定性插件
+        按 (文档版本 version, 范围) 查找缓存，命中时不读取输入也不执行插件；
+        未命中时，较小的输入先按内容哈希查找（相同内容位于其他位置或文档有无关编辑时
+        仍可命中），较大的输入在流向插件的途中计算哈希，执行完成后按哈希保存结果。
+        """
+        if isinstance(plugin, Pipeline):
+            return self.run_pipeline(plugin, reader, offset, length, progress, is_cancelled)
+        mode = effective_mode(plugin)
+        plugin = self._unwrap(plugin)
+        cache = self._cache_for(plugin)
+        chunks = self.read_chunks(reader, offset, length)
+        if cache is not None:
+            range_key = None
+            key = None
+            persistent = not is_session_version(version)
+            small = length <= CONTENT_LOOKUP_SIZE
+            if version is not None:
+                range_key = cache.range_key(plugin, version, offset, length)
+                result = cache.get_range(range_key, persistent, count_miss=not small)
+                if result is not None:
+                    return result
+            if small:
+                chunks = list(chunks)
+                key = cache.make_key(plugin, chunks)
+                result = cache.get(key)
+                if result is not None:
+                    if range_key is not None:
+                        cache.link_range(range_key, key, persistent)
+                    return result
+            else:
+                chunks = HashedChunks(plugin, chunks, length)
+        
+        if mode == PROCESS:
+            result = run_in_process([plugin], plugin.timeout, plugin.memory_limit, chunks, length,
+                                    SPOOL_SIZE, CHUNK_SIZE, progress, is_cancelled)
+        else:
+            stopped = self._stop_check(plugin.timeout, is_cancelled)
+            result = self.collect_output(
+                self.process_stream(plugin, self._guarded(chunks, stopped), length, progress),
+                is_cancelled=stopped)
+        # 临时文件形式的大结果不缓存；插件没有读完输入时无法得到缓存键
+        if cache is not None and isinstance(result, (bytes, bytearray)):
+            if key is None:
+                key = chunks.key
+            if key is not None and range_key is not None:
+                cache.put_range(range_key, key, result, persistent)
+            elif key is not None:
+                cache.put(key, result)
+        return result
+    
+    def run_pipeline(self, pipeline: Pipeline, reader, offset: int, length: int,
+                     progress=None, is_cancelled=None):
+        """按顺序执行插件链，返回值与 run 相同
+        
+        各阶段的生成器直接串联，数据块不经过中间缓冲区；执行结束后
+        pipeline.last_timings 记录读取和每个阶段自身的耗时及输出字节数。
+        含有子进程方式的阶段时整条插件链交给子进程执行，不记录各阶段耗时。
+        """
+        plugins = pipeline.resolve(self.plugins)
+        if pipeline.execution_mode == PROCESS:
+            pipeline.last_timings = []
+            return run_in_process([self._unwrap(plugin) for plugin in plugins],
+                                  pipeline.timeout, pipeline.memory_limit,
+                                  self.read_chunks(reader, offset, length), length,
+                                  SPOOL_SIZE, CHUNK_SIZE, progress, is_cancelled)
+        stopped = self._stop_check(pipeline.timeout, is_cancelled)
+        names = ["读取"] + [plugin.name for plugin in plugins]
+        counters = [[0.0, 0] for _ in names]
+        
+        def stage(plugin, source):
+            try:
+                yield from plugin.process_stream(source)
+            except PluginError:
+                raise
+            except Exception as e:
+                raise PluginError(f"插件 {plugin.name} 处理失败: {str(e)}")
+        
+        def counted(source):
+            for chunk in source:
+                yield chunk
+                if progress is not None:
+                    progress(counters[0][1], length)
+        
+        stream = counted(timed(self._guarded(self.read_chunks(reader, offset, length), stopped),
+                               counters[0]))
+        for plugin, counter in zip(plugins, counters[1:]):
+            stream = timed(stage(plugin, stream), counter)
+        result = self.collect_output(stream, is_cancelled=stopped)
+        pipeline.last_timings = stage_timings(names, counters)
+        return result
+    
+    @staticmethod
+    def _stop_check(timeout, is_cancelled):
+        """返回检查函数：已取消时返回 True，超过 timeout 秒时抛出 PluginError"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        
+        def stopped():
+            if deadline is not None and time.monotonic() > deadline:
+                raise PluginError(f"插件执行超时（{timeout} 秒）")
+            return is_cancelled is not None and is_cancelled()
+        return stopped
+    
+    @staticmethod
+    def _guarded(chunks, stopped):
+        """逐块转发输入，在每块之前检查取消和超时"""
+        for chunk in chunks:
+            if stopped():
+                return
+            yield chunk
+    
+    @staticmethod
+    def read_chunks(reader, offset: int, length: int, chunk_size: int = CHUNK_SIZE):
+        """从范围读取接口中分块读取 [offset, offset + length)"""
+        end = offset + length
+        while offset < end:
+            size = min(chunk_size, end - offset)
+            yield reader.read(offset, size)
+            offset += size
+    
     @staticmethod
     def create_plugin_template(plugin_name: str) -> str:
         """创建插件模板"""
@@ -73,4 +387,24 @@ class {plugin_name}Plugin(BasePlugin):
     def process(self, data: bytes) -> bytes:
         # 在这里实现你的数据处理逻辑
         return data
+    
+    # 可选：实现流式处理以支持大块数据，跨块的状态保存在生成器内部
+    # def process_stream(self, chunks):
+    #     for chunk in chunks:
+    #         yield chunk
+    
+    # 可选：相同输入总是产生相同输出时声明为确定性插件，启用结果缓存后可复用结果
+    # @property
+    # def deterministic(self) -> bool:
+    #     return True
+    
+    # 可选：自定义插件默认在独立子进程中执行，可以限制执行时间和内存；
+    # 确认插件可信且需要避免启动子进程的开销时可改为在线程中执行
+    # @property
+    # def execution_mode(self) -> str:
+    #     return 'thread'
+    #
+    # @property
+    # def timeout(self) -> float:
+    #     return 30
 '''
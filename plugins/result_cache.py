@@ -0,0 +1,317 @@
+import hashlib
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+
+# 内存层默认容量
+DEFAULT_MEMORY_BYTES = 64 * 1024 * 1024
+# 磁盘层默认容量
+DEFAULT_DISK_BYTES = 1024 * 1024 * 1024
+DEFAULT_DISK_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'lovelyhex', 'results')
+CACHE_SUFFIX = '.bin'
+# 磁盘层中范围键指向缓存键的记录
+REF_SUFFIX = '.ref'
+# 以该标记开头的文档版本（如已修改文档的 revision）只在本进程内有效
+SESSION_VERSION = 'revision'
+# 内存中最多保留的范围键记录数
+MAX_RANGE_KEYS = 4096
+
+
+def new_hasher():
+    """输入数据的哈希对象，优先使用 xxhash，没有安装时使用 BLAKE2"""
+    if xxhash is not None:
+        return xxhash.xxh3_128()
+    return hashlib.blake2b(digest_size=16)
+
+
+def plugin_identity(plugin) -> str:
+    """插件标识：类的完整名称、版本和插件文件的修改时间
+
+    包含修改时间，使热重载修改过的插件不会命中旧结果。
+    """
+    cls = type(plugin)
+    module = sys.modules.get(cls.__module__)
+    try:
+        stamp = os.stat(module.__file__).st_mtime_ns
+    except (AttributeError, TypeError, OSError):
+        stamp = 0
+    return f"{cls.__module__}.{cls.__qualname__}:{plugin.version}:{stamp}"
+
+
+def is_session_version(version) -> bool:
+    """文档版本是否只在本进程内有效，这样的范围键不能写入磁盘层"""
+    return isinstance(version, tuple) and bool(version) and version[0] == SESSION_VERSION
+
+
+class HashedChunks:
+    """逐块转发输入并同时计算缓存键，插件读完全部输入后 key 才有效
+
+    输入只读取一次：哈希在数据块交给插件的途中完成，不需要为计算缓存键预先读一遍。
+    """
+
+    def __init__(self, plugin, chunks, length: int):
+        self._hasher = new_hasher()
+        self._hasher.update(plugin_identity(plugin).encode('utf-8'))
+        self._hasher.update(b'\0')
+        self._chunks = chunks
+        self.length = length
+        self.done = 0
+
+    def __iter__(self):
+        for chunk in self._chunks:
+            self._hasher.update(chunk)
+            self.done += len(chunk)
+            yield chunk
+
+    @property
+    def key(self):
+        """全部输入的缓存键，插件未读完输入时为 None"""
+        if self.done != self.length:
+            return None
+        return self._hasher.hexdigest()
+
+
+class ResultCache:
+    """插件结果缓存，以 (插件标识, 输入哈希) 为键
+
+    内存层按结果字节数限制容量，超出时淘汰最久未使用的条目；
+    启用磁盘层时，结果同时写入缓存目录，同样按总大小淘汰最久未使用的文件。
+    只有声明为 deterministic 的插件会被缓存。可在多个线程中使用。
+    另外按 (插件标识, 文档版本, 偏移, 长度) 记录范围键到缓存键的映射，
+    同一版本的同一范围再次执行时无需读取输入即可命中。只在本进程内有效的版本
+    （见 is_session_version）的映射只保存在内存中，其余同时写入磁盘层。
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MEMORY_BYTES, disk_dir: str = None,
+                 disk_max_bytes: int = DEFAULT_DISK_BYTES):
+        self.max_bytes = max_bytes
+        self.disk_dir = None
+        self.disk_max_bytes = disk_max_bytes
+        self._entries = OrderedDict()
+        self._size = 0
+        self._ranges = OrderedDict()  # 范围键 -> 缓存键
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.set_disk_dir(disk_dir)
+
+    def set_disk_dir(self, disk_dir: str) -> bool:
+        """设置磁盘层目录，None 表示只使用内存层"""
+        if disk_dir is not None:
+            try:
+                os.makedirs(disk_dir, exist_ok=True)
+            except OSError as e:
+                print(f"创建缓存目录失败: {str(e)}")
+                disk_dir = None
+        self.disk_dir = disk_dir
+        return disk_dir is not None
+
+    @staticmethod
+    def make_key(plugin, chunks) -> str:
+        """根据插件标识和全部输入数据块计算缓存键"""
+        hasher = new_hasher()
+        hasher.update(plugin_identity(plugin).encode('utf-8'))
+        hasher.update(b'\0')
+        for chunk in chunks:
+            hasher.update(chunk)
+        return hasher.hexdigest()
+
+    @staticmethod
+    def range_key(plugin, version, offset: int, length: int) -> str:
+        """根据插件标识、文档版本和范围计算范围键"""
+        hasher = new_hasher()
+        hasher.update(repr((plugin_identity(plugin), version, offset, length)).encode('utf-8'))
+        return hasher.hexdigest()
+
+    def get_range(self, range_key: str, persistent: bool = True, count_miss: bool = True):
+        """按范围键查找结果，未命中时返回 None
+
+        persistent 为 False 时不查找磁盘层；调用方随后还会按缓存键查找时 count_miss
+        应为 False，避免一次查找被计为两次未命中。
+        """
+        with self._lock:
+            key = self._ranges.get(range_key)
+            if key is not None:
+                self._ranges.move_to_end(range_key)
+        if key is None and persistent:
+            key = self._disk_ref_get(range_key)
+        if key is None:
+            if count_miss:
+                with self._lock:
+                    self.misses += 1
+            return None
+        return self.get(key)
+
+    def link_range(self, range_key: str, key: str, persistent: bool = True):
+        """记录范围键指向的缓存键，persistent 为 True 时同时写入磁盘层"""
+        self._remember_range(range_key, key)
+        if persistent:
+            self._disk_ref_put(range_key, key)
+
+    def put_range(self, range_key: str, key: str, result: bytes, persistent: bool = True):
+        """保存结果，并记录范围键指向的缓存键"""
+        self.put(key, result)
+        self.link_range(range_key, key, persistent)
+
+    def get(self, key: str):
+        """查找缓存结果，未命中时返回 None"""
+        with self._lock:
+            result = self._entries.get(key)
+            if result is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return result
+        result = self._disk_get(key)
+        with self._lock:
+            if result is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+        self._memory_put(key, result)
+        return result
+
+    def put(self, key: str, result: bytes):
+        """保存结果，超过内存层容量的结果只写入磁盘层"""
+        result = bytes(result)
+        self._memory_put(key, result)
+        self._disk_put(key, result)
+
+    def clear(self):
+        """清空内存层和磁盘层，并重置统计"""
+        with self._lock:
+            self._entries.clear()
+            self._ranges.clear()
+            self._size = 0
+            self.hits = self.disk_hits = self.misses = self.evictions = 0
+        for path, _, _ in self._disk_files():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def stats(self) -> dict:
+        """命中统计"""
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'hit_rate': (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+                'entries': len(self._entries),
+                'bytes': self._size,
+                'evictions': self.evictions,
+            }
+
+    def _remember_range(self, range_key: str, key: str):
+        with self._lock:
+            self._ranges[range_key] = key
+            self._ranges.move_to_end(range_key)
+            while len(self._ranges) > MAX_RANGE_KEYS:
+                self._ranges.popitem(last=False)
+
+    def _memory_put(self, key: str, result: bytes):
+        if len(result) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._size -= len(old)
+            self._entries[key] = result
+            self._size += len(result)
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+                self.evictions += 1
+
+    # ---- 磁盘层 ----
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, key + CACHE_SUFFIX)
+
+    def _disk_get(self, key: str):
+        if self.disk_dir is None:
+            return None
+        path = self._disk_path(key)
+        try:
+            with open(path, 'rb') as f:
+                result = f.read()
+            # 更新访问时间，淘汰时按最久未使用排序
+            os.utime(path)
+            return result
+        except OSError:
+            return None
+
+    def _disk_put(self, key: str, result: bytes):
+        if self.disk_dir is None or len(result) > self.disk_max_bytes:
+            return
+        path = self._disk_path(key)
+        try:
+            tmp_path = path + '.tmp'
+            with open(tmp_path, 'wb') as f:
+                f.write(result)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"写入结果缓存失败: {str(e)}")
+            return
+        self._disk_evict()
+
+    def _disk_ref_get(self, range_key: str):
+        if self.disk_dir is None:
+            return None
+        try:
+            with open(os.path.join(self.disk_dir, range_key + REF_SUFFIX), 'r') as f:
+                key = f.read().strip()
+        except OSError:
+            return None
+        self._remember_range(range_key, key)
+        return key
+
+    def _disk_ref_put(self, range_key: str, key: str):
+        if self.disk_dir is None:
+            return
+        try:
+            with open(os.path.join(self.disk_dir, range_key + REF_SUFFIX), 'w') as f:
+                f.write(key)
+        except OSError as e:
+            print(f"写入结果缓存失败: {str(e)}")
+
+    def _disk_files(self):
+        """缓存目录中的文件 [(路径, 大小, 修改时间), ...]，包括范围键记录"""
+        if self.disk_dir is None:
+            return []
+        files = []
+        try:
+            names = os.listdir(self.disk_dir)
+        except OSError:
+            return []
+        for name in names:
+            if not name.endswith((CACHE_SUFFIX, REF_SUFFIX)):
+                continue
+            path = os.path.join(self.disk_dir, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            files.append((path, stat.st_size, stat.st_mtime))
+        return files
+
+    def _disk_evict(self):
+        files = self._disk_files()
+        total = sum(size for _, size, _ in files)
+        for path, size, _ in sorted(files, key=lambda f: f[2]):
+            if total <= self.disk_max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
@@ -0,0 +1,204 @@
+import os
+import random
+
+import pytest
+
+import tools.hex_editor as hex_editor
+from tools.hex_editor import HexEditor
+from tools.piece_table import PieceTable
+from tools.save_journal import journal_path, write_journal, recover_journal
+
+
+def random_bytes(rnd, size):
+    return bytes(rnd.randrange(256) for _ in range(size))
+
+
+def random_edit(rnd, size):
+    """随机的 (偏移, 删除长度, 插入数据)，大约一半保持长度不变以便原位保存"""
+    offset = rnd.randint(0, size)
+    length = rnd.randint(0, min(size - offset, 16))
+    data = random_bytes(rnd, rnd.randint(0, 16))
+    if rnd.random() < 0.5:
+        data = random_bytes(rnd, length)
+    return offset, length, data
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_piece_table_matches_bytearray(seed):
+    rnd = random.Random(seed)
+    ref = bytearray(random_bytes(rnd, 200))
+    table = PieceTable(bytes(ref))
+    snapshots = []
+    for _ in range(300):
+        offset, length, data = random_edit(rnd, len(ref))
+        table.replace(offset, length, data)
+        ref[offset:offset + length] = data
+        assert len(table) == len(ref)
+        if ref:
+            start = rnd.randrange(len(ref))
+            count = rnd.randint(0, len(ref) - start)
+            assert table.read(start, count) == ref[start:start + count]
+            assert bytes(table.view(start, count)) == ref[start:start + count]
+            assert table.byte_at(start) == ref[start]
+        if rnd.random() < 0.05:
+            snapshots.append((table.snapshot(), bytes(ref)))
+    assert table.tobytes() == ref
+    # 快照不受之后的编辑影响
+    for snapshot, data in snapshots:
+        assert snapshot.tobytes() == data
+
+
+@pytest.mark.parametrize('seed', range(20))
+@pytest.mark.parametrize('budget', [300, 4000, 10 ** 7])
+def test_undo_redo_matches_history(seed, budget, monkeypatch):
+    # 小预算和很低的压缩阈值使丢弃记录和压缩缓冲区频繁发生
+    monkeypatch.setattr(hex_editor, 'COMPACT_MIN', 64)
+    rnd = random.Random(seed)
+    editor = HexEditor(undo_budget=budget)
+    editor.buffer = PieceTable(random_bytes(rnd, 200))
+    undo = [editor.get_data()]
+    redo = []
+    for _ in range(300):
+        op = rnd.random()
+        size = editor.get_size()
+        if op < 0.55:
+            offset, length, data = random_edit(rnd, size)
+            if not length and not data:
+                continue
+            editor.replace_range(offset, length, data)
+            undo.append(editor.get_data())
+            redo = []
+        elif op < 0.8:
+            if editor.undo() is not None:
+                redo.append(undo.pop())
+        elif editor.redo() is not None:
+            undo.append(redo.pop())
+        assert editor.get_data() == undo[-1]
+        journal = editor.undo_journal
+        assert journal.memory == sum(record.cost for record in
+                                     (*journal.undo_stack, *journal.redo_stack))
+    # 丢弃的只是最早的记录，剩余记录仍能逐步撤销和重做
+    while editor.undo() is not None:
+        redo.append(undo.pop())
+        assert editor.get_data() == undo[-1]
+    while editor.redo() is not None:
+        undo.append(redo.pop())
+        assert editor.get_data() == undo[-1]
+    assert not redo
+
+
+def test_typing_is_undone_at_once():
+    editor = HexEditor()
+    editor.buffer = PieceTable(b'0123456789')
+    for i, value in enumerate(b'abcd'):
+        editor.edit_byte(2 + i, value)
+    editor.insert_byte(6, ord('x'))
+    editor.delete_byte(6)
+    assert editor.get_data() == b'01abcd6789'
+    editor.undo()
+    assert editor.get_data() == b'0123456789'
+    assert not editor.can_undo()
+
+
+@pytest.mark.parametrize('seed', range(15))
+@pytest.mark.parametrize('use_mmap', [True, False])
+def test_save_keeps_history(seed, use_mmap, tmp_path, monkeypatch):
+    monkeypatch.setattr(hex_editor, 'COMPACT_MIN', 64)
+    rnd = random.Random(seed)
+    path = str(tmp_path / 'data.bin')
+    with open(path, 'wb') as f:
+        f.write(random_bytes(rnd, 300))
+    editor = HexEditor(undo_budget=10 ** 7)
+    assert editor.load_file(path, use_mmap)
+    undo = [editor.get_data()]
+    redo = []
+    for _ in range(150):
+        op = rnd.random()
+        if op < 0.5:
+            offset, length, data = random_edit(rnd, editor.get_size())
+            if not length and not data:
+                continue
+            editor.replace_range(offset, length, data)
+            undo.append(editor.get_data())
+            redo = []
+        elif op < 0.65:
+            if editor.undo() is not None:
+                redo.append(undo.pop())
+        elif op < 0.75:
+            if editor.redo() is not None:
+                undo.append(redo.pop())
+        else:
+            assert editor.save_file()
+            assert not editor.is_modified()
+            assert not os.path.exists(journal_path(path))
+            with open(path, 'rb') as f:
+                assert f.read() == undo[-1]
+        assert editor.get_data() == undo[-1]
+    while editor.undo() is not None:
+        redo.append(undo.pop())
+        assert editor.get_data() == undo[-1]
+    assert len(undo) == 1
+    editor.close()
+
+
+def _ranges(rnd, size):
+    """不重叠的随机区间 [(偏移, 长度)]"""
+    ranges = []
+    offset = 0
+    while offset < size:
+        offset += rnd.randint(0, 64)
+        length = min(rnd.randint(1, 64), size - offset)
+        if length > 0:
+            ranges.append((offset, length))
+        offset += length
+    return ranges
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_recover_interrupted_save(seed, tmp_path):
+    rnd = random.Random(seed)
+    path = str(tmp_path / 'data.bin')
+    original = random_bytes(rnd, 1000)
+    with open(path, 'wb') as f:
+        f.write(original)
+    ranges = _ranges(rnd, len(original))
+    write_journal(path, ranges)
+    # 保存中途中断：只有一部分区间被写入，最后一个区间可能只写了一半
+    with open(path, 'r+b') as f:
+        for offset, length in ranges[:rnd.randint(0, len(ranges))]:
+            f.seek(offset)
+            f.write(random_bytes(rnd, rnd.randint(1, length)))
+    assert recover_journal(path)
+    assert not os.path.exists(journal_path(path))
+    with open(path, 'rb') as f:
+        assert f.read() == original
+
+    # 加载时自动回滚
+    write_journal(path, ranges)
+    offset, length = ranges[0]
+    with open(path, 'r+b') as f:
+        f.seek(offset)
+        f.write(random_bytes(rnd, length))
+    editor = HexEditor()
+    assert editor.load_file(path)
+    assert editor.recovered
+    assert editor.get_data() == original
+    editor.close()
+
+
+@pytest.mark.parametrize('seed', range(10))
+def test_incomplete_journal_is_discarded(seed, tmp_path):
+    rnd = random.Random(seed)
+    path = str(tmp_path / 'data.bin')
+    original = random_bytes(rnd, 500)
+    with open(path, 'wb') as f:
+        f.write(original)
+    write_journal(path, _ranges(rnd, len(original)))
+    # 日志还没写完就中断，文件尚未被改写
+    journal = journal_path(path)
+    with open(journal, 'r+b') as f:
+        f.truncate(rnd.randrange(os.path.getsize(journal)))
+    assert not recover_journal(path)
+    assert not os.path.exists(journal)
+    with open(path, 'rb') as f:
+        assert f.read() == original
@@ -0,0 +1,56 @@
+import random
+import struct
+
+import pytest
+
+from tools.encoding_detector import SAMPLE_SIZE, detect_encoding
+
+CJK_TEXT = '十六进制编辑器可以打开任意大小的文件，\n编辑后原位保存。日本語のテキストも表示できます。\n' * 20
+
+
+class BytesReader:
+    def __init__(self, data: bytes):
+        self.data = data
+
+    def get_size(self) -> int:
+        return len(self.data)
+
+    def read(self, offset: int, length: int) -> bytes:
+        return self.data[offset:offset + length]
+
+
+def best_guess(data: bytes) -> str:
+    return detect_encoding(BytesReader(data))[0][0]
+
+
+@pytest.mark.parametrize('encoding', ['utf-16le', 'utf-16be'])
+def test_cjk_utf16_without_bom(encoding):
+    assert best_guess(CJK_TEXT.encode(encoding)) == encoding
+
+
+@pytest.mark.parametrize('encoding', ['utf-16le', 'utf-16be'])
+def test_large_cjk_utf16_with_surrogates(encoding):
+    # 超过三个采样窗口，且中间和结尾窗口可能从代理对中间开始
+    text = (CJK_TEXT + '𠀀𠀁\n') * (SAMPLE_SIZE * 4 // len(CJK_TEXT.encode(encoding)))
+    assert best_guess(text.encode(encoding)) == encoding
+
+
+@pytest.mark.parametrize('encoding', ['gbk', 'shift-jis'])
+def test_legacy_encodings_are_not_utf16(encoding):
+    text = '十六进制编辑器可以打开任意大小的文件，\n编辑后原位保存。\n' * 20
+    if encoding == 'shift-jis':
+        text = '日本語のテキストを表示できます。\n' * 20
+    assert best_guess(text.encode(encoding)) == encoding
+
+
+def test_random_data_is_not_utf16():
+    data = bytes(random.Random(0).randrange(256) for _ in range(SAMPLE_SIZE))
+    assert not best_guess(data).startswith('utf-16')
+
+
+def test_integer_table_is_not_utf16():
+    # 长度和偏移交替的表（如 .mo 文件）：零字节很多，也含有与换行、空格相同的值
+    rnd = random.Random(1)
+    values = [rnd.randrange(64) if i % 2 else rnd.randrange(1 << 20) for i in range(4096)]
+    data = struct.pack(f'<{len(values)}I', *values)
+    assert not best_guess(data).startswith('utf-16')
@@ -0,0 +1,51 @@
+import random
+
+import markdown
+import pytest
+
+import tools.markdown_renderer as markdown_renderer
+from tools.markdown_renderer import EXTENSIONS, MarkdownRenderer
+
+SNIPPETS = [
+    '# 标题',
+    '段落第一行\n段落第二行',
+    '> 引用',
+    '> 引用第一行\n> 引用第二行',
+    '>',
+    '> - 引用中的列表',
+    '> > 嵌套引用',
+    '- 列表项',
+    '* 列表项\n* 列表项',
+    '1. 有序列表项',
+    '    缩进的内容',
+    '```\n代码\n\n代码\n```',
+    '| a | b |\n| - | - |\n| 1 | 2 |',
+    '---',
+]
+
+
+def render(text):
+    return MarkdownRenderer().render(text)
+
+
+def expected(text):
+    return markdown.markdown(text, extensions=EXTENSIONS)
+
+
+@pytest.fixture(autouse=True)
+def split_groups(monkeypatch):
+    # 每个块单独成组，任意相邻的块都可能分属不同的组
+    monkeypatch.setattr(markdown_renderer, 'GROUP_SIZE', 1)
+
+
+def test_adjacent_blockquotes_are_merged():
+    text = '> 第一段\n\n> 第二段\n\n正文'
+    assert render(text) == expected(text)
+    assert render(text).count('<blockquote>') == 1
+
+
+@pytest.mark.parametrize('seed', range(50))
+def test_matches_whole_document(seed):
+    rnd = random.Random(seed)
+    text = '\n\n'.join(rnd.choice(SNIPPETS) for _ in range(rnd.randint(1, 12)))
+    assert render(text) == expected(text), text
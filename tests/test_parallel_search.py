@@ -0,0 +1,26 @@
+import re
+
+import pytest
+
+from tools.parallel_search import iter_matches_parallel
+from tools.patterns import LiteralPattern
+
+
+@pytest.mark.parametrize('case_sensitive', [True, False])
+def test_matches_across_chunk_boundaries(tmp_path, case_sensitive):
+    path = tmp_path / 'data.bin'
+    data = b'abAB' * 500 + b'abab'
+    path.write_bytes(data)
+    pattern = LiteralPattern(b'bab', case_sensitive=case_sensitive)
+    # 很小的数据块使匹配频繁跨越窗口边界
+    found = [offset for offset, _, _ in iter_matches_parallel(str(path), pattern, workers=2,
+                                                              chunk_size=7)]
+    flags = 0 if case_sensitive else re.IGNORECASE
+    assert found == [m.start() for m in re.finditer(b'(?=bab)', data, flags)]
+
+
+def test_cancel_returns_early(tmp_path):
+    path = tmp_path / 'data.bin'
+    path.write_bytes(b'x' * 1000)
+    assert list(iter_matches_parallel(str(path), LiteralPattern(b'xx'), workers=2,
+                                      is_cancelled=lambda: True)) == []
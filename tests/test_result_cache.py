@@ -0,0 +1,70 @@
+from plugins.base64_plugin import Base64EncodePlugin
+from plugins.plugin_manager import PluginManager
+from plugins.result_cache import ResultCache
+
+
+class BuiltinPluginManager(PluginManager):
+    """只加载内置插件，不扫描自定义插件目录"""
+
+    def _load_custom_plugins(self):
+        pass
+
+
+class CountingReader:
+    def __init__(self, data: bytes):
+        self.data = data
+        self.reads = 0
+
+    def read(self, offset: int, length: int) -> bytes:
+        self.reads += 1
+        return self.data[offset:offset + length]
+
+
+def make_manager(disk_dir=None):
+    manager = BuiltinPluginManager()
+    manager.enable_cache(disk_dir=disk_dir)
+    return manager
+
+
+def test_session_versions_are_not_shared_through_disk(tmp_path):
+    plugin = Base64EncodePlugin()
+    # 两个进程中的已修改文档碰巧有相同的 revision、偏移和长度
+    first = make_manager(str(tmp_path))
+    assert first.run(plugin, CountingReader(b"hello"), 0, 5, version=('revision', 7)) == b"aGVsbG8="
+    second = make_manager(str(tmp_path))
+    assert second.run(plugin, CountingReader(b"world"), 0, 5, version=('revision', 7)) == b"d29ybGQ="
+
+
+def test_file_versions_hit_through_disk(tmp_path):
+    plugin = Base64EncodePlugin()
+    version = ('/data/file.bin', 5, 123)
+    first = make_manager(str(tmp_path))
+    assert first.run(plugin, CountingReader(b"hello"), 0, 5, version=version) == b"aGVsbG8="
+    second = make_manager(str(tmp_path))
+    reader = CountingReader(b"hello")
+    assert second.run(plugin, reader, 0, 5, version=version) == b"aGVsbG8="
+    assert reader.reads == 0
+
+
+def test_same_content_hits_by_hash():
+    plugin = Base64EncodePlugin()
+    manager = make_manager()
+    data = b"hello, hello"
+    assert manager.run(plugin, CountingReader(data), 0, 5, version=('revision', 1)) == b"aGVsbG8="
+    # 同样的内容位于其他位置，或文档有无关编辑后版本变化
+    assert manager.run(plugin, CountingReader(data), 7, 5, version=('revision', 1)) == b"aGVsbG8="
+    assert manager.run(plugin, CountingReader(data), 0, 5, version=('revision', 2)) == b"aGVsbG8="
+    stats = manager.result_cache.stats()
+    assert (stats['hits'], stats['misses']) == (2, 1)
+    # 再次执行同一版本的同一范围时不读取输入
+    reader = CountingReader(data)
+    assert manager.run(plugin, reader, 7, 5, version=('revision', 1)) == b"aGVsbG8="
+    assert reader.reads == 0
+
+
+def test_make_key_matches_streamed_key():
+    plugin = Base64EncodePlugin()
+    manager = make_manager()
+    data = bytes(range(256)) * 10
+    manager.run(plugin, CountingReader(data), 0, len(data))
+    assert manager.result_cache.get(ResultCache.make_key(plugin, [data])) == manager.process_data(plugin, data)
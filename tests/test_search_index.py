@@ -0,0 +1,90 @@
+import random
+
+import pytest
+
+from tools.piece_table import PieceTable
+from tools.search_index import SearchIndex, index_blocks
+
+BLOCK_SIZE = 64 * 1024
+
+
+def start_update(index, table):
+    """模拟后台更新：记下启动时的快照和版本，返回稍后合并结果的函数"""
+    snapshot = table.snapshot()
+    size = len(snapshot)
+    blocks = index.pending_blocks(size)
+    generation, layout_generation = index.generation, index.layout_generation
+
+    def finish():
+        results = index_blocks(snapshot, blocks, index.block_size)
+        index.apply_update(results, generation, layout_generation, size)
+    return finish
+
+
+def edit(index, table, offset, length, data):
+    table.replace(offset, length, data)
+    index.mark_changed(offset, length, len(data))
+
+
+def candidate_starts(index, pattern: bytes, size: int):
+    ranges = index.candidate_ranges(pattern, size)
+    assert ranges is not None
+    return ranges
+
+
+def covered(ranges, offset):
+    return any(start <= offset < end for start, end in ranges)
+
+
+def test_edit_at_block_start_reindexes_previous_block():
+    table = PieceTable(b'x' * (4 * BLOCK_SIZE))
+    index = SearchIndex(BLOCK_SIZE)
+    assert index.build(table)
+    edit(index, table, BLOCK_SIZE, 1, b'a')
+    start_update(index, table)()
+    assert index.is_complete(len(table))
+    assert covered(candidate_starts(index, b'xxa', len(table)), BLOCK_SIZE - 2)
+
+
+def test_edit_during_update_keeps_block_dirty():
+    table = PieceTable(b'x' * (4 * BLOCK_SIZE))
+    index = SearchIndex(BLOCK_SIZE)
+    assert index.build(table)
+    # 长度变化使后面的块变为未索引，随后的后台更新会重新索引它们
+    edit(index, table, BLOCK_SIZE, 1, b'')
+    finish = start_update(index, table)
+    # 更新进行中，未索引的块被同长度编辑
+    edit(index, table, 3 * BLOCK_SIZE - 100, 3, b'abc')
+    finish()
+    assert covered(candidate_starts(index, b'abc', len(table)), 3 * BLOCK_SIZE - 100)
+
+
+@pytest.mark.parametrize('seed', range(30))
+def test_candidates_cover_all_matches(seed):
+    rnd = random.Random(seed)
+    block_size = 256
+    table = PieceTable(bytes(rnd.choice(b'xy') for _ in range(block_size * 8)))
+    index = SearchIndex(block_size)
+    assert index.build(table)
+    pending = []
+    for _ in range(60):
+        op = rnd.random()
+        size = len(table)
+        if op < 0.6:
+            offset = rnd.randrange(size)
+            length = rnd.randint(0, min(8, size - offset))
+            data = bytes(rnd.choice(b'xyab') for _ in range(length))
+            if rnd.random() < 0.3:
+                data = data[:rnd.randint(0, len(data))] + b'ab'[:rnd.randint(0, 2)]
+            edit(index, table, offset, length, data)
+        elif op < 0.8:
+            pending.append(start_update(index, table))
+        elif pending:
+            pending.pop(rnd.randrange(len(pending)))()
+        data = table.tobytes()
+        for pattern in (b'xxa', b'aby', b'bab', b'yab'):
+            ranges = candidate_starts(index, pattern, len(data))
+            start = data.find(pattern)
+            while start != -1:
+                assert covered(ranges, start), (pattern, start)
+                start = data.find(pattern, start + 1)
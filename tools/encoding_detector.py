@@ -0,0 +1,156 @@
+import codecs
+import re
+
+# 每个采样窗口的大小；只读取开头、中间和结尾三个窗口，耗时与文件大小无关
+SAMPLE_SIZE = 64 * 1024
+# 双字节编码的字节范围统计逐个字符分词，只取每个窗口的开头部分，足以得到稳定的比例
+LEGACY_SAMPLE_SIZE = 16 * 1024
+
+_BOMS = ((codecs.BOM_UTF32_LE, 'utf-32'), (codecs.BOM_UTF32_BE, 'utf-32'),
+         (codecs.BOM_UTF8, 'utf-8-sig'),
+         (codecs.BOM_UTF16_LE, 'utf-16'), (codecs.BOM_UTF16_BE, 'utf-16'))
+
+# 双字节编码的分词规则：(常用字符区, 其余有效字符, 无效字节)，ASCII 连续段不分组
+# 常用字符区取各编码中高频字符所在的首字节范围，用于区分互相兼容的编码
+_LEGACY = {
+    # GB2312 符号区和一级汉字；其余为二级汉字和 GBK 扩展区
+    'gbk': re.compile(rb'[\x00-\x7f]+|([\xa1-\xa3\xb0-\xd7][\xa1-\xfe])'
+                      rb'|([\x81-\xfe][\x40-\x7e\x80-\xfe])|(.)', re.DOTALL),
+    # Big5 符号区和常用字；其余为次常用字
+    'big5': re.compile(rb'[\x00-\x7f]+|([\xa1-\xa3\xa4-\xc6][\x40-\x7e\xa1-\xfe])'
+                       rb'|([\x81-\xfe][\x40-\x7e\xa1-\xfe])|(.)', re.DOTALL),
+    # 全角符号、假名和第一水准汉字；其余为半角片假名和第二水准汉字
+    'shift-jis': re.compile(rb'[\x00-\x7f]+|([\x81-\x83\x88-\x9f][\x40-\x7e\x80-\xfc])'
+                            rb'|([\x84-\x87\xe0-\xfc][\x40-\x7e\x80-\xfc]|[\xa1-\xdf])|(.)', re.DOTALL),
+}
+_HIGH_BYTE = re.compile(rb'[\x80-\xff]')
+_CONTROL = re.compile(r'[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+
+def sample_windows(reader, size: int = SAMPLE_SIZE) -> list:
+    """读取开头、中间和结尾的采样窗口（偏移按 4 字节对齐，便于判断 UTF-16/32）"""
+    total = reader.get_size()
+    if total <= size * 3:
+        return [reader.read(0, total)]
+    middle = (total // 2 - size // 2) & ~3
+    end = (total - size) & ~3
+    return [reader.read(offset, size) for offset in (0, middle, end)]
+
+
+def _null_pattern(windows: list):
+    """按零字节的位置判断无 BOM 的 UTF-16/UTF-32，返回 (编码, 可信度) 或 None"""
+    data = b''.join(windows)
+    quarter = len(data) // 4
+    if quarter < 4:
+        return None
+    # 各码元位置上零字节的比例；ASCII 为主的 UTF-16LE 文本奇数位几乎全为零
+    ratios = [data[i::4].count(0) / quarter for i in range(4)]
+    if min(ratios[1:]) > 0.9 and ratios[0] < 0.1:
+        return 'utf-32-le', min(ratios[1:])
+    if min(ratios[:3]) > 0.9 and ratios[3] < 0.1:
+        return 'utf-32-be', min(ratios[:3])
+    even = (ratios[0] + ratios[2]) / 2
+    odd = (ratios[1] + ratios[3]) / 2
+    if odd > 0.4 and even < 0.05:
+        return 'utf-16le', min(1.0, odd + 0.4)
+    if even > 0.4 and odd < 0.05:
+        return 'utf-16be', min(1.0, even + 0.4)
+    return None
+
+
+def _utf16_parity(windows: list):
+    """按零字节的奇偶分布判断以非 ASCII 字符为主（如中日韩文字）的无 BOM UTF-16，返回 (编码, 可信度) 或 None
+
+    这类文本只有换行、空格等 ASCII 字符带零字节，比例太低，_null_pattern 无法识别；
+    零字节较多的一侧决定字节序，再按该字节序解码，换行和空格足够多、控制字符很少才认为是文本。
+    """
+    even = sum(window[0::2].count(0) for window in windows)
+    odd = sum(window[1::2].count(0) for window in windows)
+    units = sum(len(window) for window in windows) // 2
+    minimum = max(4, units // 100)
+    if max(even, odd) < minimum:
+        return None
+    encoding = 'utf-16le' if odd > even else 'utf-16be'
+    spaces = controls = 0
+    for window in windows:
+        window = window[:len(window) & ~1]
+        # 窗口开头被截断的代理对的后半部分不算错误
+        high = window[1::2][:1] if encoding == 'utf-16le' else window[0::2][:1]
+        if high and 0xDC <= high[0] <= 0xDF:
+            window = window[2:]
+        # 零字节也可能来自二进制数据，能按 UTF-16 解码才认为是文本
+        try:
+            text = codecs.getincrementaldecoder(encoding)().decode(window, final=False)
+        except UnicodeDecodeError:
+            return None
+        spaces += sum(text.count(char) for char in ' \t\r\n')
+        # 二进制结构中的整数按 UTF-16 解码为 U+0000 等控制字符
+        controls += len(_CONTROL.findall(text))
+    if spaces < minimum or controls * 10 > spaces:
+        return None
+    return encoding, 0.8
+
+
+def _is_utf8(window: bytes) -> bool:
+    """判断窗口是否为有效的 UTF-8，窗口两端被截断的字符不算错误"""
+    start = 0
+    while start < min(3, len(window)) and 0x80 <= window[start] <= 0xBF:
+        start += 1
+    try:
+        codecs.getincrementaldecoder('utf-8')().decode(window[start:], final=False)
+        return True
+    except UnicodeDecodeError:
+        return False
+
+
+def _legacy_score(windows: list, encoding: str) -> float:
+    """常用字符区占非 ASCII 字符的比例，无效字节按两倍扣分"""
+    common = other = invalid = 0
+    for window in windows:
+        tokens = _LEGACY[encoding].findall(window[:LEGACY_SAMPLE_SIZE])
+        if not tokens:
+            continue
+        # 转置后每一列是一个分组，未匹配的位置为空串
+        c, o, i = zip(*tokens)
+        common += len(c) - c.count(b'')
+        other += len(o) - o.count(b'')
+        invalid += len(i) - i.count(b'')
+    total = common + other + invalid
+    if total == 0:
+        return 0.0
+    return max(0.0, (common - 2 * invalid) / total)
+
+
+def detect_encoding(reader, size: int = SAMPLE_SIZE) -> list:
+    """猜测编码，返回按可信度从高到低排列的 [(编码, 可信度)]
+
+    依次检查 BOM、UTF-16/32 的零字节分布、纯 ASCII、UTF-8 有效性和 UTF-16 零字节的奇偶分布，
+    都不符合时按 GBK、Big5、Shift-JIS 的字节范围统计打分。
+    """
+    windows = sample_windows(reader, size)
+    if not windows or not windows[0]:
+        return [('utf-8', 1.0)]
+    head = windows[0]
+    for bom, encoding in _BOMS:
+        if head.startswith(bom):
+            return [(encoding, 1.0)]
+
+    wide = _null_pattern(windows)
+    if wide is not None:
+        return [wide]
+
+    if not any(_HIGH_BYTE.search(window) for window in windows):
+        return [('utf-8', 1.0), ('ascii', 1.0)]
+    # 随机的非 ASCII 数据几乎不可能恰好是有效的 UTF-8
+    if all(_is_utf8(window) for window in windows):
+        return [('utf-8', 0.99)]
+    wide = _utf16_parity(windows)
+    if wide is not None:
+        return [wide]
+
+    guesses = [(encoding, _legacy_score(windows, encoding)) for encoding in _LEGACY]
+    guesses.sort(key=lambda guess: guess[1], reverse=True)
+    guesses = [guess for guess in guesses if guess[1] > 0]
+    # 单字节编码可以解码任何数据，作为最后的备选
+    guesses.append(('iso-8859-1', 0.1))
+    return guesses
@@ -29,12 +29,15 @@ class FileManager:
             return None
     
     @staticmethod
-    def write_file_chunk(file_path: str, offset: int, data: bytes):
-        """写入文件块"""
+    def write_file_chunk(file_path: str, offset: int, data: bytes, sync: bool = False):
+        """写入文件块，sync 为 True 时等待数据（包括之前写入的块）落盘"""
         try:
             with open(file_path, 'r+b') as f:
                 f.seek(offset)
                 f.write(data)
+                if sync:
+                    f.flush()
+                    os.fsync(f.fileno())
                 return True
         except Exception as e:
             print(f"写入文件块失败: {str(e)}")
@@ -1,60 +1,504 @@
+import mmap
+import os
+import shutil
+import tempfile
+from bisect import bisect_right
+from itertools import count
+from . import perf
+from .piece_table import PieceTable, ORIGINAL, piece_size, added_size, extra_size, remap_subtree
+from .encoding_detector import detect_encoding
+from .file_manager import FileManager
+from .save_journal import (write_journal, remove_journal, recover_journal, fsync_dir,
+                           journal_path, journal_entries)
+from .undo_journal import UndoJournal, EditRecord, DEFAULT_UNDO_BUDGET
+
+# 原位保存时每次写入的最大字节数
+SAVE_CHUNK_SIZE = 4 * 1024 * 1024
+# 不小于该大小的新数据写入临时文件并映射，不占用内存（撤销记录也只引用映射）
+SPILL_SIZE = 8 * 1024 * 1024
+# 被丢弃的撤销记录引用的数据超过该值且超过新增缓冲区和溢出文件总大小的一半时压缩缓冲区
+COMPACT_MIN = 1024 * 1024
+
+# 进程内所有文档共用的版本号序列，不同文档的 revision 不会相同
+_revisions = count(1)
+
+
+def _stat_key(file_path: str) -> tuple:
+    """文件的 (大小, 修改时间 ns)，用于判断加载后文件是否被其他程序修改"""
+    stat = os.stat(file_path)
+    return stat.st_size, stat.st_mtime_ns
+
 class HexEditor:
-    def __init__(self):
-        self.data = bytearray()
+    def __init__(self, undo_budget: int = DEFAULT_UNDO_BUDGET):
+        self.buffer = PieceTable()
         self.file_path = None
-    
-    def load_file(self, file_path: str):
-        """加载文件内容"""
+        self._file = None
+        self._mmap = None
+        self._use_mmap = True
+        self._file_key = None
+        # 加载时是否回滚了上次未完成的原位保存
+        self.recovered = False
+        self._change_listeners = []
+        # 编码检测结果，按文档缓存，编辑或重新加载后失效
+        self._encoding_guess = None
+        # 每次编辑或重新加载后更新为新的版本号，后台任务据此判断其快照是否过期
+        self.revision = next(_revisions)
+        # 撤销/重做记录只保存片段引用，不复制数据
+        self.undo_journal = UndoJournal(undo_budget)
+        # 大块新数据溢出到的临时文件，缓冲区编号 -> 文件
+        self._spill_files = {}
+        # view() 返回的直接引用映射的 memoryview，保存、重新加载和关闭前释放
+        self._views = []
+
+    def add_change_listener(self, callback):
+        """注册数据变化回调 callback(offset, old_length, new_length)"""
+        self._change_listeners.append(callback)
+
+    def _notify_change(self, offset: int, old_length: int, new_length: int):
+        self._encoding_guess = None
+        self.revision = next(_revisions)
+        for callback in self._change_listeners:
+            callback(offset, old_length, new_length)
+
+    @perf.timed('hex.load', 'io')
+    def load_file(self, file_path: str, use_mmap: bool = True):
+        """加载文件内容
+
+        use_mmap 为 True 时以只读方式映射文件，数据按需从映射中读取，
+        只有被编辑的部分才会复制到内存中。
+        """
         try:
-            with open(file_path, 'rb') as f:
-                self.data = bytearray(f.read())
+            # 上次原位保存中途中断时先按日志回滚，文件回到保存前的完整状态
+            recovered = recover_journal(file_path)
+            f, mapped, original = self._open_original(file_path, use_mmap)
+            self.close()
+            self._file, self._mmap = f, mapped
+            self.buffer = PieceTable(original)
             self.file_path = file_path
+            self._use_mmap = use_mmap
+            self._file_key = _stat_key(file_path)
+            self.recovered = recovered
+            self._encoding_guess = None
+            self.revision = next(_revisions)
+            self.undo_journal.clear()
             return True
         except Exception as e:
             print(f"加载文件失败: {str(e)}")
             return False
-    
+
+    @staticmethod
+    def _open_original(file_path: str, use_mmap: bool) -> tuple:
+        """打开文件作为原始数据，返回 (文件对象, 文件映射, 原始数据)
+
+        use_mmap 为 False 或文件为空（无法映射）时读入内存，文件对象和映射为 None。
+        """
+        if not use_mmap:
+            with open(file_path, 'rb') as f:
+                return None, None, f.read()
+        f = open(file_path, 'rb')
+        try:
+            size = os.fstat(f.fileno()).st_size
+            # 空文件无法映射
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else None
+        except Exception:
+            f.close()
+            raise
+        return f, mapped, mapped if mapped is not None else b''
+
+    def close(self):
+        """释放文件映射和溢出的临时文件，调用前持有快照的线程必须已经退出"""
+        self._release_views()
+        self._release_spill_files()
+        if self._mmap is not None:
+            try:
+                self._mmap.close()
+            except BufferError:
+                # 调用方从视图再切出的 memoryview 仍引用映射，交给垃圾回收释放
+                pass
+            self._mmap = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _release_spill_files(self):
+        """关闭溢出的临时文件；映射可能仍被快照引用，交给垃圾回收释放"""
+        for f in self._spill_files.values():
+            f.close()
+        self._spill_files = {}
+
+    @perf.timed('hex.save', 'io')
     def save_file(self, file_path: str = None):
-        """保存文件内容"""
+        """保存文件内容
+
+        保存到原文件且大小不变时只写回修改过的区间；否则写入临时文件后原子替换。
+        之前由 view() 返回的引用映射的视图会被释放。
+        """
         if file_path is None:
             file_path = self.file_path
-        
+
         if file_path is None:
             return False
-        
+
+        # 原位保存会改写映射的内容，视图不能在之后悄悄看到新数据
+        self._release_views()
         try:
-            with open(file_path, 'wb') as f:
-                f.write(self.data)
+            same_file = self.file_path is not None and os.path.exists(file_path) and \
+                os.path.samefile(file_path, self.file_path)
+            if same_file and self._save_in_place(file_path):
+                return True
+            self._replace_file(file_path, reload=same_file)
             return True
         except Exception as e:
             print(f"保存文件失败: {str(e)}")
             return False
-    
+
+    def _write_to(self, f):
+        """将当前数据按片段写入文件对象"""
+        for chunk in self.buffer.iter_chunks():
+            f.write(chunk)
+
+    def _save_in_place(self, file_path: str) -> bool:
+        """只把修改过的区间写回原文件，无法原位保存时返回 False
+
+        写入前先把这些区间的原内容记入日志并落盘，写入完成并落盘后再删除日志；
+        中途崩溃时下次加载按日志回滚，文件不会处于半新半旧的状态。
+        """
+        ranges = self.buffer.dirty_ranges()
+        if ranges is None or self._file_key is None or _stat_key(file_path) != self._file_key:
+            return False
+        saved = None
+        if ranges:
+            write_journal(file_path, ranges)
+            try:
+                last = ranges[-1][0] + ranges[-1][1]
+                for offset, length in ranges:
+                    for start in range(offset, offset + length, SAVE_CHUNK_SIZE):
+                        end = min(start + SAVE_CHUNK_SIZE, offset + length)
+                        if not FileManager.write_file_chunk(file_path, start, self.buffer.read(start, end - start),
+                                                            sync=end == last):
+                            raise OSError(f"写入 {file_path} 失败")
+            except Exception:
+                recover_journal(file_path)
+                raise
+            if self._mmap is not None and (self.undo_journal.can_undo() or self.undo_journal.can_redo()):
+                # 文件映射中这些区间已被改写，日志中保存着原内容，撤销记录改为引用日志
+                saved = self._keep_journal(file_path)
+            remove_journal(file_path)
+        # 文件内容已与文档一致，原始数据即为当前内容
+        if self._mmap is None and ranges:
+            # 读入内存的原始数据没有被改写，撤销记录继续引用它
+            self._rebase(self.buffer.tobytes())
+        else:
+            if ranges and saved is None:
+                self.undo_journal.clear()
+            self._rebase(saved=saved)
+        self._file_key = _stat_key(file_path)
+        return True
+
+    def _keep_journal(self, file_path: str):
+        """把保存日志映射为只读缓冲区，返回 (缓冲区编号, [(偏移, 长度, 原内容位置)])，失败时返回 None
+
+        日志随后即被删除；POSIX 上映射在删除后仍然有效，Windows 不能删除已打开的文件，先复制到临时文件。
+        """
+        try:
+            path = journal_path(file_path)
+            if os.name == 'nt':
+                f = tempfile.TemporaryFile(prefix='lovelyhex-')
+                try:
+                    with open(path, 'rb') as journal:
+                        shutil.copyfileobj(journal, f)
+                    f.flush()
+                except Exception:
+                    f.close()
+                    raise
+            else:
+                f = open(path, 'rb')
+            try:
+                entries = journal_entries(f)
+            except Exception:
+                f.close()
+                raise
+            index = self._add_spill_buffer(f)
+            return (index, entries) if index is not None else None
+        except Exception as e:
+            print(f"保留撤销记录失败: {str(e)}")
+            return None
+
+    def _rebase(self, original=None, saved=None):
+        """保存后以文件内容作为原始数据，并改写撤销记录，使其不再引用已被覆盖的原始数据
+
+        original 不为 None 时原来的原始数据保留为只读缓冲区，撤销记录中引用原始数据的片段改为引用它；
+        saved 为 _keep_journal 的返回值，原始数据中被原位改写的区间改为引用日志中的原内容。
+        """
+        journal = self.undo_journal
+        # 文档此前引用的新增数据和溢出文件可能只剩撤销记录引用，计入可压缩的数据
+        root = self.buffer.root
+        journal.released += added_size(root) + extra_size(root)
+        previous = self.buffer.rebase(original)
+        if previous is not None:
+            def move(buf, start, length):
+                return ((previous if buf == ORIGINAL else buf, start, length),)
+        elif saved is not None:
+            index, entries = saved
+            offsets = [offset for offset, _, _ in entries]
+
+            def move(buf, start, length):
+                if buf != ORIGINAL:
+                    return ((buf, start, length),)
+                pieces = []
+                position, end = start, start + length
+                while position < end:
+                    i = bisect_right(offsets, position) - 1
+                    if i >= 0 and position < offsets[i] + entries[i][1]:
+                        offset, size, data = entries[i]
+                        stop = min(end, offset + size)
+                        pieces.append((index, data + position - offset, stop - position))
+                    else:
+                        stop = min(end, offsets[i + 1]) if i + 1 < len(offsets) else end
+                        pieces.append((ORIGINAL, position, stop - position))
+                    position = stop
+                return pieces
+        else:
+            move = None
+        if move is not None:
+            memo = {}
+            journal.remap(lambda node: remap_subtree(node, move, memo))
+        self.revision = next(_revisions)
+        self._compact_if_needed()
+
+    def _replace_file(self, file_path: str, reload: bool = False):
+        """写入同目录的临时文件后原子替换目标文件；reload 为 True 时（保存到原文件）改用新文件作为原始数据
+
+        不能直接截断正在映射的文件，因此原文件只会被整体替换。撤销记录继续引用原来的文件映射。
+        """
+        fd, tmp_path = tempfile.mkstemp(prefix='.lovelyhex-', dir=os.path.dirname(os.path.abspath(file_path)))
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                self._write_to(f)
+                f.flush()
+                os.fsync(f.fileno())
+            if os.path.exists(file_path):
+                shutil.copymode(file_path, tmp_path)
+            # Windows 不能替换正在映射的文件，只能释放映射后重新加载，撤销记录随之清空
+            reopen = reload and os.name == 'nt' and self._mmap is not None
+            if reopen:
+                self.close()
+            os.replace(tmp_path, file_path)
+            fsync_dir(file_path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        if reopen:
+            self.load_file(file_path, self._use_mmap)
+        elif reload:
+            # 原来的文件映射（POSIX 上替换后仍指向旧文件）保留为撤销记录引用的只读缓冲区
+            f, mapped, original = self._open_original(file_path, self._use_mmap)
+            if self._file is not None:
+                self._file.close()
+            self._file, self._mmap = f, mapped
+            self._rebase(original)
+            self._file_key = _stat_key(file_path)
+
+    def _make_piece(self, data):
+        """为新数据创建片段，大块数据溢出到临时文件"""
+        if len(data) < SPILL_SIZE:
+            return self.buffer.make_piece(data)
+        f = tempfile.TemporaryFile(prefix='lovelyhex-')
+        try:
+            f.write(data)
+            f.flush()
+        except Exception:
+            f.close()
+            raise
+        return self._map_spill_file(f)
+
+    def _map_spill_file(self, f):
+        """把临时文件映射为只读缓冲区并创建引用其全部内容的片段，文件由编辑器接管"""
+        index = self._add_spill_buffer(f)
+        return self.buffer.make_piece(buf=index) if index is not None else None
+
+    def _add_spill_buffer(self, f):
+        """把文件映射为只读缓冲区，返回缓冲区编号（文件为空时关闭文件并返回 None），文件由编辑器接管"""
+        try:
+            size = os.fstat(f.fileno()).st_size
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else None
+        except Exception:
+            f.close()
+            raise
+        if mapped is None:
+            f.close()
+            return None
+        index = self.buffer.add_buffer(mapped)
+        self._spill_files[index] = f
+        return index
+
+    def _apply(self, offset: int, length: int, pieces, typing: bool = False):
+        """用片段替换指定范围并记入撤销记录；typing 表示逐字节输入，可与相邻的输入合并"""
+        perf.count('hex.edits')
+        old = self.buffer.splice(offset, length, pieces)
+        self.undo_journal.record(EditRecord(offset, old, pieces, typing))
+        self._compact_if_needed()
+        self._notify_change(offset, length, piece_size(pieces))
+
+    def _compact_if_needed(self):
+        """被丢弃的撤销记录引用的数据足够多时压缩新增缓冲区，释放其内存和不再引用的溢出文件"""
+        released = self.undo_journal.released
+        if released < COMPACT_MIN or released * 2 < self.buffer.stored_size:
+            return
+        with perf.span('hex.compact'):
+            remap, buffers = self.buffer.compact(self.undo_journal.subtrees())
+            self.undo_journal.remap(remap)
+            self.undo_journal.released = 0
+            for index in buffers:
+                f = self._spill_files.pop(index, None)
+                if f is not None:
+                    f.close()
+
     def edit_byte(self, offset: int, value: int):
         """编辑指定位置的字节"""
-        if 0 <= offset < len(self.data):
-            self.data[offset] = value
+        if 0 <= offset < len(self.buffer):
+            self._apply(offset, 1, self._make_piece(bytes((value,))), typing=True)
             return True
         return False
-    
+
     def insert_byte(self, offset: int, value: int):
         """在指定位置插入字节"""
-        if 0 <= offset <= len(self.data):
-            self.data.insert(offset, value)
+        if 0 <= offset <= len(self.buffer):
+            self._apply(offset, 0, self._make_piece(bytes((value,))), typing=True)
             return True
         return False
-    
+
     def delete_byte(self, offset: int):
         """删除指定位置的字节"""
-        if 0 <= offset < len(self.data):
-            del self.data[offset]
+        if 0 <= offset < len(self.buffer):
+            self._apply(offset, 1, None, typing=True)
+            return True
+        return False
+
+    def insert_bytes(self, offset: int, data: bytes):
+        """在指定位置插入多个字节"""
+        if 0 <= offset <= len(self.buffer):
+            self._apply(offset, 0, self._make_piece(data))
+            return True
+        return False
+
+    def delete_range(self, offset: int, length: int):
+        """删除指定范围的字节"""
+        if 0 <= offset and length > 0 and offset + length <= len(self.buffer):
+            self._apply(offset, length, None)
+            return True
+        return False
+
+    def replace_range(self, offset: int, length: int, data: bytes):
+        """用新数据替换指定范围的字节"""
+        if 0 <= offset and length >= 0 and offset + length <= len(self.buffer):
+            self._apply(offset, length, self._make_piece(data))
             return True
         return False
-    
+
+    def replace_range_from_file(self, offset: int, length: int, f):
+        """用文件对象（如插件的大结果临时文件）的全部内容替换指定范围
+
+        文件直接映射为只读缓冲区，不读入内存，由编辑器接管并负责关闭；范围无效时立即关闭。
+        """
+        if not (0 <= offset and length >= 0 and offset + length <= len(self.buffer)):
+            f.close()
+            return False
+        f.flush()
+        self._apply(offset, length, self._map_spill_file(f))
+        return True
+
+    def can_undo(self) -> bool:
+        return self.undo_journal.can_undo()
+
+    def can_redo(self) -> bool:
+        return self.undo_journal.can_redo()
+
+    def set_undo_budget(self, budget: int):
+        """设置撤销记录的内存上限（字节），超出时丢弃最早的记录"""
+        self.undo_journal.set_budget(budget)
+        self._compact_if_needed()
+
+    def undo(self):
+        """撤销最近一次编辑，返回恢复后的范围 (偏移, 长度)，没有可撤销的编辑时返回 None"""
+        if not self.undo_journal.can_undo():
+            return None
+        record = self.undo_journal.pop_undo()
+        self.buffer.splice(record.offset, record.new_length, record.old)
+        self._notify_change(record.offset, record.new_length, record.old_length)
+        return record.offset, record.old_length
+
+    def redo(self):
+        """重做最近一次撤销的编辑，返回重做后的范围 (偏移, 长度)，没有可重做的编辑时返回 None"""
+        if not self.undo_journal.can_redo():
+            return None
+        record = self.undo_journal.pop_redo()
+        self.buffer.splice(record.offset, record.old_length, record.new)
+        self._notify_change(record.offset, record.old_length, record.new_length)
+        return record.offset, record.new_length
+
+    def read(self, offset: int, length: int) -> bytes:
+        """读取指定范围的数据"""
+        return self.buffer.read(offset, length)
+
+    def view(self, offset: int, length: int) -> memoryview:
+        """返回指定范围数据的 memoryview，范围未被修改时直接引用文件映射，不复制
+
+        引用映射的视图只在下一次保存、重新加载或关闭之前有效：原位保存会改写映射的内容，
+        关闭需要解除映射，因此这些操作会先释放视图，之后再访问会抛出 ValueError。
+        需要长期保留的数据应复制为 bytes。
+        """
+        view = self.buffer.view(offset, length)
+        if isinstance(view.obj, mmap.mmap):
+            self._views.append(view)
+        return view
+
+    def _release_views(self):
+        """释放 view() 返回的引用映射的视图"""
+        for view in self._views:
+            view.release()
+        self._views = []
+
+    @perf.timed('hex.decode', 'decode')
+    def decode(self, encoding: str, errors: str = 'strict') -> str:
+        """把当前数据解码为文本，直接使用内存中的缓冲区，不重新读取文件"""
+        return self.buffer.decode(encoding, errors)
+
+    @perf.timed('hex.detect_encoding', 'decode')
+    def detect_encoding(self) -> list:
+        """猜测文档编码，返回按可信度排列的 [(编码, 可信度)]，只采样几个窗口"""
+        if self._encoding_guess is None:
+            self._encoding_guess = detect_encoding(self.buffer)
+        return self._encoding_guess
+
+    def is_modified(self) -> bool:
+        """数据是否已被修改（与已加载的文件内容不同）"""
+        return not self.buffer.is_pristine()
+
+    @property
+    def version(self) -> tuple:
+        """当前内容的标识，插件结果缓存据此按范围查找而不必重新读取数据
+
+        未修改时为 (文件路径, 大小, 修改时间)，跨会话不变；修改后为 ('revision', revision)，
+        revision 只在本进程内唯一，不能持久保存。
+        """
+        if self.file_path is not None and self._file_key is not None and not self.is_modified():
+            return (os.path.abspath(self.file_path),) + tuple(self._file_key)
+        return ('revision', self.revision)
+
+    def snapshot(self):
+        """返回当前数据的只读快照，供后台线程读取
+
+        快照直接引用文件映射：close()、重新加载和保存（原位写入会改写映射内容）之前，
+        必须先停止持有快照的线程并等待其退出。
+        """
+        return self.buffer.snapshot()
+
     def get_size(self):
         """获取数据大小"""
-        return len(self.data)
-    
+        return len(self.buffer)
+
     def get_data(self):
         """获取所有数据"""
-        return bytes(self.data)
+        return self.buffer.tobytes()
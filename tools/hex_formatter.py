@@ -0,0 +1,89 @@
+from collections import OrderedDict
+from . import perf
+
+# 可打印字符保持原样，其余字节显示为 '.'
+ASCII_TABLE = bytes(b if 32 <= b <= 126 else ord('.') for b in range(256))
+
+
+def format_rows(data: bytes, bytes_per_line: int = 16) -> tuple[list, list]:
+    """批量格式化多行数据，返回 (十六进制行列表, ASCII行列表)
+
+    整块数据只调用一次 bytes.hex 和 bytes.translate，再按行切片，
+    每行中间额外留一个空格分组。不足一行的部分用空格补齐。
+    """
+    if not data:
+        return [], []
+    half = bytes_per_line // 2
+    row_chars = bytes_per_line * 3
+    split = half * 3 - 1
+    width = row_chars - 1
+
+    hex_text = data.hex(' ').upper()
+    ascii_text = data.translate(ASCII_TABLE).decode('ascii')
+
+    full = len(data) // bytes_per_line
+    full_chars = full * row_chars
+    hex_lines = [hex_text[j:j + split] + '  ' + hex_text[j + split + 1:j + width]
+                 for j in range(0, full_chars, row_chars)]
+    ascii_lines = [ascii_text[i:i + bytes_per_line]
+                   for i in range(0, full * bytes_per_line, bytes_per_line)]
+
+    if len(data) % bytes_per_line:
+        tail = hex_text[full_chars:].ljust(width)
+        hex_lines.append(tail[:split] + '  ' + tail[split + 1:])
+        ascii_lines.append(ascii_text[full * bytes_per_line:].ljust(bytes_per_line))
+    return hex_lines, ascii_lines
+
+
+class RowCache:
+    """按块缓存格式化结果的 LRU 缓存，键为块起始偏移"""
+
+    def __init__(self, bytes_per_line: int = 16, rows_per_block: int = 256, max_blocks: int = 64):
+        self.bytes_per_line = bytes_per_line
+        self.block_bytes = bytes_per_line * rows_per_block
+        self.max_blocks = max_blocks
+        self._blocks = OrderedDict()
+
+    def __len__(self):
+        return len(self._blocks)
+
+    def get_block(self, reader, block_offset: int):
+        """返回指定块的格式化结果，未缓存时从 reader 读取并格式化"""
+        block = self._blocks.get(block_offset)
+        if block is not None:
+            self._blocks.move_to_end(block_offset)
+            perf.count('hex.row_cache.hit')
+            return block
+        perf.count('hex.row_cache.miss')
+        with perf.span('hex.format', 'render'):
+            block = format_rows(reader.read(block_offset, self.block_bytes), self.bytes_per_line)
+        self._blocks[block_offset] = block
+        while len(self._blocks) > self.max_blocks:
+            self._blocks.popitem(last=False)
+        return block
+
+    def rows(self, reader, first_row: int, count: int) -> tuple[list, list]:
+        """获取从 first_row 开始的 count 行，返回 (十六进制行列表, ASCII行列表)"""
+        hex_lines, ascii_lines = [], []
+        row = first_row
+        end_row = first_row + count
+        while row < end_row:
+            block_offset = row * self.bytes_per_line // self.block_bytes * self.block_bytes
+            block_hex, block_ascii = self.get_block(reader, block_offset)
+            index = row - block_offset // self.bytes_per_line
+            take = min(len(block_hex) - index, end_row - row)
+            if take <= 0:
+                break
+            hex_lines.extend(block_hex[index:index + take])
+            ascii_lines.extend(block_ascii[index:index + take])
+            row += take
+        return hex_lines, ascii_lines
+
+    def invalidate(self, start: int = 0, end: int = None):
+        """丢弃与 [start, end) 相交的块，end 为 None 表示直到末尾"""
+        for block_offset in list(self._blocks):
+            if block_offset + self.block_bytes > start and (end is None or block_offset < end):
+                del self._blocks[block_offset]
+
+    def clear(self):
+        self._blocks.clear()
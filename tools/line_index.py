@@ -0,0 +1,191 @@
+import codecs
+from array import array
+from bisect import bisect_right
+from itertools import accumulate, islice
+from . import perf
+
+LINE_CHUNK_SIZE = 4 * 1024 * 1024
+# 单行最多解码的字节数，超长行（如压缩过的 JSON）只显示开头部分
+MAX_LINE_BYTES = 16 * 1024
+
+_BOMS = ((codecs.BOM_UTF32_LE, 'utf-32-le'), (codecs.BOM_UTF32_BE, 'utf-32-be'),
+         (codecs.BOM_UTF16_LE, 'utf-16-le'), (codecs.BOM_UTF16_BE, 'utf-16-be'))
+
+
+def resolve_encoding(encoding: str, head: bytes = b'') -> tuple[str, int]:
+    """返回 (可以从任意行首开始解码的编码, 文档开头 BOM 的字节数)
+
+    utf-16/utf-32 按 BOM 确定字节序（无 BOM 时按小端），utf-8-sig 跳过 BOM，
+    这样每一行都能单独解码。
+    """
+    name = codecs.lookup(encoding).name
+    if name in ('utf-16', 'utf-32'):
+        for bom, codec in _BOMS:
+            if codec.startswith(name) and head.startswith(bom):
+                return codec, len(bom)
+        return name + '-le', 0
+    if name == 'utf-8-sig':
+        return 'utf-8', len(codecs.BOM_UTF8) if head.startswith(codecs.BOM_UTF8) else 0
+    return name, 0
+
+
+class LineIndex:
+    """文档的行首偏移表
+
+    可以在后台线程中逐块建立，界面线程同时读取已建立的部分；
+    按行号定位只需查表，与文件大小无关。建立完成后，编辑只重新扫描被编辑的范围，
+    其后的行首偏移整体平移：平移量先记在 shift 中，下次编辑时只把两次编辑之间的部分补上。
+    """
+
+    def __init__(self, encoding: str = 'utf-8', head: bytes = b''):
+        self.codec, self.start = resolve_encoding(encoding, head)
+        # GBK、Shift_JIS 等编码的多字节字符不含 0x0A，按编码后的换行符查找即可
+        self.newline = '\n'.encode(self.codec)
+        self.starts = array('q', [self.start])
+        # 下标不小于 shift_index 的行首偏移还需加上 shift 才是实际偏移
+        self.shift_index = 0
+        self.shift = 0
+        self.scanned = self.start
+        self.size = 0
+        self.complete = False
+
+    def set_encoding(self, encoding: str, head: bytes = b'') -> bool:
+        """切换解码使用的编码，换行符和 BOM 不变时返回 True（索引仍然有效）"""
+        codec, start = resolve_encoding(encoding, head)
+        if start != self.start or '\n'.encode(codec) != self.newline:
+            return False
+        self.codec = codec
+        return True
+
+    @perf.timed('text.line_index', 'decode')
+    def build(self, reader, progress=None, is_cancelled=None,
+              chunk_size: int = LINE_CHUNK_SIZE) -> bool:
+        """分块扫描换行符建立索引（可在后台线程调用），被取消时返回 False"""
+        self.size = size = reader.get_size()
+        step = len(self.newline)
+        # 块大小取换行符长度的整数倍，按码元对齐的换行符不会跨块
+        chunk_size -= chunk_size % step
+        pos = self.start
+        while pos < size:
+            if is_cancelled is not None and is_cancelled():
+                return False
+            chunk = reader.read(pos, chunk_size)
+            if not chunk:
+                break
+            if step == 1:
+                # 按行长度累加得到行首偏移，全部在 C 层完成
+                parts = chunk.split(self.newline)
+                parts.pop()
+                self.starts.extend(islice(accumulate(map((1).__add__, map(len, parts)),
+                                                     initial=pos), 1, None))
+            else:
+                self.starts.extend(self._find_aligned(chunk, pos, step))
+            pos += len(chunk)
+            self.scanned = pos
+            if progress is not None:
+                progress(pos, size)
+        self.complete = True
+        return True
+
+    def _find_aligned(self, chunk: bytes, base: int, step: int) -> list:
+        """查找按码元对齐的换行符，返回其后的行首偏移"""
+        found = []
+        find = chunk.find
+        i = find(self.newline)
+        while i != -1:
+            if i % step == 0:
+                found.append(base + i + step)
+                i = find(self.newline, i + step)
+            else:
+                i = find(self.newline, i + 1)
+        return found
+
+    @perf.timed('text.line_index_edit', 'decode')
+    def apply_edit(self, reader, offset: int, old_length: int, new_length: int) -> bool:
+        """文档中 [offset, offset + old_length) 被替换为 new_length 字节后更新索引
+
+        只重新扫描替换后的内容及其前后可能组成换行符的字节；索引尚未建立完成、编辑涉及 BOM、
+        多字节换行符的编码中长度变化不是码元的整数倍或新内容过大时返回 False，需要重新建立。
+        """
+        step = len(self.newline)
+        delta = new_length - old_length
+        if not self.complete or offset < self.start or delta % step or new_length > LINE_CHUNK_SIZE:
+            return False
+        # 换行符与 [offset, offset + old_length) 相交（或跨越 offset）的行首失效
+        first = self._index_after(offset)
+        last = self._index_after(offset + old_length + step - 1)
+        self._move_shift(last)
+        size = reader.get_size()
+        # 重新查找与新内容相交的换行符，多字节换行符按码元对齐
+        pos = max(self.start, offset - step + 1)
+        pos += -(pos - self.start) % step
+        end = min(size, offset + new_length + step - 1)
+        found = self._find_aligned(reader.read(pos, end - pos), pos, step) if pos < end else []
+        self.starts[first:last] = array('q', found)
+        self.shift_index = first + len(found)
+        self.shift += delta
+        self.size = size
+        self.scanned = size
+        return True
+
+    def _start(self, line: int) -> int:
+        start = self.starts[line]
+        return start + self.shift if line >= self.shift_index else start
+
+    def _index_after(self, offset: int) -> int:
+        """第一个大于 offset 的行首的下标"""
+        k = self.shift_index
+        if k < len(self.starts) and offset >= self.starts[k] + self.shift:
+            return bisect_right(self.starts, offset - self.shift, k)
+        return bisect_right(self.starts, offset, 0, k)
+
+    def _move_shift(self, index: int):
+        """把尚未加上平移量的范围的起点移到 index，只改写两者之间的行首"""
+        k, shift = self.shift_index, self.shift
+        if shift and index > k:
+            self.starts[k:index] = array('q', map(shift.__add__, self.starts[k:index]))
+        elif shift and index < k:
+            self.starts[index:k] = array('q', map((-shift).__add__, self.starts[index:k]))
+        self.shift_index = index
+
+    def line_count(self) -> int:
+        """已知的行数，建立过程中不包括尚未扫描到结尾的最后一行"""
+        count = len(self.starts)
+        return count if self.complete else count - 1
+
+    def line_span(self, line: int) -> tuple[int, int]:
+        """返回第 line 行（从 0 开始）的 (起始偏移, 结束偏移)，结束偏移包含换行符"""
+        start = self._start(line)
+        end = self._start(line + 1) if line + 1 < len(self.starts) else self.size
+        return start, end
+
+    def line_at(self, offset: int) -> int:
+        """返回包含指定偏移的行号"""
+        return max(0, min(self._index_after(offset) - 1, self.line_count() - 1))
+
+    def read_line(self, reader, line: int, max_bytes: int = MAX_LINE_BYTES) -> str:
+        """解码一行（不含换行符），超过 max_bytes 的部分被截断
+
+        使用增量解码器，截断处不完整的多字节字符留在解码器中而不是显示为替换字符。
+        """
+        start, end = self.line_span(line)
+        length = end - start
+        data = reader.read(start, min(length, max_bytes))
+        decoder = codecs.getincrementaldecoder(self.codec)('replace')
+        text = decoder.decode(data, final=length <= max_bytes)
+        if text.endswith('\n'):
+            text = text[:-1]
+        if text.endswith('\r'):
+            text = text[:-1]
+        return text
+
+    def read_lines(self, reader, first: int, last: int) -> str:
+        """解码 [first, last] 行的完整内容（用于复制）"""
+        start = self.line_span(first)[0]
+        end = self.line_span(last)[1]
+        decoder = codecs.getincrementaldecoder(self.codec)('replace')
+        parts = []
+        for offset in range(start, end, LINE_CHUNK_SIZE):
+            parts.append(decoder.decode(reader.read(offset, min(LINE_CHUNK_SIZE, end - offset))))
+        parts.append(decoder.decode(b'', final=True))
+        return ''.join(parts)
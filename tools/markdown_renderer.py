@@ -0,0 +1,175 @@
+import re
+import zlib
+from . import perf
+
+EXTENSIONS = ['fenced_code', 'tables', 'nl2br', 'attr_list']
+
+# 页面模板只构建一次，每次渲染只替换正文
+PAGE_TEMPLATE = """<!DOCTYPE html>
+<html>
+<head>
+    <meta charset="utf-8">
+    <style>
+        body { font-family: Arial, sans-serif; line-height: 1.6; }
+        h1, h2, h3 { color: #333; }
+        code { background-color: #f5f5f5; padding: 2px 4px; border-radius: 4px; }
+        pre { background-color: #f5f5f5; padding: 10px; border-radius: 4px; }
+        table { border-collapse: collapse; width: 100%; }
+        th, td { border: 1px solid #ddd; padding: 8px; text-align: left; }
+        th { background-color: #f5f5f5; }
+        blockquote { border-left: 4px solid #ccc; margin: 0; padding-left: 16px; }
+    </style>
+</head>
+<body>
+{body}
+</body>
+</html>
+"""
+
+_FENCE = re.compile(r' {0,3}(`{3,}|~{3,})')
+_LIST_ITEM = re.compile(r' {0,3}([*+-]|\d+[.)])\s')
+_QUOTE = re.compile(r' {0,3}>')
+# 引用式链接的定义作用于整个文档，需要附加到每个块
+_REFERENCE = re.compile(r'^ {0,3}\[([^\]]+)\]:\s*\S.*$', re.MULTILINE)
+_HTML_OPEN = re.compile(r'<([a-zA-Z][a-zA-Z0-9-]*)[\s>]')
+_BRACKETS = re.compile(r'\[([^\]]+)\]')
+# 批量转换时插在块组之间的分隔标记，原样出现在输出中
+BLOCK_MARKER = '<!--lovelyhex-block-->'
+# 相邻的块按内容划分为平均约 GROUP_SIZE 个块的组，以组为单位转换和缓存：
+# 每次调用 markdown 都有固定开销，分隔标记过多也会拖慢转换
+GROUP_SIZE = 8
+MAX_GROUP_BLOCKS = 32
+
+
+def render_page(body: str) -> str:
+    return PAGE_TEMPLATE.replace('{body}', body, 1)
+
+
+def group_blocks(blocks: list) -> list:
+    """按块内容决定分组边界，编辑只改变所在的组，前后的组保持不变"""
+    groups = []
+    current = []
+    for block in blocks:
+        current.append(block)
+        if zlib.crc32(block.encode('utf-8', 'surrogatepass')) % GROUP_SIZE == 0 or \
+                len(current) >= MAX_GROUP_BLOCKS:
+            groups.append('\n\n'.join(current))
+            current = []
+    if current:
+        groups.append('\n\n'.join(current))
+    return groups
+
+
+def split_blocks(text: str) -> list:
+    """按空行把 Markdown 切分为顶层块
+
+    围栏代码块和未闭合的 HTML 块内的空行不切分；以缩进开头的段落（列表项的后续段落、
+    嵌套内容）、紧跟在列表后的列表项以及紧跟在引用后的引用行并入上一个块（整体转换时
+    空行分隔的相邻引用合并为一个 <blockquote>），保证逐块转换与整体转换结果一致。
+    """
+    blocks = []
+    current = []
+    fence = None
+    in_list = False
+    in_quote = False
+    html_tag = None
+    for line in text.splitlines():
+        if fence is not None:
+            current.append(line)
+            if line.strip().startswith(fence):
+                fence = None
+            continue
+        if not line.strip():
+            if html_tag is not None:
+                if f'</{html_tag}' not in '\n'.join(current):
+                    current.append(line)
+                    continue
+                html_tag = None
+            if current:
+                blocks.append('\n'.join(current))
+                current = []
+            continue
+        if not current:
+            is_item = bool(_LIST_ITEM.match(line))
+            is_quote = bool(_QUOTE.match(line))
+            if blocks and (line[:1] in (' ', '\t') or in_list and is_item or in_quote and is_quote):
+                current = [blocks.pop(), '']
+            else:
+                in_list = is_item
+                in_quote = is_quote
+                match = _HTML_OPEN.match(line)
+                html_tag = match.group(1) if match else None
+        match = _FENCE.match(line)
+        if match:
+            fence = match.group(1)
+        current.append(line)
+    if current:
+        blocks.append('\n'.join(current))
+    return blocks
+
+
+class MarkdownRenderer:
+    """分块转换 Markdown，未变化的块组直接使用上次的转换结果
+
+    同一时间只能在一个线程中使用。
+    """
+
+    def __init__(self):
+        self._markdown = None
+        self._cache = {}  # 块组文本 -> HTML
+        self.converted = 0  # 最近一次渲染实际转换的块组数
+
+    def _converter(self):
+        if self._markdown is None:
+            # markdown 及其扩展导入较慢，首次渲染时才导入
+            import markdown
+            self._markdown = markdown.Markdown(extensions=EXTENSIONS)
+        return self._markdown
+
+    def _convert(self, text: str) -> str:
+        return self._converter().reset().convert(text)
+
+    def _convert_blocks(self, keys: list) -> list:
+        """批量转换多个块组：用分隔标记连接后只转换一次，再按标记拆分结果"""
+        if len(keys) == 1:
+            self.converted += 1
+            return [self._convert(keys[0])]
+        parts = self._convert(f'\n\n{BLOCK_MARKER}\n\n'.join(keys)).split(BLOCK_MARKER)
+        if len(parts) == len(keys):
+            self.converted += len(keys)
+            return [part.strip() for part in parts]
+        # 标记被某个块吞掉（如未闭合的 HTML）时二分后分别转换
+        middle = len(keys) // 2
+        return self._convert_blocks(keys[:middle]) + self._convert_blocks(keys[middle:])
+
+    @perf.timed('markdown.render', 'render')
+    def render(self, text: str, is_cancelled=None) -> str:
+        """返回正文 HTML，被取消时返回 None"""
+        # 引用式链接的定义作用于整个文档，块中用到的定义附加到该块末尾
+        references = {}
+        for match in _REFERENCE.finditer(text):
+            references.setdefault(match.group(1).lower(), match.group(0))
+        blocks = []
+        for block in split_blocks(text):
+            if references and '[' in block:
+                used = [references[label] for label in
+                        dict.fromkeys(label.lower() for label in _BRACKETS.findall(block))
+                        if label in references]
+                if used:
+                    block = block + '\n\n' + '\n'.join(used)
+            blocks.append(block)
+        keys = group_blocks(blocks)
+        if is_cancelled is not None and is_cancelled():
+            return None
+
+        self.converted = 0
+        missing = list(dict.fromkeys(key for key in keys if key not in self._cache))
+        converted = dict(zip(missing, self._convert_blocks(missing))) if missing else {}
+        perf.count('markdown.groups_converted', self.converted)
+        perf.count('markdown.groups_cached', len(keys) - len(missing))
+        if is_cancelled is not None and is_cancelled():
+            return None
+        # 只保留本次用到的块，缓存大小与文档大小相当
+        cache = {key: self._cache[key] if key in self._cache else converted[key] for key in keys}
+        self._cache = cache
+        return '\n'.join(cache[key] for key in keys)
@@ -0,0 +1,114 @@
+import mmap
+import os
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, wait
+from .search_engine import DEFAULT_CHUNK_SIZE
+from .patterns import LiteralPattern
+
+# 每段最小长度，避免小文件被切得过碎
+MIN_SEGMENT_SIZE = 16 * 1024 * 1024
+# 等待子进程结果时检查取消的间隔（秒）
+POLL_INTERVAL = 0.05
+
+# 子进程中由 _init_worker 设置的取消事件
+_cancel_event = None
+
+
+class MmapReader:
+    """基于只读文件映射的范围读取接口"""
+
+    def __init__(self, mapped):
+        self.mapped = mapped
+
+    def get_size(self):
+        return len(self.mapped)
+
+    def read(self, offset: int, length: int) -> bytes:
+        return self.mapped[offset:offset + length]
+
+
+def default_workers() -> int:
+    """默认进程数：CPU 核心数"""
+    return os.cpu_count() or 1
+
+
+def split_segments(size: int, workers: int, min_segment: int = MIN_SEGMENT_SIZE) -> list:
+    """将 [0, size) 切分为若干段，段数为进程数的 4 倍以均衡负载"""
+    count = max(1, min(workers * 4, -(-size // min_segment)))
+    step = -(-size // count)
+    return [(start, min(start + step, size)) for start in range(0, size, step)]
+
+
+def _init_worker(event):
+    global _cancel_event
+    _cancel_event = event
+
+
+def _cancelled() -> bool:
+    return _cancel_event is not None and _cancel_event.is_set()
+
+
+def _scan_segment(file_path: str, pattern, start: int, end: int, chunk_size: int) -> list:
+    """在子进程中自行映射文件并查找一段，只返回 (偏移, 长度, 名称) 列表
+
+    每处理 chunk_size 字节检查一次取消事件，取消后返回已找到的部分。
+    """
+    with open(file_path, 'rb') as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            if not (isinstance(pattern, LiteralPattern) and pattern.case_sensitive):
+                reader = MmapReader(mapped)
+                return list(pattern.iter_matches(reader, start, end, chunk_size,
+                                                 is_cancelled=_cancelled))
+            # 区分大小写的字面查找直接在映射上进行，不复制数据
+            data = pattern.data
+            length = len(data)
+            results = []
+            while start < end and not _cancelled():
+                window_end = min(start + chunk_size, end)
+                # 只找起点落在窗口内的匹配，下一个窗口从 window_end 开始，不会重复
+                limit = min(window_end + length - 1, len(mapped))
+                i = mapped.find(data, start, limit)
+                while i != -1:
+                    results.append((i, length, None))
+                    i = mapped.find(data, i + 1, limit)
+                start = window_end
+            return results
+
+
+def iter_matches_parallel(file_path: str, pattern, workers: int = None,
+                          chunk_size: int = DEFAULT_CHUNK_SIZE, progress=None, is_cancelled=None):
+    """多进程分段查找磁盘上的文件，按偏移顺序返回 (偏移, 长度, 名称)
+
+    pattern 为 tools.patterns 中的模式对象。每段只负责起始位置落在段内的匹配，
+    读取时越过段尾 max_length - 1 字节，因此跨段匹配不会遗漏也不会重复。
+    子进程各自映射文件，只传递模式和段范围，不传递文件数据。
+    只适用于与磁盘内容一致（未修改）的文档。取消或提前结束时通过共享的取消事件
+    通知正在运行的子进程，它们在处理完当前数据块后退出，不会继续占用 CPU。
+    """
+    size = os.path.getsize(file_path)
+    if size == 0:
+        return
+    workers = workers or default_workers()
+    segments = split_segments(size, workers)
+    # 界面进程中已有多个线程，使用 spawn 避免 fork 带来的问题
+    context = multiprocessing.get_context('spawn')
+    cancel_event = context.Event()
+    executor = ProcessPoolExecutor(max_workers=min(workers, len(segments)), mp_context=context,
+                                   initializer=_init_worker, initargs=(cancel_event,))
+    try:
+        futures = [executor.submit(_scan_segment, file_path, pattern, start, end, chunk_size)
+                   for start, end in segments]
+        # 按段顺序合并结果，保证偏移有序
+        for (start, end), future in zip(segments, futures):
+            while not wait([future], timeout=POLL_INTERVAL).done:
+                if is_cancelled is not None and is_cancelled():
+                    return
+            if is_cancelled is not None and is_cancelled():
+                return
+            yield from future.result()
+            if progress is not None:
+                progress(end, size)
+    finally:
+        # 正在运行的子进程处理完当前数据块即退出，等待它们结束后才释放取消事件
+        cancel_event.set()
+        executor.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,210 @@
+import re
+from .search_engine import iter_matches, DEFAULT_CHUNK_SIZE
+
+try:
+    from re import _parser as sre_parse
+except ImportError:  # Python < 3.11
+    import sre_parse
+
+# 长度不受限的正则（如 .*）在块边界处最多能识别的匹配长度
+DEFAULT_MAX_MATCH = 64 * 1024
+
+
+class PatternError(ValueError):
+    """模式格式错误"""
+    pass
+
+
+class LiteralPattern:
+    """字面字节序列"""
+
+    def __init__(self, data: bytes, case_sensitive: bool = True):
+        if not data:
+            raise PatternError("查找内容为空")
+        self.data = data
+        self.case_sensitive = case_sensitive
+        self.max_length = len(data)
+
+    def iter_matches(self, reader, start: int = 0, end: int = None,
+                     chunk_size: int = DEFAULT_CHUNK_SIZE, progress=None, is_cancelled=None):
+        """返回 (偏移, 长度, 名称)"""
+        length = len(self.data)
+        for offset in iter_matches(reader, self.data, self.case_sensitive, start, end,
+                                   chunk_size, progress, is_cancelled):
+            yield offset, length, None
+
+
+class RegexPattern:
+    """字节正则表达式，掩码十六进制特征也编译为此类"""
+
+    def __init__(self, regex, max_length: int = None, name: str = None):
+        self.regex = regex
+        self.name = name
+        if max_length is None:
+            max_length = regex_max_width(regex)
+        self.max_length = max_length
+
+    def iter_matches(self, reader, start: int = 0, end: int = None,
+                     chunk_size: int = DEFAULT_CHUNK_SIZE, progress=None, is_cancelled=None):
+        """分块流式匹配，返回 (偏移, 长度, 名称)
+
+        相邻块重叠 max_length - 1 字节；只报告起始位置在本块非重叠部分的匹配，
+        并从上一个匹配的结尾继续，结果与对整个文件调用 finditer 一致
+        （空匹配会被忽略）。
+        """
+        search = self.regex.search
+        resume = start
+        for window_start, step, chunk in _windows(reader, self.max_length, start, end,
+                                                  chunk_size, progress, is_cancelled):
+            i = max(resume - window_start, 0)
+            while True:
+                m = search(chunk, i)
+                if m is None or m.start() >= step:
+                    break
+                if m.end() > m.start():
+                    yield window_start + m.start(), m.end() - m.start(), self.name
+                    i = m.end()
+                    resume = window_start + i
+                else:
+                    i = m.start() + 1
+
+
+class SignatureSet:
+    """特征集：一次扫描同时查找多个（可带通配符的）特征
+
+    先用所有特征组成的分支正则定位候选位置（正则引擎会利用各分支首字节跳过
+    不可能的位置），再在候选位置逐个验证特征，同一位置命中多个特征时全部报告。
+    """
+
+    def __init__(self, signatures):
+        # signatures: [(名称, RegexPattern 或 LiteralPattern), ...]
+        if not signatures:
+            raise PatternError("特征集为空")
+        self.signatures = []
+        branches = []
+        for name, pattern in signatures:
+            if isinstance(pattern, LiteralPattern):
+                flags = re.DOTALL if pattern.case_sensitive else re.DOTALL | re.IGNORECASE
+                pattern = RegexPattern(re.compile(re.escape(pattern.data), flags), len(pattern.data))
+            self.signatures.append((name, pattern.regex))
+            inline = b'(?i:' if pattern.regex.flags & re.IGNORECASE else b'(?:'
+            branches.append(inline + pattern.regex.pattern + b')')
+        self.max_length = max(regex_max_width(regex) for _, regex in self.signatures)
+        self.prefilter = re.compile(b'|'.join(branches), re.DOTALL)
+
+    def __len__(self):
+        return len(self.signatures)
+
+    def iter_matches(self, reader, start: int = 0, end: int = None,
+                     chunk_size: int = DEFAULT_CHUNK_SIZE, progress=None, is_cancelled=None):
+        """返回 (偏移, 长度, 特征名称)，同一偏移可能出现多次"""
+        search = self.prefilter.search
+        for window_start, step, chunk in _windows(reader, self.max_length, start, end,
+                                                  chunk_size, progress, is_cancelled):
+            i = 0
+            while True:
+                m = search(chunk, i)
+                if m is None or m.start() >= step:
+                    break
+                pos = m.start()
+                for name, regex in self.signatures:
+                    hit = regex.match(chunk, pos)
+                    if hit is not None and hit.end() > pos:
+                        yield window_start + pos, hit.end() - pos, name
+                i = pos + 1
+
+
+def _windows(reader, max_length: int, start: int, end, chunk_size: int, progress, is_cancelled):
+    """按块生成 (窗口起点, 非重叠长度, 窗口数据)，窗口比非重叠部分多读 max_length - 1 字节"""
+    size = reader.get_size()
+    end = size if end is None else min(end, size)
+    overlap = max(max_length - 1, 0)
+    total = max(0, end - start)
+    pos = start
+    while pos < end:
+        if is_cancelled is not None and is_cancelled():
+            return
+        step = min(chunk_size, end - pos)
+        yield pos, step, reader.read(pos, step + overlap)
+        pos += step
+        if progress is not None:
+            progress(pos - start, total)
+
+
+def regex_max_width(regex) -> int:
+    """正则能匹配的最大长度，不受限时返回 DEFAULT_MAX_MATCH"""
+    try:
+        _, high = sre_parse.parse(regex.pattern, regex.flags).getwidth()
+    except Exception:
+        return DEFAULT_MAX_MATCH
+    return max(1, min(high, DEFAULT_MAX_MATCH))
+
+
+def _hex_token_regex(token: str) -> bytes:
+    """将一个十六进制字节记号（如 4D、??、4?、?D）转换为正则片段"""
+    if token == '??':
+        return b'.'
+    high, low = token
+    if high == '?':
+        values = [(h << 4) | int(low, 16) for h in range(16)]
+        return b'[' + b''.join(re.escape(bytes((v,))) for v in values) + b']'
+    if low == '?':
+        base = int(high, 16) << 4
+        return b'[' + re.escape(bytes((base,))) + b'-' + re.escape(bytes((base | 0x0F,))) + b']'
+    return re.escape(bytes((int(token, 16),)))
+
+
+def parse_hex_tokens(text: str) -> list:
+    """拆分十六进制模式，支持空格分隔或连续书写（如 4D5A????5045）"""
+    tokens = []
+    for part in text.split():
+        if len(part) % 2:
+            raise PatternError(f"无效的十六进制记号: {part}")
+        tokens.extend(part[i:i + 2] for i in range(0, len(part), 2))
+    for token in tokens:
+        if any(c not in '0123456789abcdefABCDEF?' for c in token):
+            raise PatternError(f"无效的十六进制记号: {token}")
+    if not tokens:
+        raise PatternError("查找内容为空")
+    return tokens
+
+
+def compile_hex_pattern(text: str):
+    """编译十六进制模式，含通配符时返回 RegexPattern，否则返回 LiteralPattern"""
+    tokens = parse_hex_tokens(text)
+    if not any('?' in token for token in tokens):
+        return LiteralPattern(bytes(int(token, 16) for token in tokens))
+    regex = re.compile(b''.join(_hex_token_regex(token) for token in tokens), re.DOTALL)
+    return RegexPattern(regex, len(tokens))
+
+
+def compile_regex(text: str, case_sensitive: bool = True) -> RegexPattern:
+    """编译字节正则表达式（文本按 UTF-8 编码，可使用 \\xNN 转义）"""
+    flags = re.DOTALL if case_sensitive else re.DOTALL | re.IGNORECASE
+    try:
+        regex = re.compile(text.encode('utf-8'), flags)
+    except re.error as e:
+        raise PatternError(f"无效的正则表达式: {str(e)}") from e
+    return RegexPattern(regex)
+
+
+def parse_signature_file(file_path: str) -> SignatureSet:
+    """读取特征集文件
+
+    每行一个特征，格式为 “名称 = 十六进制模式”，如 “PE = 4D 5A ?? ?? 50 45”；
+    空行和以 # 开头的行会被忽略。
+    """
+    signatures = []
+    with open(file_path, 'r', encoding='utf-8') as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            name, sep, pattern = line.partition('=')
+            if not sep:
+                raise PatternError(f"第 {line_no} 行缺少 '='")
+            try:
+                signatures.append((name.strip(), compile_hex_pattern(pattern)))
+            except PatternError as e:
+                raise PatternError(f"第 {line_no} 行: {str(e)}") from e
+    return SignatureSet(signatures)
@@ -0,0 +1,153 @@
+import functools
+import os
+import threading
+import time
+from collections import deque
+
+# 设置环境变量 LOVELYHEX_PERF=1 或在性能统计面板中启用；未启用时计时区间和计数器几乎没有开销
+enabled = bool(os.environ.get('LOVELYHEX_PERF'))
+# 最多保留的区间事件数，超出时丢弃最早的事件（汇总统计不受影响）
+MAX_EVENTS = 100000
+
+_start = time.perf_counter()
+_lock = threading.Lock()
+_events = deque(maxlen=MAX_EVENTS)  # (名称, 分类, 开始 s, 耗时 s, 线程 id, 参数)
+_stats = {}  # 名称 -> [次数, 总耗时 s, 最长耗时 s]
+_counters = {}  # 名称 -> 累计值
+
+
+def enable():
+    global enabled
+    enabled = True
+
+
+def disable():
+    global enabled
+    enabled = False
+
+
+def reset():
+    """清空已记录的区间和计数器"""
+    with _lock:
+        _events.clear()
+        _stats.clear()
+        _counters.clear()
+
+
+def _record(name: str, category: str, start: float, duration: float, args):
+    with _lock:
+        _events.append((name, category, start, duration, threading.get_ident(), args))
+        stat = _stats.get(name)
+        if stat is None:
+            _stats[name] = [1, duration, duration]
+        else:
+            stat[0] += 1
+            stat[1] += duration
+            if duration > stat[2]:
+                stat[2] = duration
+
+
+class _Span:
+    __slots__ = ('name', 'category', 'args', 'start')
+
+    def __init__(self, name: str, category: str, args):
+        self.name = name
+        self.category = category
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        _record(self.name, self.category, self.start, time.perf_counter() - self.start, self.args)
+        return False
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def span(name: str, category: str = 'app', **args):
+    """计时区间：with perf.span('hex.load', path=...): ...
+
+    未启用时返回共享的空对象，不记录任何内容。
+    """
+    if not enabled:
+        return _NULL_SPAN
+    return _Span(name, category, args or None)
+
+
+def timed(name: str, category: str = 'app'):
+    """把整个函数作为一个计时区间的装饰器"""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not enabled:
+                return fn(*args, **kwargs)
+            with _Span(name, category, None):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def count(name: str, value: int = 1):
+    """累加计数器，未启用时不做任何事"""
+    if enabled:
+        with _lock:
+            _counters[name] = _counters.get(name, 0) + value
+
+
+def stats() -> list:
+    """按总耗时从高到低返回各区间的汇总 [(名称, 次数, 总耗时 ms, 平均 ms, 最长 ms)]"""
+    with _lock:
+        items = [(name, n, total * 1000, total * 1000 / n, longest * 1000)
+                 for name, (n, total, longest) in _stats.items()]
+    items.sort(key=lambda item: item[2], reverse=True)
+    return items
+
+
+def counters() -> dict:
+    with _lock:
+        return dict(_counters)
+
+
+def export_chrome_trace(file_path: str):
+    """导出 Chrome Trace 格式（chrome://tracing 或 Perfetto 可打开）的 JSON
+
+    每个区间为一个完整事件 (ph='X')，汇总统计和计数器放在 otherData 中。
+    """
+    # json 只在导出时使用，不拖慢启动
+    import json
+    with _lock:
+        events = list(_events)
+    pid = os.getpid()
+    trace = []
+    for name, category, start, duration, tid, args in events:
+        event = {'name': name, 'cat': category, 'ph': 'X', 'pid': pid, 'tid': tid,
+                 'ts': (start - _start) * 1e6, 'dur': duration * 1e6}
+        if args:
+            event['args'] = {key: str(value) for key, value in args.items()}
+        trace.append(event)
+    now = (time.perf_counter() - _start) * 1e6
+    for name, value in counters().items():
+        trace.append({'name': name, 'ph': 'C', 'pid': pid, 'tid': 0, 'ts': now, 'args': {name: value}})
+    data = {
+        'traceEvents': trace,
+        'displayTimeUnit': 'ms',
+        'otherData': {
+            'stats': [dict(zip(('name', 'count', 'total_ms', 'mean_ms', 'max_ms'), item)) for item in stats()],
+            'counters': counters(),
+        },
+    }
+    with open(file_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
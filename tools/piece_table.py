@@ -0,0 +1,386 @@
+import codecs
+import random
+from bisect import bisect_right
+from itertools import islice
+
+# 缓冲区编号：原始数据只读，新增数据只追加
+ORIGINAL = 0
+ADD = 1
+
+
+class _Node:
+    """片段树节点，每个节点对应一个片段 (buf, start, length)"""
+    __slots__ = ('buf', 'start', 'length', 'prio', 'left', 'right', 'size', 'count', 'add', 'other')
+
+    def __init__(self, buf, start, length, prio, left=None, right=None):
+        self.buf = buf
+        self.start = start
+        self.length = length
+        self.prio = prio
+        self.left = left
+        self.right = right
+        # 子树的总字节数和片段数
+        self.size = length + (left.size if left else 0) + (right.size if right else 0)
+        self.count = 1 + (left.count if left else 0) + (right.count if right else 0)
+        # 子树引用的新增缓冲区字节数和其他只读缓冲区（如溢出文件）字节数
+        self.add = (length if buf == ADD else 0) + (left.add if left else 0) + (right.add if right else 0)
+        self.other = (length if buf > ADD else 0) + (left.other if left else 0) + (right.other if right else 0)
+
+
+def _leaf(buf, start, length):
+    return _Node(buf, start, length, random.random())
+
+
+def _with_children(node, left, right):
+    """复制节点并替换子节点（节点不可变，便于共享）"""
+    return _Node(node.buf, node.start, node.length, node.prio, left, right)
+
+
+def _merge(a, b):
+    """合并两棵树，a 中的所有片段位于 b 之前"""
+    if a is None:
+        return b
+    if b is None:
+        return a
+    if a.prio > b.prio:
+        return _with_children(a, a.left, _merge(a.right, b))
+    return _with_children(b, _merge(a, b.left), b.right)
+
+
+def _split(node, pos):
+    """按字节位置拆分，返回 (前 pos 字节, 其余部分)"""
+    if node is None:
+        return None, None
+    left_size = node.left.size if node.left else 0
+    if pos <= left_size:
+        l, r = _split(node.left, pos)
+        return l, _with_children(node, r, node.right)
+    pos -= left_size
+    if pos >= node.length:
+        l, r = _split(node.right, pos - node.length)
+        return _with_children(node, node.left, l), r
+    # 拆分点落在当前片段内部
+    head = _leaf(node.buf, node.start, pos)
+    tail = _leaf(node.buf, node.start + pos, node.length - pos)
+    return _merge(node.left, head), _merge(tail, node.right)
+
+
+def join_pieces(a, b):
+    """连接两棵片段子树（a 在前），用于合并撤销记录"""
+    return _merge(a, b)
+
+
+def replace_in(node, offset: int, length: int, pieces):
+    """返回把子树中 [offset, offset + length) 替换为 pieces 后的新子树（原子树不变）"""
+    left, rest = _split(node, offset)
+    _, right = _split(rest, length)
+    return _merge(_merge(left, pieces), right)
+
+
+def piece_size(node) -> int:
+    return node.size if node is not None else 0
+
+
+def piece_count(node) -> int:
+    return node.count if node is not None else 0
+
+
+def added_size(node) -> int:
+    """子树引用的新增缓冲区字节数"""
+    return node.add if node is not None else 0
+
+
+def extra_size(node) -> int:
+    """子树引用的新增缓冲区之外的只读缓冲区（如溢出文件）字节数"""
+    return node.other if node is not None else 0
+
+
+def remap_subtree(node, fn, memo: dict):
+    """返回把子树中每个片段 (buf, start, length) 替换为 fn 返回的片段列表后的新子树
+
+    片段列表的总长度必须与原片段相同。memo 记录已转换的节点，多棵子树共享的节点只转换一次，
+    转换后仍然共享。
+    """
+    if node is None:
+        return None
+    done = memo.get(id(node))
+    if done is not None:
+        return done[1]
+    left = remap_subtree(node.left, fn, memo)
+    right = remap_subtree(node.right, fn, memo)
+    pieces = fn(node.buf, node.start, node.length)
+    if len(pieces) == 1:
+        buf, start, length = pieces[0]
+        new = _Node(buf, start, length, node.prio, left, right)
+    else:
+        middle = None
+        for buf, start, length in pieces:
+            middle = _merge(middle, _leaf(buf, start, length))
+        new = _merge(_merge(left, middle), right)
+    # 同时保存原节点，避免其被回收后 id 被复用
+    memo[id(node)] = (node, new)
+    return new
+
+
+def _iter_range(node, offset, end):
+    """按顺序遍历与 [offset, end) 相交的片段，返回 (buf, start, length)"""
+    while node is not None:
+        left_size = node.left.size if node.left else 0
+        if offset < left_size:
+            yield from _iter_range(node.left, offset, min(end, left_size))
+        node_end = left_size + node.length
+        if offset < node_end and end > left_size:
+            lo = max(offset, left_size) - left_size
+            hi = min(end, node_end) - left_size
+            yield node.buf, node.start + lo, hi - lo
+        if end <= node_end:
+            return
+        # 尾递归改为循环，进入右子树
+        offset = max(offset, node_end) - node_end
+        end -= node_end
+        node = node.right
+
+
+class PieceTable:
+    """片段表缓冲区
+
+    原始数据保持只读，所有插入内容追加到新增缓冲区，文档由片段序列描述。
+    片段保存在按位置索引的不可变 treap 中，编辑开销为 O(log 片段数)，与文件大小无关。
+    """
+
+    def __init__(self, original=b''):
+        self._buffers = [original, bytearray()]
+        self._root = _leaf(ORIGINAL, 0, len(original)) if len(original) else None
+
+    def snapshot(self):
+        """返回当前内容的只读快照
+
+        片段树不可变、缓冲区只追加，快照只需共享根节点，可安全地在其他线程读取。
+        """
+        snap = PieceTable.__new__(PieceTable)
+        snap._buffers = list(self._buffers)
+        snap._root = self._root
+        return snap
+
+    @property
+    def root(self):
+        """片段树的根节点（不可变，可作为子树保存）"""
+        return self._root
+
+    def __len__(self):
+        return self._root.size if self._root else 0
+
+    def is_pristine(self) -> bool:
+        """内容是否与原始数据完全一致（未做过任何修改）"""
+        root = self._root
+        if root is None:
+            return len(self._buffers[ORIGINAL]) == 0
+        return (root.count == 1 and root.buf == ORIGINAL and root.start == 0
+                and root.length == len(self._buffers[ORIGINAL]))
+
+    def get_size(self) -> int:
+        """数据大小（与 HexEditor 的范围读取接口一致）"""
+        return len(self)
+
+    @property
+    def piece_count(self) -> int:
+        """片段数量"""
+        return self._root.count if self._root else 0
+
+    def iter_pieces(self, offset: int = 0, length: int = None):
+        """遍历指定范围内的片段 (buf, start, length)"""
+        size = len(self)
+        end = size if length is None else min(size, offset + length)
+        if offset >= end:
+            return iter(())
+        return _iter_range(self._root, offset, end)
+
+    def dirty_ranges(self):
+        """返回与原始数据不同的区间 [(偏移, 长度)]，相邻区间已合并
+
+        只有大小不变、且引用原始数据的片段都还在原来的位置时，才能只把这些区间
+        写回原文件，否则返回 None。新增缓冲区中的内容即使与原来相同也算作变化。
+        """
+        if len(self) != len(self._buffers[ORIGINAL]):
+            return None
+        ranges = []
+        offset = 0
+        for buf, start, length in self.iter_pieces():
+            if buf == ORIGINAL:
+                if start != offset:
+                    return None
+            elif ranges and ranges[-1][0] + ranges[-1][1] == offset:
+                ranges[-1] = (ranges[-1][0], ranges[-1][1] + length)
+            else:
+                ranges.append((offset, length))
+            offset += length
+        return ranges
+
+    def iter_chunks(self, offset: int = 0, length: int = None):
+        """按片段依次返回指定范围内的数据块
+
+        只读缓冲区返回 memoryview，不复制；新增缓冲区仍在追加，
+        导出 memoryview 会使其无法扩容，因此切片复制。
+        """
+        for buf, start, count in self.iter_pieces(offset, length):
+            if buf == ADD:
+                yield self._buffers[ADD][start:start + count]
+            else:
+                yield memoryview(self._buffers[buf])[start:start + count]
+
+    def read(self, offset: int, length: int) -> bytes:
+        """读取指定范围的数据"""
+        return b''.join(self.iter_chunks(offset, length))
+
+    def view(self, offset: int, length: int) -> memoryview:
+        """返回指定范围数据的 memoryview
+
+        范围位于同一个只读缓冲区的片段内时直接切片，不复制；否则拼接为新的 bytes。
+        直接切片的视图引用缓冲区，缓冲区被改写或关闭时由持有者负责先释放视图。
+        """
+        pieces = list(islice(self.iter_pieces(offset, length), 2))
+        if len(pieces) == 1 and pieces[0][0] != ADD:
+            buf, start, count = pieces[0]
+            return memoryview(self._buffers[buf])[start:start + count]
+        return memoryview(self.read(offset, length))
+
+    def byte_at(self, offset: int) -> int:
+        """读取单个字节"""
+        for buf, start, _ in self.iter_pieces(offset, 1):
+            return self._buffers[buf][start]
+        raise IndexError(offset)
+
+    def tobytes(self) -> bytes:
+        """返回完整数据"""
+        return self.read(0, len(self))
+
+    def decode(self, encoding: str, errors: str = 'strict') -> str:
+        """把全部内容解码为文本
+
+        未修改时直接从原始数据（如文件映射）解码，不生成中间的 bytes 副本；
+        否则按片段增量解码，多字节字符可以跨越片段边界。
+        """
+        if self.is_pristine():
+            return str(memoryview(self._buffers[ORIGINAL]), encoding, errors)
+        decoder = codecs.getincrementaldecoder(encoding)(errors)
+        parts = [decoder.decode(chunk) for chunk in self.iter_chunks()]
+        parts.append(decoder.decode(b'', final=True))
+        return ''.join(parts)
+
+    @property
+    def stored_size(self) -> int:
+        """新增缓冲区和其他只读缓冲区的总大小（包括已不被引用的数据）"""
+        return sum(len(buf) for buf in self._buffers[ADD:] if buf is not None)
+
+    def compact(self, roots):
+        """丢弃新增缓冲区中未被文档和 roots 中的子树引用的数据，释放未被引用的只读缓冲区
+
+        新增缓冲区只追加，被丢弃的撤销记录引用的数据在压缩前不会释放。压缩时把仍被引用的
+        区间复制到新的新增缓冲区（已有快照继续引用原来的缓冲区），并改写文档的片段。
+        返回 (remap, released)：remap(子树) 把此前的子树转换为引用压缩后缓冲区的子树，
+        released 为被释放的只读缓冲区编号，对应的缓冲区已置为 None。
+        """
+        intervals = []
+        used = {ORIGINAL, ADD}
+        seen = set()
+        stack = [self._root, *roots]
+        while stack:
+            node = stack.pop()
+            if node is None or id(node) in seen:
+                continue
+            seen.add(id(node))
+            if node.buf == ADD:
+                intervals.append((node.start, node.start + node.length))
+            else:
+                used.add(node.buf)
+            stack.append(node.left)
+            stack.append(node.right)
+        # 合并重叠和相接的区间后依次复制
+        merged = []
+        for lo, hi in sorted(intervals):
+            if merged and lo <= merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], hi)
+            else:
+                merged.append([lo, hi])
+        old_add = self._buffers[ADD]
+        new_add = bytearray()
+        starts, moved = [], []
+        for lo, hi in merged:
+            starts.append(lo)
+            moved.append(len(new_add))
+            new_add += old_add[lo:hi]
+
+        def move(buf, start, length):
+            if buf != ADD:
+                return ((buf, start, length),)
+            i = bisect_right(starts, start) - 1
+            return ((ADD, moved[i] + start - starts[i], length),)
+
+        released = []
+        for index in range(ADD + 1, len(self._buffers)):
+            if self._buffers[index] is not None and index not in used:
+                self._buffers[index] = None
+                released.append(index)
+        self._buffers[ADD] = new_add
+        memo = {}
+        self._root = remap_subtree(self._root, move, memo)
+        return (lambda node: remap_subtree(node, move, memo)), released
+
+    def rebase(self, original=None):
+        """保存后以文件的新内容作为原始数据，文档变为引用全部原始数据的一个片段
+
+        original 为 None 表示原始数据（文件映射）已被原位改写为当前内容；否则改用 original，
+        原来的原始数据登记为只读缓冲区并返回其编号，撤销记录可改为引用它。
+        新增缓冲区和其他只读缓冲区保留，撤销记录中引用它们的片段仍然有效。
+        """
+        previous = None
+        if original is not None:
+            previous = self.add_buffer(self._buffers[ORIGINAL])
+            self._buffers[ORIGINAL] = original
+        size = len(self._buffers[ORIGINAL])
+        self._root = _leaf(ORIGINAL, 0, size) if size else None
+        return previous
+
+    def add_buffer(self, data) -> int:
+        """登记一个只读缓冲区（如溢出到临时文件的大块数据的映射），返回缓冲区编号"""
+        self._buffers.append(data)
+        return len(self._buffers) - 1
+
+    def make_piece(self, data: bytes = b'', buf: int = None):
+        """为新数据创建片段（不修改文档）
+
+        默认把 data 追加到新增缓冲区；给出 buf 时引用整个已登记的只读缓冲区。
+        """
+        if buf is not None:
+            length = len(self._buffers[buf])
+            return _leaf(buf, 0, length) if length else None
+        if not data:
+            return None
+        add = self._buffers[ADD]
+        piece = _leaf(ADD, len(add), len(data))
+        add.extend(data)
+        return piece
+
+    def splice(self, offset: int, length: int, pieces):
+        """用片段子树替换指定范围，返回被替换部分的片段子树
+
+        子树不可变，被替换的部分可以原样保存用于撤销，不复制数据。
+        """
+        left, rest = _split(self._root, offset)
+        old, right = _split(rest, length)
+        self._root = _merge(_merge(left, pieces), right)
+        return old
+
+    def insert(self, offset: int, data: bytes):
+        """在指定位置插入数据"""
+        if data:
+            self.splice(offset, 0, self.make_piece(data))
+
+    def delete(self, offset: int, length: int):
+        """删除指定范围的数据"""
+        if length > 0:
+            self.splice(offset, length, None)
+
+    def replace(self, offset: int, length: int, data: bytes):
+        """用新数据替换指定范围"""
+        self.splice(offset, length, self.make_piece(data))
@@ -0,0 +1,147 @@
+import os
+import struct
+import zlib
+from .file_manager import FileManager
+
+# 原位保存前记录被覆盖区间原内容的日志文件；保存中断时下次加载据此回滚
+JOURNAL_SUFFIX = '.lhjournal'
+JOURNAL_MAGIC = b'LHJRNL\x00\x01'
+JOURNAL_END = b'LHJEND\x00\x01'
+_HEADER = struct.Struct('<8sQ')  # 魔数, 文件大小
+_ENTRY = struct.Struct('<QQ')  # 偏移, 长度
+_TRAILER = struct.Struct('<8sQI')  # 结束标记, 区间数, 区间内容的 CRC32
+
+JOURNAL_CHUNK_SIZE = 4 * 1024 * 1024
+
+
+def journal_path(file_path: str) -> str:
+    return file_path + JOURNAL_SUFFIX
+
+
+def fsync_dir(file_path: str):
+    """同步文件所在目录，使新建、重命名和删除持久化（不支持时忽略）"""
+    try:
+        fd = os.open(os.path.dirname(os.path.abspath(file_path)), os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def write_journal(file_path: str, ranges: list):
+    """把文件中 ranges [(偏移, 长度)] 的当前内容写入日志并同步到磁盘
+
+    日志以带区间数和 CRC32 的结束记录收尾，写入不完整的日志在恢复时被忽略。
+    """
+    path = journal_path(file_path)
+    crc = 0
+    with open(path, 'wb') as journal, open(file_path, 'rb') as f:
+        journal.write(_HEADER.pack(JOURNAL_MAGIC, os.fstat(f.fileno()).st_size))
+        for offset, length in ranges:
+            entry = _ENTRY.pack(offset, length)
+            journal.write(entry)
+            crc = zlib.crc32(entry, crc)
+            f.seek(offset)
+            remaining = length
+            while remaining:
+                data = f.read(min(remaining, JOURNAL_CHUNK_SIZE))
+                if not data:
+                    raise OSError(f"读取 {file_path} 失败: 文件被截断")
+                journal.write(data)
+                crc = zlib.crc32(data, crc)
+                remaining -= len(data)
+        journal.write(_TRAILER.pack(JOURNAL_END, len(ranges), crc))
+        journal.flush()
+        os.fsync(journal.fileno())
+    fsync_dir(path)
+
+
+def remove_journal(file_path: str):
+    """保存完成后删除日志"""
+    path = journal_path(file_path)
+    if os.path.exists(path):
+        os.remove(path)
+        fsync_dir(path)
+
+
+def _iter_entries(journal, end: int):
+    """依次返回 (偏移, 长度, 内容在日志中的位置)，end 为结束记录的位置"""
+    position = _HEADER.size
+    while position < end:
+        journal.seek(position)
+        offset, length = _ENTRY.unpack(journal.read(_ENTRY.size))
+        position += _ENTRY.size
+        yield offset, length, position
+        position += length
+
+
+def journal_entries(journal) -> list:
+    """返回完整日志中的各区间 [(偏移, 长度, 原内容在日志中的位置)]"""
+    end = journal.seek(0, 2) - _TRAILER.size
+    return list(_iter_entries(journal, end))
+
+
+def _is_complete(journal) -> bool:
+    """校验结束记录和 CRC32，保存时日志尚未写完则返回 False"""
+    journal.seek(0, 2)
+    size = journal.tell()
+    if size < _HEADER.size + _TRAILER.size:
+        return False
+    journal.seek(size - _TRAILER.size)
+    end, count, expected = _TRAILER.unpack(journal.read(_TRAILER.size))
+    if end != JOURNAL_END:
+        return False
+    journal.seek(_HEADER.size)
+    crc = 0
+    entries = 0
+    while journal.tell() < size - _TRAILER.size:
+        entry = journal.read(_ENTRY.size)
+        if len(entry) < _ENTRY.size:
+            return False
+        offset, length = _ENTRY.unpack(entry)
+        crc = zlib.crc32(entry, crc)
+        remaining = length
+        while remaining:
+            data = journal.read(min(remaining, JOURNAL_CHUNK_SIZE))
+            if not data:
+                return False
+            crc = zlib.crc32(data, crc)
+            remaining -= len(data)
+        entries += 1
+    return entries == count and crc == expected
+
+
+def recover_journal(file_path: str) -> bool:
+    """文件有残留的保存日志时回滚到保存前的内容，返回是否执行了回滚
+
+    日志不完整说明保存尚未开始写入文件，直接删除即可。
+    """
+    path = journal_path(file_path)
+    if not os.path.exists(path):
+        return False
+    try:
+        with open(path, 'rb') as journal:
+            header = journal.read(_HEADER.size)
+            if len(header) < _HEADER.size or _HEADER.unpack(header)[0] != JOURNAL_MAGIC or \
+                    not _is_complete(journal):
+                remove_journal(file_path)
+                return False
+            end = journal.seek(0, 2) - _TRAILER.size
+            for offset, length, position in _iter_entries(journal, end):
+                done = 0
+                while done < length:
+                    journal.seek(position + done)
+                    data = journal.read(min(length - done, JOURNAL_CHUNK_SIZE))
+                    if not FileManager.write_file_chunk(file_path, offset + done, data,
+                                                        sync=done + len(data) == length):
+                        return False
+                    done += len(data)
+        remove_journal(file_path)
+        return True
+    except (OSError, struct.error) as e:
+        print(f"恢复保存日志失败: {str(e)}")
+        return False
@@ -0,0 +1,66 @@
+DEFAULT_CHUNK_SIZE = 4 * 1024 * 1024
+
+
+def find_all(data, pattern: bytes, base: int = 0, limit: int = None):
+    """在一块数据中查找所有匹配（允许重叠），返回绝对偏移
+
+    limit 限制匹配的起始位置必须小于该值（相对 data），用于跳过重叠区。
+    """
+    if limit is None:
+        limit = len(data)
+    find = data.find
+    i = find(pattern, 0)
+    while i != -1 and i < limit:
+        yield base + i
+        i = find(pattern, i + 1)
+
+
+def iter_matches(reader, pattern: bytes, case_sensitive: bool = True,
+                 start: int = 0, end: int = None, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                 progress=None, is_cancelled=None):
+    """分块流式查找，按偏移顺序返回所有匹配位置
+
+    reader 需提供 get_size() 和 read(offset, length)。相邻块之间重叠
+    len(pattern) - 1 字节，跨越块边界的匹配也能找到且不会重复。
+    end 限制的是匹配的起始位置，匹配本身可以延伸到 end 之后，
+    因此把文件切分成多段分别查找时结果与整体查找一致。
+    不区分大小写时对每块调用 bytes.lower()（仅折叠 ASCII 字母）。
+    progress(已处理字节数, 总字节数) 每处理完一块调用一次；
+    is_cancelled() 返回 True 时停止查找。
+    """
+    if not pattern:
+        return
+    size = reader.get_size()
+    end = size if end is None else min(end, size)
+    if not case_sensitive:
+        pattern = pattern.lower()
+    overlap = len(pattern) - 1
+    total = max(0, end - start)
+    pos = start
+    while pos < end:
+        if is_cancelled is not None and is_cancelled():
+            return
+        step = min(chunk_size, end - pos)
+        chunk = reader.read(pos, step + overlap)
+        if not case_sensitive:
+            chunk = chunk.lower()
+        # 只报告起始位置位于本块非重叠部分的匹配
+        yield from find_all(chunk, pattern, pos, step)
+        pos += step
+        if progress is not None:
+            progress(pos - start, total)
+
+
+def search(reader, pattern: bytes, case_sensitive: bool = True, max_results: int = None, **kwargs) -> list:
+    """同步查找，返回匹配偏移列表"""
+    results = []
+    for offset in iter_matches(reader, pattern, case_sensitive, **kwargs):
+        results.append(offset)
+        if max_results is not None and len(results) >= max_results:
+            break
+    return results
+
+
+def get_preview(reader, offset: int, length: int = 16) -> str:
+    """返回指定偏移处数据的十六进制预览"""
+    return reader.read(offset, length).hex(' ').upper()
@@ -0,0 +1,320 @@
+import hashlib
+import os
+import struct
+import sys
+import zlib
+from array import array
+from .patterns import LiteralPattern
+from .search_engine import DEFAULT_CHUNK_SIZE
+
+INDEX_SUFFIX = '.lhidx'
+INDEX_MAGIC = b'LHIDX\x00\x00\x01'
+# 魔数, 文件大小, 修改时间(ns), 块大小, 块数, 跳过块数, 高频三元组数, 倒排表数
+_HEADER = struct.Struct('<8sQQIIIII')
+
+DEFAULT_BLOCK_SIZE = 64 * 1024
+# 出现在超过该比例块中的三元组过滤效果差，不保存倒排表
+DENSE_RATIO = 0.5
+# 采样压缩率高于该值的块视为高熵数据（压缩/加密内容），不建立索引
+HIGH_ENTROPY_RATIO = 0.9
+ENTROPY_SAMPLE = 8 * 1024
+# 单块不同三元组数量上限，超过时同样跳过，避免索引膨胀
+MAX_BLOCK_GRAMS = 16384
+
+
+def block_trigrams(data: bytes):
+    """返回一块数据（已转小写）中的三元组集合，高熵块返回 None"""
+    middle = max(0, len(data) // 2 - ENTROPY_SAMPLE // 2)
+    sample = data[middle:middle + ENTROPY_SAMPLE]
+    if len(sample) >= 1024 and len(zlib.compress(sample, 1)) > len(sample) * HIGH_ENTROPY_RATIO:
+        return None
+    grams = {(a << 16) | (b << 8) | c for a, b, c in zip(data, data[1:], data[2:])}
+    if len(grams) > MAX_BLOCK_GRAMS:
+        return None
+    return grams
+
+
+def index_blocks(reader, blocks, block_size: int, is_cancelled=None, progress=None):
+    """计算指定块的三元组，返回 {块号: 三元组集合或 None}（可在后台线程调用）
+
+    每块包含起始于该块内的所有三元组，因此会多读 2 个字节。
+    """
+    results = {}
+    total = len(blocks)
+    for i, block in enumerate(blocks):
+        if is_cancelled is not None and is_cancelled():
+            return None
+        data = reader.read(block * block_size, block_size + 2).lower()
+        results[block] = block_trigrams(data)
+        if progress is not None:
+            progress(i + 1, total)
+    return results
+
+
+def iter_ranges(reader, pattern, ranges, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                progress=None, is_cancelled=None):
+    """依次在多个区间内查找，返回 (偏移, 长度, 名称)；区间限制的是匹配起点"""
+    total = sum(end - start for start, end in ranges)
+    done = 0
+    for start, end in ranges:
+        yield from pattern.iter_matches(reader, start, end, chunk_size, is_cancelled=is_cancelled)
+        if is_cancelled is not None and is_cancelled():
+            return
+        done += end - start
+        if progress is not None:
+            progress(done, total)
+
+
+class SearchIndex:
+    """文件的三元组块级倒排索引
+
+    文件被划分为固定大小的块，索引记录每个三元组出现在哪些块中（按小写数据建立，
+    区分与不区分大小写的查找都可使用）。查找字面内容时只扫描包含模式所有三元组的候选块，
+    最后仍会逐字节验证，因此索引过期或存在多余条目只会增加候选块，不会漏掉匹配。
+
+    编辑后受影响的块记为脏块，长度变化之后的部分记为未索引，它们在查找时总是会被扫描，
+    后台更新完成后恢复为可用。
+    """
+
+    def __init__(self, block_size: int = DEFAULT_BLOCK_SIZE):
+        self.block_size = block_size
+        self.postings = {}
+        self.dense = set()
+        self.skipped = set()
+        self.dirty = {}
+        self.valid_blocks = 0
+        self.generation = 0
+        self.layout_generation = 0
+        self.key = None
+
+    # ---- 建立与更新 ----
+
+    def block_count_for(self, size: int) -> int:
+        return -(-size // self.block_size)
+
+    def add_blocks(self, results: dict):
+        """把 index_blocks 的结果合并进倒排表"""
+        for block, grams in results.items():
+            if grams is None:
+                self.skipped.add(block)
+                continue
+            self.skipped.discard(block)
+            for gram in grams:
+                if gram in self.dense:
+                    continue
+                posting = self.postings.get(gram)
+                if posting is None:
+                    posting = self.postings[gram] = array('I')
+                posting.append(block)
+
+    def build(self, reader, progress=None, is_cancelled=None) -> bool:
+        """为 reader 的全部内容建立索引，被取消时返回 False"""
+        count = self.block_count_for(reader.get_size())
+        results = index_blocks(reader, range(count), self.block_size, is_cancelled, progress)
+        if results is None:
+            return False
+        self.postings = {}
+        self.dense = set()
+        self.skipped = set()
+        self.dirty = {}
+        self.add_blocks(results)
+        if count >= 8:
+            limit = count * DENSE_RATIO
+            for gram in [g for g, posting in self.postings.items() if len(posting) > limit]:
+                self.dense.add(gram)
+                del self.postings[gram]
+        self.valid_blocks = count
+        return True
+
+    def mark_changed(self, offset: int, old_length: int, new_length: int):
+        """记录文档编辑：offset 处 old_length 字节被替换为 new_length 字节
+
+        起始于编辑位置之前 2 个字节的三元组也会读到被修改的内容，它们可能属于前一块。
+        """
+        self.generation += 1
+        first = max(offset - 2, 0) // self.block_size
+        if old_length != new_length:
+            # 之后的内容整体移动，从该块开始全部视为未索引
+            self.layout_generation += 1
+            self.valid_blocks = min(self.valid_blocks, first)
+            self.dirty = {b: g for b, g in self.dirty.items() if b < first}
+            return
+        # 未索引的块也要记录，使编辑前已开始的后台更新的结果不会被合并
+        last = (offset + max(new_length, 1) - 1) // self.block_size
+        for block in range(first, last + 1):
+            self.dirty[block] = self.generation
+
+    def needs_update(self, size: int) -> bool:
+        return bool(self.dirty) or self.valid_blocks < self.block_count_for(size)
+
+    def pending_blocks(self, size: int) -> list:
+        """需要重新建立索引的块（脏块和未索引的尾部）"""
+        count = self.block_count_for(size)
+        return sorted(set(self.dirty) | set(range(self.valid_blocks, count)))
+
+    def apply_update(self, results: dict, generation: int, layout_generation: int, size: int):
+        """合并后台更新的结果；期间又被编辑的块保持脏状态"""
+        if layout_generation != self.layout_generation:
+            # 更新期间长度发生了变化，尾部结果已失效，只保留仍有效的脏块结果
+            results = {b: g for b, g in results.items() if b < self.valid_blocks}
+        for block in list(results):
+            if self.dirty.get(block, 0) > generation:
+                del results[block]
+        self.add_blocks(results)
+        for block in results:
+            self.dirty.pop(block, None)
+        if layout_generation == self.layout_generation:
+            self.valid_blocks = self.block_count_for(size)
+
+    # ---- 查找 ----
+
+    def candidate_ranges(self, pattern: bytes, size: int):
+        """返回可能包含匹配起点的偏移区间列表，索引无法过滤时返回 None"""
+        if len(pattern) < 3:
+            return None
+        probe = pattern[:self.block_size].lower()
+        grams = {(a << 16) | (b << 8) | c for a, b, c in zip(probe, probe[1:], probe[2:])}
+        grams -= self.dense
+        if not grams:
+            return None
+
+        # 起点位于块 b 的匹配（长度不超过块大小）其三元组只会出现在块 b 或 b+1
+        candidates = None
+        for gram in sorted(grams, key=lambda g: len(self.postings.get(g, ()))):
+            posting = self.postings.get(gram, ())
+            blocks = set(posting)
+            blocks.update(b - 1 for b in posting)
+            candidates = blocks if candidates is None else candidates & blocks
+            if not candidates:
+                break
+
+        count = self.block_count_for(size)
+        always = set(self.skipped) | set(self.dirty)
+        blocks = {b for b in candidates if b < self.valid_blocks}
+        blocks.update(always)
+        blocks.update(b - 1 for b in always)
+        if self.valid_blocks < count:
+            blocks.update(range(max(self.valid_blocks - 1, 0), count))
+
+        ranges = []
+        for block in sorted(b for b in blocks if 0 <= b < count):
+            start = block * self.block_size
+            end = min(start + self.block_size, size)
+            if ranges and ranges[-1][1] == start:
+                ranges[-1][1] = end
+            else:
+                ranges.append([start, end])
+        return ranges
+
+    def iter_matches(self, reader, pattern: LiteralPattern, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                     progress=None, is_cancelled=None):
+        """只在候选区间内查找字面模式，返回 (偏移, 长度, 名称)"""
+        ranges = self.candidate_ranges(pattern.data, reader.get_size())
+        if ranges is None:
+            return pattern.iter_matches(reader, chunk_size=chunk_size,
+                                        progress=progress, is_cancelled=is_cancelled)
+        return iter_ranges(reader, pattern, ranges, chunk_size, progress, is_cancelled)
+
+    # ---- 持久化 ----
+
+    @staticmethod
+    def file_key(file_path: str):
+        """文件的标识：(大小, 修改时间)"""
+        stat = os.stat(file_path)
+        return stat.st_size, stat.st_mtime_ns
+
+    @staticmethod
+    def index_paths(file_path: str) -> list:
+        """索引文件候选位置：文件旁边，或用户缓存目录"""
+        abs_path = os.path.abspath(file_path)
+        digest = hashlib.blake2b(abs_path.encode('utf-8'), digest_size=16).hexdigest()
+        cache_dir = os.path.join(os.path.expanduser('~'), '.cache', 'lovelyhex', 'index')
+        return [abs_path + INDEX_SUFFIX, os.path.join(cache_dir, digest + INDEX_SUFFIX)]
+
+    def is_complete(self, size: int) -> bool:
+        return not self.dirty and self.valid_blocks == self.block_count_for(size)
+
+    def save(self, file_path: str) -> bool:
+        """保存索引，优先写在文件旁边，目录不可写时写入缓存目录"""
+        if self.key is None:
+            return False
+        size, mtime_ns = self.key
+        if not self.is_complete(size):
+            return False
+        parts = [b'', self._array(sorted(self.skipped)).tobytes(),
+                 self._array(sorted(self.dense)).tobytes()]
+        for gram, posting in self.postings.items():
+            parts.append(struct.pack('<II', gram, len(posting)))
+            parts.append(self._array(posting).tobytes())
+        parts[0] = _HEADER.pack(INDEX_MAGIC, size, mtime_ns, self.block_size, self.valid_blocks,
+                                len(self.skipped), len(self.dense), len(self.postings))
+        for path in self.index_paths(file_path):
+            try:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                tmp_path = path + '.tmp'
+                with open(tmp_path, 'wb') as f:
+                    for part in parts:
+                        f.write(part)
+                os.replace(tmp_path, path)
+                return True
+            except OSError:
+                continue
+        return False
+
+    @classmethod
+    def load(cls, file_path: str):
+        """加载与文件当前大小和修改时间一致的索引，不存在或已过期时返回 None"""
+        try:
+            key = cls.file_key(file_path)
+        except OSError:
+            return None
+        for path in cls.index_paths(file_path):
+            try:
+                with open(path, 'rb') as f:
+                    data = f.read()
+                index = cls._parse(data)
+            except (OSError, ValueError, struct.error):
+                continue
+            if index is not None and index.key == key:
+                return index
+        return None
+
+    @classmethod
+    def _parse(cls, data: bytes):
+        magic, size, mtime_ns, block_size, blocks, skipped, dense, postings = \
+            _HEADER.unpack_from(data, 0)
+        if magic != INDEX_MAGIC:
+            return None
+        pos = _HEADER.size
+        index = cls(block_size)
+        index.key = (size, mtime_ns)
+        index.valid_blocks = blocks
+        index.skipped = set(cls._read_array(data, pos, skipped))
+        pos += skipped * 4
+        index.dense = set(cls._read_array(data, pos, dense))
+        pos += dense * 4
+        for _ in range(postings):
+            gram, count = struct.unpack_from('<II', data, pos)
+            pos += 8
+            index.postings[gram] = cls._read_array(data, pos, count)
+            pos += count * 4
+        return index
+
+    @staticmethod
+    def _array(values) -> array:
+        """转换为小端 32 位无符号整数数组"""
+        result = array('I', values)
+        if sys.byteorder == 'big':
+            result.byteswap()
+        return result
+
+    @staticmethod
+    def _read_array(data: bytes, pos: int, count: int) -> array:
+        result = array('I')
+        end = pos + count * 4
+        if end > len(data):
+            raise ValueError("索引文件不完整")
+        result.frombytes(data[pos:end])
+        if sys.byteorder == 'big':
+            result.byteswap()
+        return result
@@ -0,0 +1,53 @@
+class SelectionModel:
+    """按文档字节偏移记录的选区，十六进制区和 ASCII 区共用
+
+    anchor 为选择起点，cursor 为当前光标，两端都包含在选区内。
+    """
+
+    def __init__(self):
+        self.anchor = None
+        self.cursor = None
+
+    def is_empty(self) -> bool:
+        return self.anchor is None or self.cursor is None
+
+    def range(self) -> tuple[int, int]:
+        """返回 (起始偏移, 长度)，无选区时长度为 0"""
+        if self.is_empty():
+            return 0, 0
+        start = min(self.anchor, self.cursor)
+        return start, max(self.anchor, self.cursor) - start + 1
+
+    def select(self, anchor: int, cursor: int):
+        self.anchor, self.cursor = anchor, cursor
+
+    def clear(self):
+        self.anchor = self.cursor = None
+
+    def clamp(self, size: int):
+        """数据变短后把超出末尾的端点收回到最后一个字节，数据为空时清除选区"""
+        if self.is_empty():
+            return
+        if size == 0:
+            self.clear()
+        else:
+            self.anchor = min(self.anchor, size - 1)
+            self.cursor = min(self.cursor, size - 1)
+
+    def adjust(self, offset: int, old_length: int, new_length: int):
+        """文档中 [offset, offset + old_length) 被替换为 new_length 字节后平移选区端点
+
+        被替换范围之后的端点随之平移，落在范围内的端点移到替换内容的开头。
+        """
+        if self.is_empty():
+            return
+        end = offset + old_length
+
+        def move(position):
+            if position < offset:
+                return position
+            if position >= end:
+                return position + new_length - old_length
+            return offset
+
+        self.anchor, self.cursor = move(self.anchor), move(self.cursor)
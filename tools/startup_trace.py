@@ -0,0 +1,37 @@
+import os
+import sys
+import time
+
+# 设置环境变量 LOVELYHEX_STARTUP_TRACE=1 或使用 --trace-startup 参数启用
+enabled = bool(os.environ.get('LOVELYHEX_STARTUP_TRACE'))
+_start = time.perf_counter()
+_marks = []
+
+
+def enable():
+    global enabled
+    enabled = True
+
+
+def mark(label: str):
+    """记录启动阶段的时间点，未启用时不做任何事"""
+    if enabled:
+        _marks.append((label, time.perf_counter()))
+
+
+def elapsed_ms() -> float:
+    """从导入本模块（进程启动初期）到现在的毫秒数"""
+    return (time.perf_counter() - _start) * 1000
+
+
+def report(file=None):
+    """输出各阶段的累计时间和阶段耗时"""
+    if not enabled:
+        return
+    file = file or sys.stderr
+    previous = _start
+    for label, moment in _marks:
+        print(f"[startup] {label}: {(moment - _start) * 1000:.1f} ms "
+              f"(+{(moment - previous) * 1000:.1f} ms)", file=file)
+        previous = moment
+    file.flush()
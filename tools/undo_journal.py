@@ -0,0 +1,146 @@
+import time
+from collections import deque
+from .piece_table import join_pieces, replace_in, piece_size, piece_count, added_size, extra_size
+
+DEFAULT_UNDO_BUDGET = 64 * 1024 * 1024
+# 连续输入的时间间隔不超过该值（秒）且位置相接时合并为一条记录
+COALESCE_INTERVAL = 1.0
+# 估算的每个片段节点占用的内存（字节）
+NODE_COST = 128
+
+
+def pieces_cost(pieces) -> int:
+    """估算片段子树占用的内存：节点开销加上其引用的新增缓冲区数据
+
+    原始数据（文件映射）和溢出到临时文件的数据不占用内存，不计入。
+    """
+    return NODE_COST * piece_count(pieces) + added_size(pieces)
+
+
+class EditRecord:
+    """一次编辑：在 offset 处把 old 片段替换为 new 片段
+
+    old/new 是片段树的不可变子树，只引用缓冲区中已有的数据，撤销和重做都不复制数据。
+    """
+    __slots__ = ('offset', 'old', 'new', 'old_length', 'new_length', 'cost', 'time', 'typing')
+
+    def __init__(self, offset: int, old, new, typing: bool = False):
+        self.offset = offset
+        self.old = old
+        self.new = new
+        self.old_length = piece_size(old)
+        self.new_length = piece_size(new)
+        self.cost = pieces_cost(old) + pieces_cost(new)
+        self.time = time.monotonic()
+        self.typing = typing
+
+    def coalesce(self, other) -> bool:
+        """把紧随其后的连续输入合并到本记录，不能合并时返回 False"""
+        if not (self.typing and other.typing) or other.time - self.time > COALESCE_INTERVAL:
+            return False
+        end = self.offset + self.new_length
+        if self.offset <= other.offset and other.offset + other.old_length <= end:
+            # 修改的是本记录写入的内容：插入、同一位置改写（如十六进制的高、低半字节）、退格
+            self.new = replace_in(self.new, other.offset - self.offset, other.old_length, other.new)
+        elif other.offset == end:
+            # 向后连续改写或连续按 Delete
+            self.old = join_pieces(self.old, other.old)
+            self.new = join_pieces(self.new, other.new)
+        elif not other.new_length and other.offset + other.old_length == self.offset:
+            # 连续按 Backspace
+            self.offset = other.offset
+            self.old = join_pieces(other.old, self.old)
+        else:
+            return False
+        self.old_length = piece_size(self.old)
+        self.new_length = piece_size(self.new)
+        # 两条记录可能引用相同的片段（如退格删除刚输入的字节），按合并后的子树重新计算
+        self.cost = pieces_cost(self.old) + pieces_cost(self.new)
+        self.time = other.time
+        return True
+
+    def stored(self) -> int:
+        """记录引用的新增缓冲区和溢出文件的字节数"""
+        return (added_size(self.old) + added_size(self.new)
+                + extra_size(self.old) + extra_size(self.new))
+
+
+class UndoJournal:
+    """撤销/重做记录，总内存不超过 budget 字节（超出时丢弃最早的记录）
+
+    丢弃的记录引用的新增数据仍留在只追加的新增缓冲区（或溢出文件）中，released 累计这些字节数，
+    由 HexEditor 在累计足够多时压缩缓冲区（见 PieceTable.compact）真正释放。
+    """
+
+    def __init__(self, budget: int = DEFAULT_UNDO_BUDGET):
+        self.budget = budget
+        self.undo_stack = deque()
+        self.redo_stack = []
+        self.memory = 0
+        # 自上次压缩以来被丢弃的记录引用的新增缓冲区和溢出文件字节数
+        self.released = 0
+
+    def can_undo(self) -> bool:
+        return bool(self.undo_stack)
+
+    def can_redo(self) -> bool:
+        return bool(self.redo_stack)
+
+    def record(self, record: EditRecord):
+        """记录一次新的编辑，并清空重做记录"""
+        for dropped in self.redo_stack:
+            self._drop(dropped)
+        self.redo_stack = []
+        last = self.undo_stack[-1] if self.undo_stack else None
+        if last is not None:
+            cost, stored = last.cost, last.stored()
+            if last.coalesce(record):
+                self.memory += last.cost - cost
+                # 合并时被覆盖的新输入（如退格删除的字节）不再被引用
+                self.released += stored + record.stored() - last.stored()
+                self.trim()
+                return
+        self.undo_stack.append(record)
+        self.memory += record.cost
+        self.trim()
+
+    def _drop(self, record: EditRecord):
+        self.memory -= record.cost
+        self.released += record.stored()
+
+    def set_budget(self, budget: int):
+        self.budget = budget
+        self.trim()
+
+    def trim(self):
+        """超出预算时丢弃最早的撤销记录（至少保留最近一条）"""
+        while self.memory > self.budget and len(self.undo_stack) > 1:
+            self._drop(self.undo_stack.popleft())
+
+    def pop_undo(self) -> EditRecord:
+        record = self.undo_stack.pop()
+        # 撤销后不再与之后的输入合并
+        record.typing = False
+        self.redo_stack.append(record)
+        return record
+
+    def pop_redo(self) -> EditRecord:
+        record = self.redo_stack.pop()
+        self.undo_stack.append(record)
+        return record
+
+    def clear(self):
+        self.undo_stack = deque()
+        self.redo_stack = []
+        self.memory = 0
+        self.released = 0
+
+    def remap(self, fn):
+        """用 fn(子树) 转换所有记录的片段子树，用于缓冲区被压缩或重新编号之后"""
+        for record in (*self.undo_stack, *self.redo_stack):
+            record.old = fn(record.old)
+            record.new = fn(record.new)
+
+    def subtrees(self) -> list:
+        """所有记录引用的片段子树"""
+        return [tree for record in (*self.undo_stack, *self.redo_stack) for tree in (record.old, record.new)]